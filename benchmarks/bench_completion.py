@@ -0,0 +1,97 @@
+"""Keystroke latency of the prompt completer versus number of choices
+
+Types a repo name one character at a time into the org prompt's completer
+and times getting the completions after each keystroke:
+
+    python -m benchmarks.bench_completion --choices 100,1000,10000
+"""
+import argparse
+import random
+import time
+
+import click
+from prompt_toolkit.completion import Completion
+from prompt_toolkit.document import Document
+
+from sweep.prompt_completers import ClickCompleter, CompletionIndex
+
+
+@click.group()
+@click.option('--concurrency')
+def organization(concurrency):
+    pass
+
+
+@organization.command()
+@click.argument('name')
+def repo(name):
+    """Enter a repo's prompt"""
+
+
+@organization.command()
+def overview():
+    """Show the repos with open pull requests"""
+
+
+@organization.group()
+def pulls():
+    """List pull requests"""
+
+
+def repo_names(count):
+    rand = random.Random(count)
+    words = ['api', 'web', 'app', 'service', 'worker', 'client', 'docs', 'infra', 'data', 'sdk']
+    names = set()
+    while len(names) < count:
+        names.add('-'.join(rand.sample(words, 2)) + '-{}'.format(rand.randint(0, count)))
+    return sorted(names)
+
+
+def linear_completions(choices, incomplete):
+    # what the completer did before the index, for comparison
+    completions = [Completion(x, -len(incomplete), display_meta='(enter prompt)') for x in choices]
+    return [c for c in completions if c.text.startswith(incomplete)]
+
+
+def time_keystrokes(complete, typed):
+    """Worst and mean milliseconds to complete each prefix of typed"""
+    timings = []
+    for i in range(len(typed) + 1):
+        start = time.time()
+        complete(typed[:i])
+        timings.append((time.time() - start) * 1000)
+    return max(timings), sum(timings) / len(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--choices', default='100,1000,10000')
+    args = parser.parse_args()
+
+    ctx = click.Context(organization)
+
+    print('{:>8} {:>10} {:>10} {:>10}'.format('choices', 'mode', 'max ms', 'mean ms'))
+
+    for count in [int(x) for x in args.choices.split(',')]:
+        names = repo_names(count)
+        typed = names[len(names) // 2]
+        index = CompletionIndex(names)
+
+        modes = [
+            ('linear', lambda text: linear_completions(names, text)),
+            ('index', ClickCompleter(ctx, default_subcommand='repo', default_subcommand_choices=index)),
+            ('fuzzy', ClickCompleter(ctx, default_subcommand='repo', default_subcommand_choices=index, fuzzy=True)),
+        ]
+
+        for name, completer in modes:
+            if isinstance(completer, ClickCompleter):
+                complete = lambda text, completer=completer: list(completer.get_completions(Document(text)))
+            else:
+                complete = completer
+
+            worst, mean = time_keystrokes(complete, typed)
+            print('{:>8} {:>10} {:>10.2f} {:>10.2f}'.format(count, name, worst, mean))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Wall time of an org-wide write versus concurrency level
+
+Creates a label in every repo of a fake org, served locally with
+simulated latency:
+
+    python -m benchmarks.bench_concurrency --repos 200 --latency 0.05
+"""
+import argparse
+import os
+import time
+
+from sweep.github import api
+from sweep.github.concurrency import run_concurrently
+
+from .fake_github import FakeGitHub
+
+
+def create_labels(repos, label, max_workers):
+    def create_label(name):
+        api.rest('POST', '/repos/fake-org/{}/labels'.format(name), data={'name': label, 'color': 'ffffff'})
+
+    for name, _, error in run_concurrently(create_label, repos, max_workers=max_workers):
+        if error is not None:
+            raise error
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repos', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds added to every response')
+    parser.add_argument('--levels', default='1,2,4,8,16,32')
+    args = parser.parse_args()
+
+    fake = FakeGitHub(latency=args.latency)
+    org = fake.seed_org('fake-org', repos=args.repos, pulls_per_repo=0)
+    api.API_URL = fake.start()
+    os.environ['SWEEP_GITHUB_TOKEN'] = 'fake-token'
+    # measure the network fan-out, not GitHub's secondary limit on writes
+    api.get_rate_limiter().write_interval = 0
+
+    repos = [repo.name for repo in org.repos]
+
+    print('{} label creations, {:.0f}ms latency'.format(args.repos, args.latency * 1000))
+    print('{:>12} {:>10} {:>10}'.format('concurrency', 'seconds', 'req/s'))
+
+    try:
+        for level in [int(x) for x in args.levels.split(',')]:
+            start = time.time()
+            # a new label each time, since they'd already exist
+            create_labels(repos, 'bench-{}'.format(level), level)
+            elapsed = time.time() - start
+            print('{:>12} {:>10.2f} {:>10.1f}'.format(level, elapsed, args.repos / elapsed))
+    finally:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
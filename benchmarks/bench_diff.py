@@ -0,0 +1,81 @@
+"""Diff colorizing throughput, sweep's colorizer versus Pygments' DiffLexer
+
+Colorizes synthetic unified diffs of a few sizes, a line at a time the way
+`PullRequest.iter_diff` does:
+
+    python -m benchmarks.bench_diff --sizes 1,10,50
+"""
+import argparse
+import random
+import time
+
+from sweep.diff import DiffColorizer
+
+
+def synthetic_diff(size):
+    """Lines of a made up multi-file diff, about size bytes in total"""
+    rand = random.Random(size)
+    lines = []
+    total = 0
+    file_number = 0
+
+    while total < size:
+        path = 'src/module_{}.py'.format(file_number)
+        file_number += 1
+        hunk = [
+            'diff --git a/{0} b/{0}\n'.format(path),
+            'index 83db48f..bf269f4 100644\n',
+            '--- a/{}\n'.format(path),
+            '+++ b/{}\n'.format(path),
+            '@@ -1,40 +1,40 @@ def main():\n',
+        ]
+        for i in range(40):
+            marker = rand.choice(' +- ')
+            hunk.append('{}    value_{} = compute(value_{}, "{}")\n'.format(marker, i, i - 1, path))
+
+        lines += hunk
+        total += sum(len(line) for line in hunk)
+
+    return lines
+
+
+def colorize_fast(lines):
+    return ''.join(DiffColorizer().colorize(lines))
+
+
+def colorize_pygments(lines):
+    from pygments import highlight
+    from pygments.formatters import TerminalFormatter
+    from pygments.lexers import DiffLexer
+
+    return highlight(''.join(lines), DiffLexer(), TerminalFormatter())
+
+
+MODES = [
+    ('sweep', colorize_fast),
+    ('pygments', colorize_pygments),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1,10,50', help='Diff sizes in MB')
+    parser.add_argument('--modes', default=','.join(name for name, _ in MODES))
+    args = parser.parse_args()
+
+    modes = [(name, func) for name, func in MODES if name in args.modes.split(',')]
+
+    print('{:>8} {:>10} {:>10} {:>10}'.format('MB', 'mode', 'seconds', 'MB/s'))
+
+    for megabytes in [int(x) for x in args.sizes.split(',')]:
+        lines = synthetic_diff(megabytes * 1024 * 1024)
+
+        for name, func in modes:
+            start = time.time()
+            func(lines)
+            elapsed = time.time() - start
+            print('{:>8} {:>10} {:>10.2f} {:>10.1f}'.format(megabytes, name, elapsed, megabytes / elapsed))
+
+
+if __name__ == '__main__':
+    main()
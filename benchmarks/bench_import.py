@@ -0,0 +1,86 @@
+"""Startup time of the sweep CLI, with a budget to catch regressions
+
+Runs `sweep --help` in fresh interpreters under `python -X importtime`,
+reports the slowest imports, and exits non-zero if the import time goes
+over budget or a module that should be imported lazily shows up:
+
+    python -m benchmarks.bench_import --budget-ms 150
+"""
+import argparse
+import subprocess
+import sys
+
+
+# only needed by some commands, so they shouldn't be imported at startup
+LAZY_MODULES = [
+    'pkg_resources',
+    'prompt_toolkit',
+    'pygments',
+    'requests',
+    'terminaltables',
+]
+
+STARTUP_CODE = "import sys; sys.argv = ['sweep', '--help']; import sweep.cli; sweep.cli.cli()"
+
+
+def parse_importtime(output):
+    """(module, self us, cumulative us, depth) for each line of -X importtime output"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def measure():
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    _, stderr = process.communicate()
+    return parse_importtime(stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget-ms', type=float, default=150, help='Max import time for `sweep --help`')
+    parser.add_argument('--runs', type=int, default=5, help='Best of this many runs is compared to the budget')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest imports to show')
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    totals = [sum(cumulative for _, _, cumulative, depth in imports if depth == 0) / 1000.0 for imports in runs]
+    best = min(range(len(runs)), key=lambda i: totals[i])
+    imports = runs[best]
+
+    print('import time: best {:.1f}ms, worst {:.1f}ms over {} runs'.format(totals[best], max(totals), args.runs))
+    print('')
+    print('{:>10} {:>10}  {}'.format('self ms', 'total ms', 'module'))
+    for name, self_us, cumulative_us, _ in sorted(imports, key=lambda x: -x[2])[:args.top]:
+        print('{:>10.1f} {:>10.1f}  {}'.format(self_us / 1000.0, cumulative_us / 1000.0, name))
+
+    failures = []
+
+    if totals[best] > args.budget_ms:
+        failures.append('import time {:.1f}ms is over the {:.0f}ms budget'.format(totals[best], args.budget_ms))
+
+    imported = set(name.split('.')[0] for name, _, _, _ in imports)
+    for module in LAZY_MODULES:
+        if module in imported:
+            failures.append('{} is imported at startup'.format(module))
+
+    if failures:
+        print('')
+        for failure in failures:
+            print('FAIL: ' + failure)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
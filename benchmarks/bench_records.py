@@ -0,0 +1,109 @@
+"""Memory and filtering time of pull requests as listing dicts versus PullRecords
+
+Decodes synthetic listing nodes the way they arrive from GraphQL, then
+keeps either the nested dicts or the PullRecords built from them, and
+filters each by status and author:
+
+    python -m benchmarks.bench_records --pulls 1000,10000,50000
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from sweep.github.pull_record import PullRecord
+from sweep.github.pull_request import get_pull_request_state
+
+
+def listing_json(count):
+    """JSON for count listing nodes, like a page of results but all at once"""
+    rand = random.Random(count)
+    nodes = []
+    for i in range(count):
+        nodes.append({
+            'id': 'MDExOlB1bGxSZXF1ZXN0{:08d}'.format(i),
+            'title': 'Bump dependency-{} from 1.{} to 1.{}'.format(i % 50, i % 7, i % 7 + 1),
+            'number': i % 500 + 1,
+            'state': 'OPEN',
+            'updatedAt': '2017-09-06T00:00:00Z',
+            'headRefName': 'dependabot/pip/dependency-{}'.format(i),
+            'headRefOid': '{:040x}'.format(rand.getrandbits(160)),
+            'author': {'login': rand.choice(['dependabot', 'developer-1', 'developer-2'])},
+            'commits': {
+                'totalCount': rand.randint(1, 5),
+                'edges': [{'node': {'commit': {'status': {
+                    'id': 'MDY6U3RhdHVz{:08d}'.format(i),
+                    'state': rand.choice(['SUCCESS', 'PENDING', 'FAILURE']),
+                }}}}],
+            },
+            'repository': {'name': 'repo-{}'.format(i // 20)},
+        })
+    return json.dumps(nodes)
+
+
+def keep_dicts(text):
+    return json.loads(text)
+
+
+def keep_records(text):
+    return [PullRecord.from_node(node) for node in json.loads(text)]
+
+
+def filter_dicts(pulls):
+    return [
+        pull for pull in pulls
+        if get_pull_request_state(pull) == 'SUCCESS' and (pull['author'] or {}).get('login', None) == 'dependabot'
+    ]
+
+
+def filter_records(pulls):
+    return [pull for pull in pulls if pull.status == 'SUCCESS' and pull.author == 'dependabot']
+
+
+MODES = [
+    ('dicts', keep_dicts, filter_dicts),
+    ('records', keep_records, filter_records),
+]
+
+
+def measure(text, keep):
+    """(pulls, bytes still allocated once they're built)"""
+    gc.collect()
+    tracemalloc.start()
+    pulls = keep(text)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pulls, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pulls', default='1000,10000,50000')
+    parser.add_argument('--runs', type=int, default=5, help='Best of this many filter timings is shown')
+    args = parser.parse_args()
+
+    print('{:>8} {:>8} {:>10} {:>10} {:>10}'.format('pulls', 'mode', 'MB', 'bytes/PR', 'filter ms'))
+
+    for count in [int(x) for x in args.pulls.split(',')]:
+        text = listing_json(count)
+
+        for name, keep, filter_pulls in MODES:
+            pulls, size = measure(text, keep)
+
+            timings = []
+            for _ in range(args.runs):
+                start = time.time()
+                filter_pulls(pulls)
+                timings.append((time.time() - start) * 1000)
+
+            print('{:>8} {:>8} {:>10.1f} {:>10.0f} {:>10.2f}'.format(
+                count, name, size / 1024.0 / 1024.0, size / float(count), min(timings),
+            ))
+            del pulls
+
+
+if __name__ == '__main__':
+    main()
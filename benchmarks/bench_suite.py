@@ -0,0 +1,259 @@
+"""End to end benchmarks of sweep commands against a fake GitHub
+
+Seeds a synthetic org on a local fake GitHub (see fake_github.py), runs
+each scenario's sweep command in a fresh process and home directory, and
+measures its wall time, requests, bytes transferred and peak memory:
+
+    python -m benchmarks.bench_suite --repos 1000 --pulls 20 --latency 0.05
+
+Results are appended to .benchmarks/results.jsonl along with the commit
+they were measured at, and compared to the last results for another
+commit with the same settings (or --baseline). With --check, the exit
+status is non-zero if anything got worse by more than --threshold.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+from .fake_github import FakeGitHub, SEED_FILE_CONTENTS, SEED_FILE_PATH, SEED_FILE_UPDATED, SEED_LABEL
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RESULTS_PATH = os.path.join(ROOT, '.benchmarks', 'results.jsonl')
+
+ORG = 'bench-org'
+
+# name: (options before the org, arguments after it, answers to prompts, run once beforehand)
+SCENARIOS = OrderedDict([
+    ('overview', ([], ['overview'], '', False)),
+    # synced from the local store, with only what changed fetched
+    ('overview-warm', (['--max-age', '0'], ['overview'], '', True)),
+    ('pulls', ([], ['pulls'], '', False)),
+    ('pulls-merge', ([], ['pulls', '--title', 'Bump', 'merge', '--on-error', 'skip'], 'y\ny\n', False)),
+    ('labels-create', ([], ['labels', 'create', SEED_LABEL['name'], SEED_LABEL['color'], '--on-error', 'skip'], '', False)),
+    ('files-update', ([], ['files', 'update', SEED_FILE_PATH, '{matching}', '{updated}', '--on-error', 'skip'], '', False)),
+])
+
+# (metric, format, whether a change is expected run to run)
+METRICS = [
+    ('seconds', '{:.2f}', True),
+    ('requests', '{}', False),
+    ('bytes_down', '{}', False),
+    ('bytes_up', '{}', False),
+    ('peak_rss_mb', '{:.1f}', True),
+]
+
+
+def git(*args):
+    try:
+        return subprocess.check_output(('git',) + args, cwd=ROOT, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_sweep(fake, home, arguments, answers, concurrency):
+    """Run a sweep command, returning its exit code, output and peak RSS"""
+    env = dict(os.environ)
+    env.update({
+        'HOME': home,
+        'SWEEP_GITHUB_API_URL': fake.url,
+        'SWEEP_GITHUB_TOKEN': 'fake-token',
+    })
+    stats_path = os.path.join(home, 'stats.json')
+    command = [sys.executable, '-m', 'benchmarks.run_sweep', stats_path, '--concurrency', str(concurrency)]
+
+    process = subprocess.Popen(
+        command + arguments,
+        cwd=ROOT,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+    )
+    output, _ = process.communicate(answers)
+
+    peak_rss = None
+    if os.path.exists(stats_path):
+        with open(stats_path) as f:
+            peak_rss = json.load(f)['peak_rss']
+
+    return process.returncode, output, peak_rss
+
+
+def run_scenario(name, args):
+    options, arguments, answers, warm_up = SCENARIOS[name]
+
+    fake = FakeGitHub(latency=args.latency)
+    fake.seed_org(ORG, repos=args.repos, pulls_per_repo=args.pulls)
+    fake.start()
+    home = tempfile.mkdtemp(prefix='sweep-bench-')
+
+    try:
+        files = {'matching': SEED_FILE_CONTENTS, 'updated': SEED_FILE_UPDATED}
+        for key, contents in files.items():
+            path = os.path.join(home, key)
+            with open(path, 'wb') as f:
+                f.write(contents)
+            files[key] = path
+        arguments = options + [ORG] + [x.format(**files) for x in arguments]
+
+        if warm_up:
+            run_sweep(fake, home, arguments, answers, args.concurrency)
+            fake.reset_counts()
+
+        start = time.time()
+        exit_code, output, peak_rss = run_sweep(fake, home, arguments, answers, args.concurrency)
+        seconds = time.time() - start
+
+        if exit_code != 0:
+            print(output[-2000:])
+            raise Exception('sweep {} exited with {}'.format(' '.join(arguments), exit_code))
+
+        return OrderedDict([
+            ('seconds', seconds),
+            ('requests', fake.request_count),
+            ('bytes_down', fake.bytes_sent),
+            ('bytes_up', fake.bytes_received),
+            ('peak_rss_mb', peak_rss / 1024.0 / 1024.0 if peak_rss else None),
+        ])
+    finally:
+        fake.stop()
+        shutil.rmtree(home, ignore_errors=True)
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_result(path, entry):
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+def find_baseline(results, entry, baseline=None):
+    """The latest results with the same settings, from the baseline commit or any other"""
+    for previous in reversed(results):
+        if previous['settings'] != entry['settings']:
+            continue
+        if baseline is not None and previous['commit'] == baseline:
+            return previous
+        if baseline is None and previous['commit'] != entry['commit']:
+            return previous
+    return None
+
+
+def compare(entry, baseline, threshold):
+    """Print the change in each metric, returning the ones that got worse"""
+    print('')
+    print('compared to {} ({})'.format(baseline['commit'][:10], baseline['subject']))
+    print('{:>16} {:>12} {:>14} {:>14} {:>9}'.format('scenario', 'metric', 'baseline', 'now', 'change'))
+
+    regressions = []
+    for scenario, metrics in entry['results'].items():
+        before = baseline['results'].get(scenario, None)
+        if before is None:
+            continue
+
+        for metric, template, noisy in METRICS:
+            old, new = before.get(metric, None), metrics.get(metric, None)
+            if not old or new is None:
+                continue
+
+            change = (new - old) / float(old)
+            worse = change > threshold if noisy else new > old
+            if worse:
+                regressions.append((scenario, metric))
+
+            print('{:>16} {:>12} {:>14} {:>14} {:>+8.1f}%{}'.format(
+                scenario,
+                metric,
+                template.format(old),
+                template.format(new),
+                change * 100,
+                '  worse' if worse else '',
+            ))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repos', type=int, default=200)
+    parser.add_argument('--pulls', type=int, default=20, help='Open pull requests in each repo')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds added to every response')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--results', default=RESULTS_PATH, help='JSON lines file the results are added to')
+    parser.add_argument('--no-save', action='store_true', help='Don\'t add these results to the results file')
+    parser.add_argument('--baseline', default=None, help='Commit to compare to, instead of the last one measured')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Fraction that time and memory can grow by')
+    parser.add_argument('--check', action='store_true', help='Exit non-zero if anything regressed')
+    args = parser.parse_args()
+
+    entry = OrderedDict([
+        ('commit', git('rev-parse', 'HEAD')),
+        ('subject', git('log', '-1', '--format=%s')),
+        ('dirty', bool(git('status', '--porcelain', '--untracked-files=no'))),
+        ('measured_at', time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())),
+        ('settings', OrderedDict([
+            ('repos', args.repos),
+            ('pulls', args.pulls),
+            ('latency', args.latency),
+            ('concurrency', args.concurrency),
+        ])),
+        ('results', OrderedDict()),
+    ])
+
+    print('{} repos x {} pull requests, {:.0f}ms latency, concurrency {}'.format(
+        args.repos, args.pulls, args.latency * 1000, args.concurrency,
+    ))
+    print('{:>16} {:>10} {:>10} {:>12} {:>12} {:>10}'.format(
+        'scenario', 'seconds', 'requests', 'bytes down', 'bytes up', 'peak MB',
+    ))
+
+    for name in args.scenarios.split(','):
+        metrics = run_scenario(name, args)
+        entry['results'][name] = metrics
+        print('{:>16} {:>10.2f} {:>10} {:>12} {:>12} {:>10.1f}'.format(
+            name,
+            metrics['seconds'],
+            metrics['requests'],
+            metrics['bytes_down'],
+            metrics['bytes_up'],
+            metrics['peak_rss_mb'] or 0,
+        ))
+
+    results = load_results(args.results)
+    baseline_commit = git('rev-parse', args.baseline) if args.baseline else None
+    baseline = find_baseline(results, entry, baseline=baseline_commit)
+
+    if not args.no_save:
+        save_result(args.results, entry)
+
+    regressions = []
+    if baseline is not None:
+        regressions = compare(entry, baseline, args.threshold)
+    elif args.baseline:
+        print('')
+        print('No results for {} with these settings.'.format(args.baseline))
+
+    if regressions and args.check:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,662 @@
+"""A local stand-in for the GitHub API, for benchmarking sweep offline
+
+Serves GraphQL and the REST endpoints sweep uses (merges, pull requests
+and their files, branch refs, labels and file contents) from synthetic
+orgs held in memory, so writes show up in later reads. Every response can
+be delayed to simulate network latency.
+"""
+import base64
+import hashlib
+import json
+import random
+import re
+import shlex
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, unquote, unquote_plus, urlsplit
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import unquote, unquote_plus
+    from urlparse import parse_qs, urlsplit
+
+from .fake_graphql import GraphqlError, NotFoundError, execute
+
+
+# GitHub won't return more results than this for a single search
+SEARCH_RESULT_LIMIT = 1000
+
+# the most items GitHub will put in a page of a REST list
+MAX_PER_PAGE = 100
+
+# when the seeded pull requests were last updated
+SEED_TIME = time.time() - 30 * 24 * 60 * 60
+
+DEPENDENCIES = ['requests', 'django', 'click', 'pytest', 'flask', 'celery', 'boto3', 'numpy']
+AREAS = ['login', 'billing', 'search', 'uploads', 'settings', 'api', 'docs', 'ci']
+STATUSES = ['SUCCESS', 'SUCCESS', 'PENDING', 'FAILURE', None]
+
+# contents of a file every seeded repo has, for `files update`
+SEED_FILE_PATH = '.editorconfig'
+SEED_FILE_CONTENTS = b'root = true\n\n[*]\nindent_style = space\nindent_size = 4\n'
+SEED_FILE_UPDATED = SEED_FILE_CONTENTS + b'end_of_line = lf\n'
+
+# a label some seeded repos have, for `labels create`
+SEED_LABEL = {'name': 'dependencies', 'color': '0366d6'}
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    # the default of 5 drops connections when benchmarking high concurrency
+    request_queue_size = 128
+
+
+def iso_time(seconds):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(seconds))
+
+
+def blob_sha(contents):
+    return hashlib.sha1('blob {}\0'.format(len(contents)).encode('ascii') + contents).hexdigest()
+
+
+def fake_sha(*parts):
+    return hashlib.sha1(':'.join(str(x) for x in parts).encode('utf-8')).hexdigest()
+
+
+class Connection(object):
+    """A page of a list, with cursors that are positions in the list"""
+    typename = 'Connection'
+
+    def __init__(self, items, first=None, after=None, last=None):
+        start = int(after.split(':')[1]) if after else 0
+        end = len(items)
+        if last is not None:
+            start = max(start, end - last)
+        if first is not None:
+            end = min(end, start + first)
+
+        self.totalCount = len(items)
+        self.nodes = items[start:end]
+        self.edges = [
+            {'node': node, 'cursor': 'cursor:{}'.format(start + i + 1)}
+            for i, node in enumerate(self.nodes)
+        ]
+        self.pageInfo = {
+            'endCursor': 'cursor:{}'.format(end) if self.nodes else after,
+            'hasNextPage': end < len(items),
+        }
+
+
+class SearchResult(Connection):
+    def __init__(self, items, first=None, after=None):
+        super(SearchResult, self).__init__(items[:SEARCH_RESULT_LIMIT], first=first, after=after)
+        self.issueCount = len(items)
+
+
+class FakePullRequest(object):
+    typename = 'PullRequest'
+
+    def __init__(self, repository, number, title, author, status, commit_count, files):
+        self.repository = repository
+        self.number = number
+        self.id = 'PR_{}_{}'.format(repository.name, number)
+        self.title = title
+        self.author = {'login': author}
+        self.status = status
+        self.commit_count = commit_count
+        self.files = files
+
+        self.state = 'OPEN'
+        self.bodyText = 'Synthetic pull request for benchmarking.'
+        self.url = '{}/pull/{}'.format(repository.url, number)
+        self.createdAt = iso_time(SEED_TIME)
+        self.updatedAt = iso_time(SEED_TIME)
+        self.mergeable = 'MERGEABLE'
+        self.baseRefName = 'master'
+        self.headRefName = 'sweep-bench/{}'.format(number)
+        self.headRefOid = fake_sha(repository.name, number)
+        self.additions = sum(f['additions'] for f in files)
+        self.deletions = sum(f['deletions'] for f in files)
+        self.changedFiles = len(files)
+
+    def commits(self, first=None, after=None, last=None):
+        status = None
+        if self.status is not None:
+            status = {
+                'id': 'STATUS_{}'.format(self.headRefOid),
+                'state': self.status,
+                'contexts': [{'context': 'ci', 'description': 'Synthetic check', 'state': self.status}],
+            }
+        commit = {'commit': {'oid': self.headRefOid, 'status': status}}
+        return Connection([commit] * self.commit_count, first=first, after=after, last=last)
+
+    def comments(self, first=None, after=None, last=None):
+        return Connection([], first=first, after=after, last=last)
+
+    reviews = comments
+    reviewRequests = comments
+
+    def set_state(self, state):
+        self.state = state
+        self.updatedAt = iso_time(time.time())
+
+    def diff(self):
+        lines = []
+        for f in self.files:
+            lines += [
+                'diff --git a/{0} b/{0}\n'.format(f['filename']),
+                'index {}..{} 100644\n'.format(f['sha'][:7], self.headRefOid[:7]),
+                '--- a/{}\n'.format(f['filename']),
+                '+++ b/{}\n'.format(f['filename']),
+                f['patch'] + '\n',
+            ]
+        return ''.join(lines)
+
+
+class FakeRepository(object):
+    typename = 'Repository'
+
+    def __init__(self, organization, name):
+        self.organization = organization
+        self.name = name
+        self.nameWithOwner = '{}/{}'.format(organization.login, name)
+        self.url = 'https://github.com/' + self.nameWithOwner
+        self.pulls = []
+        self.labels = {}  # by lowercased name, like GitHub matches them
+        self.files = {}
+        self.branches = set(['master'])
+        self.head_oid = fake_sha(self.nameWithOwner, 'master')
+
+    @property
+    def defaultBranchRef(self):
+        return {'name': 'master', 'target': {'__typename': 'Commit', 'oid': self.head_oid}}
+
+    def pullRequests(self, states=None, first=None, after=None, last=None, orderBy=None):
+        if isinstance(states, str):
+            states = [states]
+        pulls = [pull for pull in self.pulls if not states or pull.state in states]
+        return Connection(pulls, first=first, after=after, last=last)
+
+    def pullRequest(self, number):
+        return self.get_pull(number)
+
+    def get_pull(self, number):
+        for pull in self.pulls:
+            if pull.number == int(number):
+                return pull
+        return None
+
+    def label(self, name):
+        return self.labels.get(name.lower(), None)
+
+    def object(self, expression):
+        ref, _, path = expression.partition(':')
+        if ref != 'HEAD' or path not in self.files:
+            return None
+        return {'__typename': 'Blob', 'oid': blob_sha(self.files[path])}
+
+    def commit(self, files):
+        self.files.update(files)
+        self.head_oid = fake_sha(self.head_oid, sorted(files))
+        return self.head_oid
+
+
+class FakeOrganization(object):
+    typename = 'Organization'
+
+    def __init__(self, login):
+        self.login = login
+        self.repos = []
+
+    def repositories(self, first=None, after=None, orderBy=None):
+        repos = self.repos
+        if orderBy and orderBy.get('direction', None) == 'DESC':
+            repos = list(reversed(repos))  # repos are kept in creation order
+        return Connection(repos, first=first, after=after)
+
+
+class Query(object):
+    def __init__(self, github):
+        self.github = github
+
+    def organization(self, login):
+        return self.github.orgs.get(login, None)
+
+    def repository(self, owner, name):
+        repository = self.github.get_repo(owner, name)
+        if repository is None:
+            raise NotFoundError("Could not resolve to a Repository with the name '{}/{}'.".format(owner, name))
+        return repository
+
+    def nodes(self, ids):
+        return [self.github.pulls_by_id.get(x, None) for x in ids]
+
+    def search(self, type, query, first=None, after=None):
+        return SearchResult(self.github.search_pulls(query), first=first, after=after)
+
+    def rateLimit(self, dryRun=False):
+        return {'cost': 1, 'limit': 5000, 'remaining': 5000, 'resetAt': iso_time(time.time() + 3600)}
+
+
+class Mutation(object):
+    def __init__(self, github):
+        self.github = github
+
+    def createCommitOnBranch(self, input):
+        owner, name = input['branch']['repositoryNameWithOwner'].split('/')
+        repository = self.github.get_repo(owner, name)
+        if repository is None:
+            raise GraphqlError('Could not resolve to a Repository')
+
+        if input['expectedHeadOid'] != repository.head_oid:
+            raise GraphqlError('Expected branch to point to "{}" but it did not'.format(input['expectedHeadOid']))
+
+        files = dict(
+            (addition['path'], base64.b64decode(addition['contents']))
+            for addition in input['fileChanges'].get('additions', [])
+        )
+        return {'commit': {'oid': repository.commit(files)}}
+
+    def addComment(self, input):
+        return {'clientMutationId': None}
+
+    def addPullRequestReview(self, input):
+        return {'clientMutationId': None}
+
+
+class FakeRequest(object):
+    def __init__(self, method, path, body=None, headers=None):
+        url = urlsplit(path)
+        self.method = method
+        self.path = url.path
+        self.query = dict((k, v[-1]) for k, v in parse_qs(url.query).items())
+        self.body = body
+        self.headers = headers or {}
+
+
+class FakeGitHub(object):
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.request_count = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.lock = threading.Lock()
+        # requests change the orgs, so they're handled one at a time
+        self.state_lock = threading.Lock()
+        self.orgs = {}
+        self.pulls_by_id = {}
+        self.roots = {'query': Query(self), 'mutation': Mutation(self)}
+
+        repo_path = r'^/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)'
+        self.routes = [
+            ('GET', r'^/rate_limit$', self.rate_limit),
+            ('POST', r'^/graphql$', self.graphql),
+            ('GET', repo_path + r'/pulls/(?P<number>\d+)$', self.get_pull),
+            ('PATCH', repo_path + r'/pulls/(?P<number>\d+)$', self.update_pull),
+            ('PUT', repo_path + r'/pulls/(?P<number>\d+)/merge$', self.merge_pull),
+            ('GET', repo_path + r'/pulls/(?P<number>\d+)/files$', self.list_pull_files),
+            ('DELETE', repo_path + r'/git/refs/heads/(?P<branch>.+)$', self.delete_branch),
+            ('POST', repo_path + r'/labels$', self.create_label),
+            ('PATCH', repo_path + r'/labels/(?P<name>[^/]+)$', self.update_label),
+            ('DELETE', repo_path + r'/labels/(?P<name>[^/]+)$', self.delete_label),
+            ('PUT', repo_path + r'/contents/(?P<path>.+)$', self.put_contents),
+        ]
+        self.server = None
+
+    def seed_org(self, login, repos, pulls_per_repo, seed=0):
+        """Add an org of synthetic repos, each with some open pull requests
+
+        Every repo has `.editorconfig`, though some have edited or already
+        updated versions, or none at all. Some already have the
+        `dependencies` label, in a few different colors.
+        """
+        rand = random.Random(seed)
+        organization = FakeOrganization(login)
+
+        for i in range(repos):
+            repository = FakeRepository(organization, 'repo-{:04d}'.format(i))
+
+            if i % 10 == 1:
+                pass  # doesn't have the file
+            elif i % 10 == 2:
+                repository.files[SEED_FILE_PATH] = SEED_FILE_UPDATED
+            elif i % 10 == 3:
+                repository.files[SEED_FILE_PATH] = SEED_FILE_CONTENTS.replace(b'4', b'2')
+            else:
+                repository.files[SEED_FILE_PATH] = SEED_FILE_CONTENTS
+
+            if i % 3 == 0:
+                color = 'ededed' if i % 6 == 0 else SEED_LABEL['color']
+                repository.labels[SEED_LABEL['name']] = {'name': SEED_LABEL['name'], 'color': color}
+
+            for number in range(1, pulls_per_repo + 1):
+                pull = self.make_pull(rand, repository, number)
+                repository.pulls.append(pull)
+                repository.branches.add(pull.headRefName)
+                self.pulls_by_id[pull.id] = pull
+
+            organization.repos.append(repository)
+
+        self.orgs[login] = organization
+        return organization
+
+    def make_pull(self, rand, repository, number):
+        if rand.random() < 0.5:
+            dependency = rand.choice(DEPENDENCIES)
+            minor = rand.randint(0, 20)
+            title = 'Bump {} from 1.{} to 1.{}'.format(dependency, minor, minor + 1)
+            author = 'dependabot[bot]'
+        else:
+            title = '{} {} {}'.format(rand.choice(['Fix', 'Add', 'Refactor']), rand.choice(AREAS), number)
+            author = 'developer-{}'.format(rand.randint(1, 20))
+
+        files = []
+        for j in range(rand.randint(1, 5)):
+            additions = rand.randint(1, 40)
+            deletions = rand.randint(0, 20)
+            patch = ['@@ -1,{} +1,{} @@'.format(deletions, additions)]
+            patch += ['-    old_value_{} = {}'.format(k, k) for k in range(deletions)]
+            patch += ['+    new_value_{} = {}'.format(k, k) for k in range(additions)]
+            files.append({
+                'sha': fake_sha(repository.name, number, j),
+                'filename': 'src/module_{}.py'.format(j),
+                'status': 'modified',
+                'additions': additions,
+                'deletions': deletions,
+                'changes': additions + deletions,
+                'patch': '\n'.join(patch),
+            })
+
+        return FakePullRequest(
+            repository,
+            number,
+            title,
+            author=author,
+            status=rand.choice(STATUSES),
+            commit_count=rand.randint(1, 5),
+            files=files,
+        )
+
+    def get_repo(self, owner, name):
+        organization = self.orgs.get(owner, None)
+        if organization is None:
+            return None
+        for repository in organization.repos:
+            if repository.name == name:
+                return repository
+        return None
+
+    def search_pulls(self, query):
+        """Pull requests matching the search qualifiers sweep uses"""
+        qualifiers = []
+        words = []
+        for term in shlex.split(query):
+            key, separator, value = term.partition(':')
+            if separator and key in ('org', 'is', 'author', 'status', 'updated', 'sort', 'in'):
+                qualifiers.append((key, value))
+            else:
+                words.append(term.lower())
+
+        def matches(pull):
+            for key, value in qualifiers:
+                if key == 'org' and pull.repository.organization.login != value:
+                    return False
+                if key == 'is' and value == 'open' and pull.state != 'OPEN':
+                    return False
+                if key == 'is' and value == 'closed' and pull.state == 'OPEN':
+                    return False
+                if key == 'is' and value == 'merged' and pull.state != 'MERGED':
+                    return False
+                if key == 'is' and value == 'unmerged' and pull.state == 'MERGED':
+                    return False
+                if key == 'author' and pull.author['login'] != value:
+                    return False
+                if key == 'status' and (pull.status or '').lower() != value:
+                    return False
+                if key == 'updated' and pull.updatedAt < value.lstrip('>='):
+                    return False
+            return all(word in pull.title.lower() for word in words)
+
+        pulls = [pull for pull in self.pulls_by_id.values() if matches(pull)]
+        if ('sort', 'updated-asc') in qualifiers:
+            pulls.sort(key=lambda pull: pull.updatedAt)
+        return pulls
+
+    def rate_limit(self, request, **kwargs):
+        reset = int(time.time()) + 3600
+        return 200, {'resources': dict(
+            (resource, {'limit': 5000, 'remaining': 5000, 'reset': reset})
+            for resource in ('core', 'graphql', 'search')
+        )}
+
+    def graphql(self, request):
+        return 200, execute(request.body['query'], self.roots, request.body.get('variables', None))
+
+    def find_pull(self, owner, repo, number):
+        repository = self.get_repo(owner, repo)
+        return repository.get_pull(number) if repository else None
+
+    def get_pull(self, request, owner, repo, number):
+        pull = self.find_pull(owner, repo, number)
+        if pull is None:
+            return 404, {'message': 'Not Found'}
+
+        if request.headers.get('Accept', None) == 'application/vnd.github.v3.diff':
+            return 200, pull.diff().encode('utf-8')
+
+        return 200, {
+            'number': pull.number,
+            'title': pull.title,
+            'state': 'open' if pull.state == 'OPEN' else 'closed',
+            'merged': pull.state == 'MERGED',
+            'head': {'ref': pull.headRefName, 'sha': pull.headRefOid},
+            'user': pull.author,
+        }
+
+    def update_pull(self, request, owner, repo, number):
+        pull = self.find_pull(owner, repo, number)
+        if pull is None:
+            return 404, {'message': 'Not Found'}
+
+        if request.body.get('state', None) == 'closed' and pull.state == 'OPEN':
+            pull.set_state('CLOSED')
+        return 200, {'number': pull.number, 'state': 'open' if pull.state == 'OPEN' else 'closed'}
+
+    def merge_pull(self, request, owner, repo, number):
+        pull = self.find_pull(owner, repo, number)
+        if pull is None:
+            return 404, {'message': 'Not Found'}
+        if pull.state != 'OPEN':
+            return 405, {'message': 'Pull Request is not mergeable'}
+        if request.body.get('sha', pull.headRefOid) != pull.headRefOid:
+            return 409, {'message': 'Head branch was modified. Review and try the merge again.'}
+
+        pull.set_state('MERGED')
+        sha = pull.repository.commit({})
+        return 200, {'sha': sha, 'merged': True, 'message': 'Pull Request successfully merged'}
+
+    def list_pull_files(self, request, owner, repo, number):
+        pull = self.find_pull(owner, repo, number)
+        if pull is None:
+            return 404, {'message': 'Not Found'}
+
+        per_page = min(int(request.query.get('per_page', 30)), MAX_PER_PAGE)
+        page = int(request.query.get('page', 1))
+        last_page = max(1, (len(pull.files) + per_page - 1) // per_page)
+
+        headers = {}
+        if last_page > 1:
+            headers['Link'] = '<{}{}?per_page={}&page={}>; rel="last"'.format(
+                self.url, request.path, per_page, last_page,
+            )
+
+        return 200, pull.files[(page - 1) * per_page:page * per_page], headers
+
+    def delete_branch(self, request, owner, repo, branch):
+        repository = self.get_repo(owner, repo)
+        branch = unquote_plus(branch)
+        if repository is None or branch not in repository.branches:
+            return 422, {'message': 'Reference does not exist'}
+
+        repository.branches.remove(branch)
+        return 204, None
+
+    def create_label(self, request, owner, repo):
+        repository = self.get_repo(owner, repo)
+        if repository is None:
+            return 404, {'message': 'Not Found'}
+
+        label = {'name': request.body['name'], 'color': request.body['color']}
+        if label['name'].lower() in repository.labels:
+            return 422, {
+                'message': 'Validation Failed',
+                'errors': [{'resource': 'Label', 'code': 'already_exists', 'field': 'name'}],
+            }
+
+        repository.labels[label['name'].lower()] = label
+        return 201, label
+
+    def update_label(self, request, owner, repo, name):
+        repository = self.get_repo(owner, repo)
+        label = repository.labels.pop(unquote(name).lower(), None) if repository else None
+        if label is None:
+            return 404, {'message': 'Not Found'}
+
+        label = {
+            'name': request.body.get('new_name', label['name']),
+            'color': request.body.get('color', label['color']),
+        }
+        repository.labels[label['name'].lower()] = label
+        return 200, label
+
+    def delete_label(self, request, owner, repo, name):
+        repository = self.get_repo(owner, repo)
+        if repository is None or repository.labels.pop(unquote(name).lower(), None) is None:
+            return 404, {'message': 'Not Found'}
+        return 204, None
+
+    def put_contents(self, request, owner, repo, path):
+        repository = self.get_repo(owner, repo)
+        if repository is None:
+            return 404, {'message': 'Not Found'}
+
+        current = repository.files.get(path, None)
+        if current is not None and request.body.get('sha', None) != blob_sha(current):
+            return 409, {'message': '{} does not match {}'.format(path, request.body.get('sha', None))}
+
+        contents = base64.b64decode(request.body['content'])
+        oid = repository.commit({path: contents})
+        return 200 if current is not None else 201, {
+            'content': {'path': path, 'sha': blob_sha(contents)},
+            'commit': {'sha': oid},
+        }
+
+    def handle(self, request):
+        """(status, body, headers) for a request, where the body is JSON data or bytes"""
+        for route_method, pattern, handler in self.routes:
+            match = re.match(pattern, request.path)
+            if route_method == request.method and match:
+                with self.state_lock:
+                    response = handler(request, **match.groupdict())
+                status, data = response[:2]
+                return status, data, response[2] if len(response) > 2 else {}
+        return 404, {'message': 'Not Found'}, {}
+
+    def reset_counts(self):
+        with self.lock:
+            self.request_count = 0
+            self.bytes_sent = 0
+            self.bytes_received = 0
+
+    def make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers and body go out in separate writes
+            disable_nagle_algorithm = True
+
+            def respond(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                body = json.loads(raw.decode('utf-8')) if raw else None
+
+                if fake.latency:
+                    time.sleep(fake.latency)
+
+                request = FakeRequest(method, self.path, body=body, headers=self.headers)
+                status, data, headers = fake.handle(request)
+
+                content_type = 'application/json; charset=utf-8'
+                if data is None:
+                    payload = b''
+                elif isinstance(data, bytes):
+                    payload = data
+                    content_type = 'text/plain; charset=utf-8'
+                else:
+                    payload = json.dumps(data).encode('utf-8')
+
+                etag = None
+                if method == 'GET' and status == 200:
+                    etag = '"{}"'.format(hashlib.sha1(payload).hexdigest())
+                    if self.headers.get('If-None-Match', None) == etag:
+                        status = 304
+                        payload = b''
+
+                with fake.lock:
+                    fake.request_count += 1
+                    fake.bytes_sent += len(payload)
+                    fake.bytes_received += len(raw)
+
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.send_header('X-RateLimit-Limit', '5000')
+                self.send_header('X-RateLimit-Remaining', '5000')
+                self.send_header('X-RateLimit-Reset', str(int(time.time()) + 3600))
+                if etag is not None:
+                    self.send_header('ETag', etag)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self.respond('GET')
+
+            def do_POST(self):
+                self.respond('POST')
+
+            def do_PATCH(self):
+                self.respond('PATCH')
+
+            def do_PUT(self):
+                self.respond('PUT')
+
+            def do_DELETE(self):
+                self.respond('DELETE')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self, port=0):
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self.make_handler())
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self.url
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return 'http://{}:{}'.format(host, port)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
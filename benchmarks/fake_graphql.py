@@ -0,0 +1,255 @@
+"""Just enough of a GraphQL executor to answer the queries sweep sends
+
+Parses a single operation into fields, with aliases, arguments and inline
+fragments, and resolves them against plain Python objects. A field is a
+key of a dict, or an attribute of an object, called with the field's
+arguments if it's a method. There's no schema, so anything goes as long
+as the objects have the fields being asked for.
+"""
+import json
+import re
+
+
+TOKEN_RE = re.compile(r'''
+    (?P<ignored>[\s,]+|\#[^\n]*)
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<spread>\.\.\.)
+  | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<name>[_A-Za-z][_0-9A-Za-z]*)
+  | (?P<punctuator>[!$():=@\[\]{}|&])
+''', re.VERBOSE)
+
+CONSTANTS = {'true': True, 'false': False, 'null': None}
+
+
+class GraphqlError(Exception):
+    pass
+
+
+class NotFoundError(GraphqlError):
+    """Raised by a top level field that resolves to nothing, like GitHub's NOT_FOUND
+
+    The field is left null and the rest of the query still resolves.
+    """
+
+
+class Field(object):
+    def __init__(self, name, alias=None, arguments=None, selections=None):
+        self.name = name
+        self.alias = alias
+        self.arguments = arguments or {}
+        self.selections = selections
+
+    @property
+    def key(self):
+        return self.alias or self.name
+
+
+class InlineFragment(object):
+    def __init__(self, type_condition, selections):
+        self.type_condition = type_condition
+        self.selections = selections
+
+
+class Variable(object):
+    def __init__(self, name):
+        self.name = name
+
+
+def tokenize(source):
+    tokens = []
+    position = 0
+
+    while position < len(source):
+        match = TOKEN_RE.match(source, position)
+        if match is None:
+            raise GraphqlError('Syntax error at {!r}'.format(source[position:position + 20]))
+
+        position = match.end()
+        if match.lastgroup != 'ignored':
+            tokens.append((match.lastgroup, match.group()))
+
+    return tokens
+
+
+class Parser(object):
+    def __init__(self, source):
+        self.tokens = tokenize(source)
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None, None
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise GraphqlError('Unexpected end of query')
+        self.position += 1
+        return token
+
+    def skip(self, value):
+        if self.peek()[1] == value:
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, value):
+        _, token = self.next()
+        if token != value:
+            raise GraphqlError('Expected {!r}, got {!r}'.format(value, token))
+
+    def parse_operation(self):
+        """(operation type, selections) for a document with a single operation"""
+        operation = 'query'
+
+        if self.peek()[0] == 'name':
+            operation = self.next()[1]
+            if self.peek()[0] == 'name':
+                self.next()  # the operation's name
+            if self.peek()[1] == '(':
+                self.skip_variable_definitions()
+
+        return operation, self.parse_selections()
+
+    def skip_variable_definitions(self):
+        # types and defaults don't matter, the variables arrive as JSON
+        depth = 0
+        while True:
+            _, value = self.next()
+            if value == '(':
+                depth += 1
+            elif value == ')':
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def parse_selections(self):
+        self.expect('{')
+        selections = []
+        while not self.skip('}'):
+            selections.append(self.parse_selection())
+        return selections
+
+    def parse_selection(self):
+        if self.skip('...'):
+            self.expect('on')
+            type_condition = self.next()[1]
+            return InlineFragment(type_condition, self.parse_selections())
+
+        alias = None
+        name = self.next()[1]
+        if self.skip(':'):
+            alias, name = name, self.next()[1]
+
+        arguments = {}
+        if self.skip('('):
+            while not self.skip(')'):
+                argument = self.next()[1]
+                self.expect(':')
+                arguments[argument] = self.parse_value()
+
+        selections = self.parse_selections() if self.peek()[1] == '{' else None
+        return Field(name, alias=alias, arguments=arguments, selections=selections)
+
+    def parse_value(self):
+        kind, value = self.next()
+
+        if value == '$':
+            return Variable(self.next()[1])
+
+        if kind in ('string', 'number'):
+            return json.loads(value)
+
+        if value == '[':
+            items = []
+            while not self.skip(']'):
+                items.append(self.parse_value())
+            return items
+
+        if value == '{':
+            fields = {}
+            while not self.skip('}'):
+                name = self.next()[1]
+                self.expect(':')
+                fields[name] = self.parse_value()
+            return fields
+
+        # enum values come through as strings
+        return CONSTANTS.get(value, value)
+
+
+def substitute(value, variables):
+    if isinstance(value, Variable):
+        return variables.get(value.name, None)
+    if isinstance(value, list):
+        return [substitute(x, variables) for x in value]
+    if isinstance(value, dict):
+        return dict((k, substitute(v, variables)) for k, v in value.items())
+    return value
+
+
+def type_name(value):
+    if isinstance(value, dict):
+        return value.get('__typename', None)
+    return getattr(value, 'typename', type(value).__name__)
+
+
+def resolve_field(value, field, variables):
+    if field.name == '__typename':
+        return type_name(value)
+
+    if isinstance(value, dict):
+        if field.name not in value:
+            raise GraphqlError("Field '{}' doesn't exist on type '{}'".format(field.name, type_name(value)))
+        return value[field.name]
+
+    if not hasattr(value, field.name):
+        raise GraphqlError("Field '{}' doesn't exist on type '{}'".format(field.name, type_name(value)))
+
+    attribute = getattr(value, field.name)
+    if callable(attribute):
+        return attribute(**substitute(field.arguments, variables))
+    return attribute
+
+
+def resolve(value, selections, variables):
+    if value is None or selections is None:
+        return value
+
+    if isinstance(value, (list, tuple)):
+        return [resolve(x, selections, variables) for x in value]
+
+    data = {}
+    for selection in selections:
+        if isinstance(selection, InlineFragment):
+            if type_name(value) == selection.type_condition:
+                data.update(resolve(value, selection.selections, variables))
+            continue
+
+        field_value = resolve_field(value, selection, variables)
+        data[selection.key] = resolve(field_value, selection.selections, variables)
+
+    return data
+
+
+def execute(source, roots, variables=None):
+    """The response body for a query, given a root object for each operation type"""
+    try:
+        operation, selections = Parser(source).parse_operation()
+
+        data = {}
+        errors = []
+        for selection in selections:
+            try:
+                data.update(resolve(roots[operation], [selection], variables or {}))
+            except NotFoundError as e:
+                data[selection.key] = None
+                errors.append({'type': 'NOT_FOUND', 'path': [selection.key], 'message': str(e)})
+
+        if errors:
+            return {'data': data, 'errors': errors}
+        return {'data': data}
+    except GraphqlError as e:
+        return {'data': None, 'errors': [{'message': str(e)}]}
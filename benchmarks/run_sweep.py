@@ -0,0 +1,35 @@
+"""Run the sweep CLI for bench_suite, and save its peak memory use
+
+    python -m benchmarks.run_sweep STATS_PATH [OPTIONS] ORGANIZATION [ARGS...]
+
+Writes aren't paced, since the pacing is there for GitHub's secondary
+limits and would otherwise be most of the time a bulk action takes.
+"""
+import json
+import resource
+import sys
+
+
+def peak_rss():
+    """Peak resident memory of this process, in bytes"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes everywhere else
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def main():
+    stats_path = sys.argv[1]
+
+    from sweep.github import api
+    api.get_rate_limiter().write_interval = 0
+
+    from sweep.cli import organization
+    try:
+        organization.main(sys.argv[2:], prog_name='sweep', obj={})
+    finally:
+        with open(stats_path, 'w') as f:
+            json.dump({'peak_rss': peak_rss()}, f)
+
+
+if __name__ == '__main__':
+    main()
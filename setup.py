@@ -12,12 +12,12 @@ with open('HISTORY.rst') as history_file:
     history = history_file.read()
 
 requirements = [
-    'Click>=6.0',
+    'Click>=7.0',
     'requests',
     'prompt_toolkit',
     'pygments',
     'terminaltables',
-    'pygithub',
+    'futures; python_version < "3"',
 ]
 
 setup_requirements = [
@@ -2,10 +2,31 @@
 
 """Top-level package for sweep."""
 
-import pkg_resources
+import sys
 
 __author__ = """Dropseed, LLC"""
 __email__ = 'python@dropseed.io'
-__version__ = '0.1.0'
 
-__version__ = pkg_resources.get_distribution("sweep").version
+
+def get_version():
+    try:
+        from importlib.metadata import version
+    except ImportError:
+        # pkg_resources takes a while to import, so only as a fallback
+        import pkg_resources
+        return pkg_resources.get_distribution('sweep').version
+
+    return version('sweep')
+
+
+if sys.version_info >= (3, 7):
+    # look the version up the first time someone asks for it
+    def __getattr__(name):
+        if name == '__version__':
+            global __version__
+            __version__ = get_version()
+            return __version__
+
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+else:
+    __version__ = get_version()
@@ -2,19 +2,129 @@
 
 """Console script for sweep."""
 
+from collections import OrderedDict
+
 import click
 
 from .github import Organization, Repository, PullRequest
-from .github.pull_request import print_pulls_table
+from .github.api import warm_up, fetch_rate_limits
+from .github.bulk import BulkExecutor, FAILURE_POLICIES
+from .github.cache import configure_cache
+from .github.concurrency import set_max_workers, DEFAULT_MAX_WORKERS
+from .github.pull_request import print_pulls_table, DIFF_MAX_SIZE
+from .github.repository import LabelError
+from .github.file_updates import FileUpdate, plan_file_updates, apply_file_plan
+from .github.labels import plan_labels, apply_label_plan
+from .github.store import PullRequestStore, DEFAULT_MAX_AGE
+from .object_prompt import set_refresh_interval, DEFAULT_REFRESH_INTERVAL
+from .profiling import configure_profiling, PERCENTILES
+
+
+def echo_estimate(reads=0, writes=0, graphql_points=0):
+    """Tell the user how long a bulk action will take within the rate limits"""
+    import requests
+
+    try:
+        limiter = fetch_rate_limits()
+    except (requests.exceptions.RequestException, ValueError):
+        # only a heads up, so it shouldn't stop the action itself
+        click.secho('Couldn\'t get the rate limits to estimate how long this will take.', fg='yellow')
+        return
+
+    seconds = limiter.estimate(reads=reads, writes=writes, graphql_points=graphql_points)
+    duration = '{:.0f} seconds'.format(seconds) if seconds < 90 else '{:.0f} minutes'.format(seconds / 60)
+    click.secho('This will make about {} API requests and take at least {}.'.format(
+        reads + writes + graphql_points,
+        duration,
+    ), fg='yellow')
+
+
+def format_ms(seconds):
+    return '' if seconds is None else '{:.0f}'.format(seconds * 1000)
+
+
+def print_profile(profiler):
+    """Tables of each command's API requests and where its time went"""
+    from terminaltables import AsciiTable
+
+    table_data = [['Command', 'API', 'Calls'] + ['p{} ms'.format(p) for p in PERCENTILES] + ['Max ms', 'KB', 'Cost', 'Cache hits']]
+    for name, kind, stats in profiler.summaries():
+        table_data.append(
+            [name, kind, stats['calls']] +
+            [format_ms(stats['p{}'.format(p)]) for p in PERCENTILES] +
+            [
+                format_ms(stats['max']),
+                '{:.1f}'.format(stats['bytes'] / 1024.0),
+                '' if stats['cost'] is None else stats['cost'],
+                stats['cache_hits'],
+            ]
+        )
+    click.echo('', err=True)
+    click.echo(AsciiTable(table_data, 'API requests').table, err=True)
+
+    # requests overlap, so their total can be more than the wall time
+    table_data = [['Command', 'Wall s', 'Requests s', 'JSON s', 'Render s']]
+    for name, wall, requests, timings in profiler.timing_summaries():
+        table_data.append([name] + ['{:.2f}'.format(x) for x in (
+            wall,
+            requests,
+            timings.get('json', 0),
+            timings.get('render', 0),
+        )])
+    click.echo(AsciiTable(table_data, 'Time').table, err=True)
+
+
+def start_profiling(ctx, summary=False, trace_path=None, cprofile_path=None):
+    """Profile the command being run, reporting on it once it's done"""
+    profiler = configure_profiling(enabled=True)
+    profiler.start_command(ctx.invoked_subcommand or 'prompt')
+
+    cprofile = None
+    if cprofile_path:
+        import cProfile
+        cprofile = cProfile.Profile()
+        cprofile.enable()
+
+    def finish():
+        profiler.finish_command()
+
+        if cprofile is not None:
+            cprofile.disable()
+            cprofile.dump_stats(cprofile_path)
+        if trace_path:
+            profiler.write_trace(trace_path)
+        if summary:
+            print_profile(profiler)
+
+    ctx.call_on_close(finish)
 
 
 @click.group(invoke_without_command=True)
 @click.argument('organization')
+@click.option('--concurrency', default=DEFAULT_MAX_WORKERS, help='Max number of API requests to make at once')
+@click.option('--no-cache', is_flag=True, help='Don\'t use or store cached API responses')
+@click.option('--max-age', default=DEFAULT_MAX_AGE, help='Seconds before the local copy of open pull requests is synced')
+@click.option('--no-store', is_flag=True, help='Always get open pull requests from GitHub instead of the local copy')
+@click.option('--refresh-interval', default=DEFAULT_REFRESH_INTERVAL, help='Seconds before the repos and pull requests in a prompt are refreshed in the background')
+@click.option('--profile', is_flag=True, help='Summarize the API requests each command made, and where the time went, on exit')
+@click.option('--profile-trace', type=click.Path(dir_okay=False), help='Write every API request each command made to this JSON file')
+@click.option('--profile-cprofile', type=click.Path(dir_okay=False), help='Save cProfile stats for the main thread to this file')
 @click.pass_context
-def organization(ctx, organization):
+def organization(ctx, organization, concurrency, no_cache, max_age, no_store, refresh_interval, profile, profile_trace, profile_cprofile):
     """Interactively work through an organization's pull requests"""
 
-    organization = Organization(organization)
+    if profile or profile_trace or profile_cprofile:
+        start_profiling(ctx, summary=profile, trace_path=profile_trace, cprofile_path=profile_cprofile)
+
+    set_max_workers(concurrency)
+    set_refresh_interval(refresh_interval)
+    configure_cache(enabled=not no_cache)
+
+    # get the TCP/TLS handshake out of the way while we parse and prompt
+    warm_up()
+
+    store = None if no_store else PullRequestStore(max_age=max_age)
+    organization = Organization(organization, store=store)
     ctx.obj['organization'] = organization
 
     if ctx.invoked_subcommand is None:
@@ -41,58 +151,121 @@ def organization_overview(ctx):
     help='Filter by PR latest commit status',
     type=click.Choice(['PENDING', 'SUCCESS', 'FAILURE'])
 )
+@click.option('--author', default=None, help='Filter by PR author login')
+@click.option('--search/--no-search', default=True, help='Use the GitHub search API when the filters allow it')
 @click.pass_context
-def pulls(ctx, state, title, status):
+def pulls(ctx, state, title, status, author, search):
     """View or modify pull requests"""
 
     organization = ctx.obj['organization']
-    pulls = organization.filter_pulls(state=state, title=title, status=status)
-    ctx.obj['pulls'] = pulls
 
     if ctx.invoked_subcommand is None:
-        print_pulls_table(pulls)
+        # print them as the pages come in
+        print_pulls_table(
+            organization.iter_pulls(state=state, title=title, status=status, author=author, search=search),
+            pager=True,
+        )
+    else:
+        ctx.obj['pulls'] = organization.filter_pulls(state=state, title=title, status=status, author=author, search=search)
+
+
+def pull_repo_name(pull):
+    return pull.repo
+
+
+def print_bulk_summary(results, verb, cleanup_failed=None):
+    succeeded = [r for r in results if r.cleaned_up]
+    not_cleaned_up = [r for r in results if r.ok and not r.cleaned_up]
+    failed = [r for r in results if r.attempted and not r.ok]
+    not_attempted = [r for r in results if not r.attempted]
+
+    click.echo('')
+    click.secho('{} {}'.format(len(succeeded), verb), fg='green')
+    if not_cleaned_up:
+        click.secho('{} {}'.format(len(not_cleaned_up), cleanup_failed or verb + ', but not cleaned up'), fg='yellow')
+    if failed:
+        click.secho('{} failed'.format(len(failed)), fg='red')
+    if not_attempted:
+        click.secho('{} not attempted'.format(len(not_attempted)), fg='yellow')
+
+    if not_cleaned_up or failed or not_attempted:
+        table_data = [['Repo', 'Number', 'Result', 'Attempts']]
+        for result in not_cleaned_up + failed + not_attempted:
+            if result.ok:
+                outcome = '{}: {}'.format(cleanup_failed or verb, result.cleanup_error)
+            elif result.attempted:
+                outcome = str(result.error)
+            else:
+                outcome = 'not attempted'
+
+            table_data.append([
+                pull_repo_name(result.item),
+                result.item.number,
+                outcome,
+                result.attempts,
+            ])
+        from terminaltables import AsciiTable
+        click.echo(AsciiTable(table_data).table)
+
+
+on_error_option = click.option(
+    '--on-error',
+    default='stop',
+    type=click.Choice(FAILURE_POLICIES),
+    help='What to do when one fails: stop starting new ones, skip it, or retry it',
+)
 
 
-# TODO add merge mode
 @pulls.command('merge')
+@on_error_option
 @click.pass_context
-def merge_pulls(ctx):
+def merge_pulls(ctx, on_error):
     """Merge pull requests"""
     organization = ctx.obj['organization']
     pulls = ctx.obj['pulls']
     print_pulls_table(pulls)
+    # the merge and the branch delete
+    echo_estimate(writes=len(pulls) * 2)
 
     # will_delete = 'The branches will be deleted too.' if delete_branch else 'The branches will NOT be deleted.'
     if click.confirm(click.style('Are you sure you want to merge these pull requests?', fg='red')):
         if click.confirm(click.style('Are you positive!?', fg='red')):
-            for pull in pulls:
-                ctx.obj['repository'] = Repository(owner=organization, name=pull['repository']['name'])
-                ctx.obj['pull'] = PullRequest(repo=ctx.obj['repository'], number=pull['number'])
-                try:
-                    ctx.invoke(merge)
-                except Exception:
-                    click.secho('Failed to merge {}'.format(pull), fg='red')
-                    click.confirm('Continue with the rest?', abort=True)
+            def merge_pull(pull):
+                repo = Repository(owner=organization, name=pull_repo_name(pull))
+                pull_request = PullRequest(repo=repo, number=pull.number, data=pull.snapshot_data())
+                pull_request.squash_merge()
+                return pull_request
+
+            def clean_up_merge(pull, pull_request):
+                # ex. a 422 from repos that delete head branches themselves
+                pull_request.clean_up_merge(pull.head_ref, delete=True)
+
+            # each merge moves the base branch, so a repo's merges happen in order,
+            # and only the merge itself is retried
+            executor = BulkExecutor(merge_pull, group_key=pull_repo_name, cleanup=clean_up_merge, on_error=on_error)
+            print_bulk_summary(executor.run(pulls), 'merged', cleanup_failed='merged, branch not deleted')
 
 
 @pulls.command('close')
+@on_error_option
 @click.pass_context
-def close_pulls(ctx):
+def close_pulls(ctx, on_error):
     """Close pull requests"""
     organization = ctx.obj['organization']
     pulls = ctx.obj['pulls']
     print_pulls_table(pulls)
+    # the close and the branch delete
+    echo_estimate(writes=len(pulls) * 2)
 
     if click.confirm(click.style('Are you sure you want to close these pull requests?', fg='red')):
         if click.confirm(click.style('Are you positive!?', fg='red')):
-            for pull in pulls:
-                ctx.obj['repository'] = Repository(owner=organization, name=pull['repository']['name'])
-                ctx.obj['pull'] = PullRequest(repo=ctx.obj['repository'], number=pull['number'])
-                try:
-                    ctx.invoke(close)
-                except Exception:
-                    click.secho('Failed to close {}'.format(pull), fg='red')
-                    click.confirm('Continue with the rest?', abort=True)
+            def close_pull(pull):
+                repo = Repository(owner=organization, name=pull_repo_name(pull))
+                PullRequest(repo=repo, number=pull.number, data=pull.snapshot_data()).close(delete_branch=True)
+
+            # closes don't affect each other, even in the same repo
+            executor = BulkExecutor(close_pull, group_key=lambda pull: (pull.repo, pull.number), on_error=on_error)
+            print_bulk_summary(executor.run(pulls), 'closed')
 
 
 @organization.group('labels')
@@ -101,15 +274,57 @@ def organization_labels(ctx):
     pass
 
 
+def run_label_plan(organization, action, name, on_error, color=None, new_name=None):
+    # just the names, so this doesn't sync every open PR into the store
+    names = [repo['name'] for repo in organization.iter_children()]
+    click.secho('Checking the "{}" label in {} repos...'.format(name, len(names)), fg='yellow')
+    plans = plan_labels(organization, names, action, name, color=color, new_name=new_name)
+
+    to_apply = [plan for plan in plans if plan.action]
+    results = []
+
+    if to_apply:
+        click.secho('{} repos need changes.'.format(len(to_apply)))
+        echo_estimate(writes=len(to_apply))
+
+        def apply_plan(plan):
+            apply_label_plan(organization, plan, name, color=color, new_name=new_name)
+
+        executor = BulkExecutor(apply_plan, group_key=lambda plan: plan.name, on_error=on_error)
+        results = executor.run(to_apply)
+
+    print_plan_report(plans, results)
+
+
 @organization_labels.command('create')
 @click.argument('name')
 @click.argument('color')
+@on_error_option
 @click.pass_context
-def create_label_on_organization_repos(ctx, *args, **kwargs):
-    organization = ctx.obj['organization']
-    for repo in organization.get_children():
-        ctx.obj['repository'] = Repository(owner=organization, name=repo['name'])
-        ctx.invoke(create_repo_label, *args, **kwargs)
+def create_label_on_organization_repos(ctx, name, color, on_error):
+    """Create a label, or recolor it where it already exists"""
+    run_label_plan(ctx.obj['organization'], 'create', name, on_error, color=color)
+
+
+@organization_labels.command('update')
+@click.argument('name')
+@click.option('--color', default=None, help='New color')
+@click.option('--new-name', default=None, help='New name')
+@on_error_option
+@click.pass_context
+def update_label_on_organization_repos(ctx, name, color, new_name, on_error):
+    """Recolor or rename a label in the repos that have it"""
+    run_label_plan(ctx.obj['organization'], 'update', name, on_error, color=color, new_name=new_name)
+
+
+@organization_labels.command('delete')
+@click.argument('name')
+@on_error_option
+@click.pass_context
+def delete_label_on_organization_repos(ctx, name, on_error):
+    """Delete a label from the repos that have it"""
+    if click.confirm(click.style('Are you sure you want to delete the "{}" label from every repo?'.format(name), fg='red')):
+        run_label_plan(ctx.obj['organization'], 'delete', name, on_error)
 
 
 @organization.group('files')
@@ -118,18 +333,85 @@ def organization_files(ctx):
     pass
 
 
+# outcomes that get listed in the report, and their colors
+PROBLEM_OUTCOMES = {
+    'mismatched': 'yellow',
+    'failed': 'red',
+    'not attempted': 'yellow',
+}
+
+
+def print_plan_report(plans, results):
+    """What happened in each repo of a plan, with a table of the ones that need attention"""
+    results = dict((result.item.name, result) for result in results)
+
+    def outcome(plan):
+        result = results.get(plan.name, None)
+        if result is None or result.ok:
+            return plan.result
+        return 'failed' if result.attempted else 'not attempted'
+
+    rows = [(plan, outcome(plan)) for plan in plans]
+
+    counts = OrderedDict()
+    for _, name in rows:
+        counts[name] = counts.get(name, 0) + 1
+
+    click.echo('')
+    for name, count in counts.items():
+        color = None if name == 'skipped' else PROBLEM_OUTCOMES.get(name, 'green')
+        click.secho('{} {}'.format(count, name), fg=color)
+
+    problems = [x for x in rows if x[1] in PROBLEM_OUTCOMES]
+    if problems:
+        table_data = [['Repo', 'Result', 'Details']]
+        for plan, name in problems:
+            result = results.get(plan.name, None)
+            details = str(result.error) if result is not None and result.error else plan.details()
+            table_data.append([plan.name, name, details])
+        from terminaltables import AsciiTable
+        click.echo(AsciiTable(table_data).table)
+
+
 @organization_files.command('update')
 @click.argument('path_in_repo', type=str)
 @click.argument('matching_file_path', type=click.Path(exists=True))
 @click.argument('to_file_path', type=click.Path(exists=True))
+@click.option(
+    '--also',
+    type=(str, click.Path(exists=True), click.Path(exists=True)),
+    multiple=True,
+    metavar='PATH_IN_REPO MATCHING_FILE_PATH TO_FILE_PATH',
+    help='Another file to update, in the same commit',
+)
 @click.option('--commit-message')
+@on_error_option
 @click.pass_context
-def update_repo_file(ctx, *args, **kwargs):
+def update_organization_repos_file(ctx, path_in_repo, matching_file_path, to_file_path, also, commit_message, on_error):
     """Update a file in a repo that matches an existing file"""
     organization = ctx.obj['organization']
-    for repo in organization.get_children():
-        ctx.obj['repository'] = Repository(owner=organization, name=repo['name'])
-        ctx.invoke(update_repo_file, *args, **kwargs)
+    updates = [FileUpdate(path_in_repo, matching_file_path, to_file_path)]
+    updates += [FileUpdate(*x) for x in also]
+
+    # just the names, so this doesn't sync every open PR into the store
+    names = [repo['name'] for repo in organization.iter_children()]
+    click.secho('Checking {} file(s) in {} repos...'.format(len(updates), len(names)), fg='yellow')
+    plans = plan_file_updates(organization, names, updates)
+
+    to_apply = [plan for plan in plans if plan.writes]
+    results = []
+
+    if to_apply:
+        click.secho('{} repos need updating.'.format(len(to_apply)))
+        echo_estimate(writes=len(to_apply))
+
+        def apply_plan(plan):
+            apply_file_plan(organization, plan, commit_message=commit_message)
+
+        executor = BulkExecutor(apply_plan, group_key=lambda plan: plan.name, on_error=on_error)
+        results = executor.run(to_apply)
+
+    print_plan_report(plans, results)
 
 
 @organization.group(invoke_without_command=True)
@@ -186,7 +468,10 @@ def repo_labels(ctx):
 @click.pass_context
 def create_repo_label(ctx, name, color):
     repo = ctx.obj['repository']
-    repo.create_label(name, color)
+    try:
+        repo.create_label(name, color)
+    except LabelError as e:
+        click.secho(str(e), fg='red')
 
 
 @repo.group('files')
@@ -250,11 +535,23 @@ def open(ctx):
 
 
 @pull.command()
+@click.option('--max-size', default=DIFF_MAX_SIZE // (1024 * 1024), help='MB of diff to show before summarizing the rest (0 for no limit)')
+@click.option('--syntax', is_flag=True, help='Highlight the code in each file too (slower)')
 @click.pass_context
-def diff(ctx):
+def diff(ctx, max_size, syntax):
     """View git diff of PR"""
     pull = ctx.obj['pull']
-    pull.diff()
+    pull.diff(max_size=max_size * 1024 * 1024, syntax=syntax)
+
+
+@pull.command('file')
+@click.argument('filename', required=False)
+@click.option('--syntax', is_flag=True, help='Highlight the code too')
+@click.pass_context
+def file_diff(ctx, filename, syntax):
+    """View the diff of one file in the PR"""
+    pull = ctx.obj['pull']
+    pull.file_diff(filename, syntax=syntax)
 
 
 @pull.command()
@@ -277,7 +574,8 @@ def comment(ctx):
     click.secho('Comment created.', fg='green')
 
 
-cli = organization(obj={})
+def cli():
+    organization(obj={})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,107 @@
+"""Finding completions among many choices, without prompt_toolkit
+
+Kept apart from the completers so prompts can keep their choices up to
+date without importing prompt_toolkit until one is shown.
+"""
+import bisect
+import threading
+
+
+# sorts after anything that can follow a prefix
+PREFIX_END = u'\U0010ffff'
+
+
+class CompletionIndex(object):
+    """Sorted words to complete from, found by prefix with a binary search
+
+    Built once per set of choices and then updated with only what changed,
+    so it can be shared by every keystroke of a prompt. Can also rank fuzzy
+    matches, where the typed characters appear in order anywhere in a word.
+    """
+    def __init__(self, words=()):
+        self.words = []
+        self.word_set = set()
+        self.lock = threading.Lock()
+        self.update(words)
+
+    def __contains__(self, word):
+        return word in self.word_set
+
+    def __len__(self):
+        return len(self.words)
+
+    def __iter__(self):
+        return iter(list(self.words))
+
+    def update(self, words):
+        words = set(words)
+
+        with self.lock:
+            removed = self.word_set - words
+            added = words - self.word_set
+
+            if len(removed) + len(added) > len(words) // 2:
+                # mostly new, cheaper to sort from scratch
+                self.words = sorted(words)
+            else:
+                for word in removed:
+                    del self.words[bisect.bisect_left(self.words, word)]
+                for word in added:
+                    bisect.insort(self.words, word)
+
+            self.word_set = words
+
+    def complete(self, prefix):
+        with self.lock:
+            start = bisect.bisect_left(self.words, prefix)
+            end = bisect.bisect_left(self.words, prefix + PREFIX_END, lo=start)
+            return self.words[start:end]
+
+    def fuzzy(self, query, limit=50):
+        """Best matching words for query, skipping plain prefix matches"""
+        query = query.lower()
+        if not query:
+            return []
+
+        with self.lock:
+            words = self.words
+
+        scored = []
+        for word in words:
+            score = fuzzy_score(query, word.lower())
+            if score is not None and score > 0:
+                scored.append((-score, len(word), word))
+
+        scored.sort()
+        return [word for _, _, word in scored[:limit]]
+
+
+def fuzzy_score(query, word):
+    """How well query matches word in order, None if it doesn't
+
+    Starting at the beginning of the word or a separator and matching runs
+    of characters score higher. Prefix matches score 0, since the prefix
+    search already has them.
+    """
+    if word.startswith(query):
+        return 0
+
+    score = 0
+    position = 0
+    previous = -2
+
+    for char in query:
+        found = word.find(char, position)
+        if found < 0:
+            return None
+
+        if found == previous + 1:
+            score += 3
+        if found == 0 or word[found - 1] in '-_./ ':
+            score += 2
+        score += 1
+
+        previous = found
+        position = found + 1
+
+    return score
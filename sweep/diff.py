@@ -0,0 +1,102 @@
+"""Colorizing unified diffs for the terminal
+
+How a diff line looks only depends on how it starts, so the fast path is a
+lookup on the first character and a couple of precomputed escape codes.
+Pygments is only imported for syntax highlighting the code inside hunks,
+which is much slower and off by default.
+"""
+import click
+
+
+RESET = '\x1b[0m'
+
+
+def style_prefix(**styles):
+    # the escape codes click.style would open with, without text or a reset
+    return click.style('', reset=False, **styles)
+
+
+HEADER_STYLE = style_prefix(bold=True)
+HUNK_STYLE = style_prefix(fg='cyan')
+ADDED_STYLE = style_prefix(fg='green')
+REMOVED_STYLE = style_prefix(fg='red')
+NO_NEWLINE_STYLE = style_prefix(dim=True)
+
+# styles for lines in a hunk, by first character
+HUNK_LINE_STYLES = {
+    '+': ADDED_STYLE,
+    '-': REMOVED_STYLE,
+    '@': HUNK_STYLE,
+    '\\': NO_NEWLINE_STYLE,
+}
+
+
+class DiffColorizer(object):
+    """Colorizes a unified diff a line at a time
+
+    Keeps track of whether it's in a file header or a hunk, since "--- a"
+    is the old file name in one and a removed line in the other. With
+    `syntax`, the code in each hunk is highlighted by Pygments too, using
+    the lexer for the file's name.
+    """
+    def __init__(self, syntax=False):
+        self.syntax = syntax
+        self.in_header = True
+        self.lexer = None
+        self.formatter = None
+
+    def colorize(self, lines):
+        for line in lines:
+            yield self.colorize_line(line)
+
+    def colorize_line(self, line):
+        first = line[:1]
+
+        if first == 'd' and line.startswith('diff '):
+            self.in_header = True
+            if self.syntax:
+                self.lexer = lexer_for_diff_header(line)
+
+        if self.in_header:
+            if first != '@':
+                return wrap(HEADER_STYLE, line)
+            self.in_header = False
+
+        if self.lexer is not None and first in ('+', '-', ' '):
+            return self.highlight_code(first, line)
+
+        style = HUNK_LINE_STYLES.get(first, None)
+        if style is None:
+            return line
+
+        return wrap(style, line)
+
+    def highlight_code(self, marker, line):
+        from pygments import highlight
+        from pygments.formatters import TerminalFormatter
+
+        if self.formatter is None:
+            self.formatter = TerminalFormatter()
+
+        code = highlight(line[1:], self.lexer, self.formatter)
+        style = HUNK_LINE_STYLES.get(marker, None)
+        return (wrap(style, marker) if style else marker) + code
+
+
+def wrap(style, line):
+    # reset before the newline, so a pager doesn't carry the color over
+    if line.endswith('\n'):
+        return style + line[:-1] + RESET + '\n'
+    return style + line + RESET
+
+
+def lexer_for_diff_header(line):
+    """Pygments lexer for the new file in a "diff --git a/x b/x" line, if there is one"""
+    from pygments.lexers import get_lexer_for_filename
+    from pygments.util import ClassNotFound
+
+    path = line.rstrip('\n').rsplit(' b/', 1)[-1]
+    try:
+        return get_lexer_for_filename(path, stripnl=False, ensurenl=False)
+    except ClassNotFound:
+        return None
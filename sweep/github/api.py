@@ -1,16 +1,62 @@
-import re
-from copy import deepcopy
+import json
 import os
+import re
+import threading
+import time
 import click
-import requests
+
+from .cache import get_cache
+from .concurrency import get_max_workers, run_concurrently
+from ..profiling import get_profiler, timed, with_cost_field, COST_ALIAS
+from .ratelimit import RateLimiter
+
+
+# can point somewhere else, like GitHub Enterprise or a local test server
+API_URL = os.environ.get('SWEEP_GITHUB_API_URL', 'https://api.github.com')
+
+# min number of keep-alive connections held open to the API
+POOL_MAXSIZE = 32
+
+# bytes read at a time when streaming a response
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# the most items GitHub will put in a page of a REST list
+MAX_PER_PAGE = 100
+
+LAST_PAGE_RE = re.compile(r'<[^>]*[?&]page=(\d+)[^>]*>;\s*rel="last"')
+
+_session = None
+_github_token = None
+_headers = None
+_lock = threading.Lock()
+_rate_limiter = RateLimiter()
 
 
 class GraphqlErrorsException(Exception):
     pass
 
 
+def get_token_file_path():
+    return os.path.expanduser('~/.sweep/github_token')
+
+
 def get_github_token():
-    token_file_path = os.path.expanduser('~/.sweep/github_token')
+    global _github_token
+
+    # only read the token from disk once per process
+    if _github_token is None:
+        with _lock:
+            if _github_token is None:
+                _github_token = load_github_token()
+
+    return _github_token
+
+
+def load_github_token():
+    if os.environ.get('SWEEP_GITHUB_TOKEN', None):
+        return os.environ['SWEEP_GITHUB_TOKEN']
+
+    token_file_path = get_token_file_path()
     if not os.path.exists(token_file_path):
         click.secho('We didn\'t find a GitHub API token in {}.'.format(token_file_path))
         click.secho('Please go to https://github.com/settings/tokens and generate a new token with these permissions:')
@@ -18,7 +64,10 @@ def get_github_token():
         click.secho('')
         token = click.prompt('Enter the token and we\'ll save it to {}'.format(token_file_path))
 
-        os.makedirs(os.path.dirname(token_file_path))  # probably don't have ~/.sweep yet
+        directory = os.path.dirname(token_file_path)
+        if not os.path.isdir(directory):
+            # the store and cache might have made ~/.sweep already
+            os.makedirs(directory)
         with open(token_file_path, 'w+') as f:
             f.write(token)
 
@@ -29,67 +78,363 @@ def get_github_token():
 
 
 def get_headers():
-    token = get_github_token()
-    headers = {'Authorization': 'token {}'.format(token)}
-    return headers
+    global _headers
+
+    if _headers is None:
+        _headers = {'Authorization': 'token {}'.format(get_github_token())}
+
+    # callers are free to modify what they get back
+    return dict(_headers)
+
+
+def get_session():
+    """Process-wide session, so requests reuse keep-alive connections"""
+    global _session
+
+    if _session is None:
+        with _lock:
+            if _session is None:
+                # imported here, it's a big part of startup time
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                # enough for every worker to keep its own connection alive
+                pool_maxsize = max(POOL_MAXSIZE, get_max_workers())
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+
+    return _session
+
+
+def warm_up():
+    """Open a connection to the API in the background
+
+    Uses /rate_limit, which doesn't count against the rate limit. Only
+    authenticates if the token is already saved, so this never prompts.
+    """
+    def run():
+        import requests
+
+        has_token = os.environ.get('SWEEP_GITHUB_TOKEN', None) or os.path.exists(get_token_file_path())
+        headers = get_headers() if has_token else {}
+        try:
+            response = get_session().get(API_URL + '/rate_limit', headers=headers)
+        except requests.exceptions.RequestException:
+            return  # the real request will surface any connection problems
+
+        if headers and response.ok:
+            _rate_limiter.update_from_rate_limit(response.json())
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def get_rate_limiter():
+    return _rate_limiter
+
+
+def fetch_rate_limits():
+    """Refresh what we know about the rate limits (doesn't count against them)"""
+    response = get_session().get(API_URL + '/rate_limit', headers=get_headers())
+    response.raise_for_status()
+    _rate_limiter.update_from_rate_limit(response.json())
+    return _rate_limiter
+
+
+def is_write(method, endpoint, json_data):
+    if endpoint == '/graphql':
+        return json_data['query'].lstrip().startswith('mutation')
+    return method not in ('GET', 'HEAD')
+
+
+def request(method, endpoint, headers={}, **kwargs):
+    request_headers = get_headers()
+    request_headers.update(headers)
+
+    resource = _rate_limiter.resource_for(endpoint)
+    write = is_write(method, endpoint, kwargs.get('json', None))
+
+    attempt = 0
+    while True:
+        _rate_limiter.wait(resource, write=write)
+
+        started_at = time.time()
+        response = get_session().request(method, API_URL + endpoint, headers=request_headers, **kwargs)
+        _rate_limiter.update(resource, response)
+
+        profiler = get_profiler()
+        if profiler is not None:
+            profiler.record_request(
+                'graphql' if endpoint == '/graphql' else 'rest',
+                method,
+                endpoint,
+                response,
+                started_at=started_at,
+                seconds=time.time() - started_at,
+                streamed=kwargs.get('stream', False),
+            )
+
+        delay = _rate_limiter.retry_delay(response, attempt)
+        if delay is None:
+            return response
+
+        click.secho('Hit a GitHub rate limit, retrying in {:.0f} seconds...'.format(delay), fg='yellow')
+        attempt += 1
+
+
+def get_path(data, path):
+    if path:
+        for p in path.split('.'):
+            data = data[p]
+    return data
+
+
+def graphql(query, to_return_path=None, page_info_path=None, variables=None):
+    if page_info_path:
+        return list(iter_graphql(query, to_return_path, page_info_path, variables=variables))
+
+    return get_path(graphql_data(query, variables), to_return_path)
+
+
+def is_missing_field_error(error, data):
+    """Whether a GraphQL error is only a top level field that wasn't found
+
+    GitHub answers a repository that doesn't exist (anymore) with a null
+    field and a NOT_FOUND error pointing at it, rather than failing the
+    rest of the query.
+    """
+    path = error.get('path', None) or []
+    return error.get('type', None) == 'NOT_FOUND' and len(path) == 1 and data.get(path[0], None) is None
+
 
+def graphql_data(query, variables=None, allow_missing=False):
+    """The data of a GraphQL response
 
-def graphql(query, to_return_path=None, page_info_path=None, after=None):
-    if after:
-        query = re.sub('after: .*\)', 'after: "{}")'.format(after), query)
+    With allow_missing, top level fields that weren't found are left null
+    instead of raising, for batched queries of aliased fields.
+    """
+    profiler = get_profiler()
+    if profiler is not None:
+        query = with_cost_field(query)
 
-    response = requests.post(
-        'https://api.github.com/graphql',
-        headers=get_headers(),
-        json={'query': query}
-    )
+    response = request('POST', '/graphql', json={'query': query, 'variables': variables or {}})
 
     response.raise_for_status()
 
-    errors = response.json().get('errors', None)
+    with timed('json'):
+        response_json = response.json()
+
+    errors = response_json.get('errors', None)
+    data = response_json.get('data', None)
+
+    if errors and allow_missing and data is not None:
+        errors = [error for error in errors if not is_missing_field_error(error, data)]
+
     if errors:
         raise GraphqlErrorsException(errors)
 
-    data = response.json()['data']
-    if data == None:
+    if data is None:
         raise Exception('No data in response.\n{}'.format(response.text))
 
-    data_to_return = deepcopy(data)
+    if profiler is not None and COST_ALIAS in data:
+        profiler.add_cost(response, (data.pop(COST_ALIAS) or {}).get('cost', None))
 
-    if to_return_path:
-        for p in to_return_path.split('.'):
-            data_to_return = data_to_return[p]
+    return data
 
-    if page_info_path:
-        # we'll are going to assume there's only 1 paginated object
-        # and it's in the top 2 levels
-        page_info = deepcopy(data)
-        for p in page_info_path.split('.'):
-            page_info = page_info[p]
+
+def iter_graphql(query, to_return_path, page_info_path, variables=None):
+    """Yield the items at to_return_path, page by page
+
+    The query should declare an `$after: String` variable and pass it to
+    the paginated connection, which is assumed to be the only one.
+    """
+    variables = dict(variables or {})
+
+    while True:
+        data = graphql_data(query, variables)
+
+        for item in get_path(data, to_return_path):
+            yield item
+
+        page_info = get_path(data, page_info_path)
 
         if 'endCursor' not in page_info:
             raise Exception('pageInfo not found, but we didn\'t try very hard.')
 
-        if page_info['hasNextPage']:
-            next_data = graphql(query, to_return_path=to_return_path, page_info_path=page_info_path, after=page_info['endCursor'])
-            data_to_return = data_to_return + next_data
+        if not page_info['hasNextPage']:
+            return
 
-    return data_to_return
+        variables['after'] = page_info['endCursor']
 
 
-def rest(requests_func, endpoint, data=None, headers={}):
-    request_headers = get_headers()
-    request_headers.update(headers)
+def rest(method, endpoint, data=None, headers={}):
+    if method == 'GET':
+        return get_page(endpoint, headers=headers)[0]
 
-    response = requests_func(
-        'https://api.github.com' + endpoint,
-        headers=request_headers,
-        json=data,
-    )
+    response = request(method, endpoint, headers=headers, json=data)
 
     response.raise_for_status()
 
+    return parse_body(response.text)
+
+
+def get_page(endpoint, headers={}):
+    """GET the endpoint, returning the parsed body and its Link header"""
+    cache = get_cache()
+    if cache is not None:
+        text, link = cached_get(cache, endpoint, headers=headers)
+        return parse_body(text), link
+
+    response = request('GET', endpoint, headers=headers)
+
+    response.raise_for_status()
+
+    return parse_body(response.text), response.headers.get('Link', None)
+
+
+def iter_rest_list(endpoint, per_page=MAX_PER_PAGE, max_workers=None):
+    """Yield every item of a paginated REST list, in order
+
+    The first page's Link header says how many pages there are, then the
+    rest are fetched concurrently. Each page is yielded as soon as the ones
+    before it are in.
+    """
+    separator = '&' if '?' in endpoint else '?'
+    page_endpoint = endpoint + separator + 'per_page={}&page='.format(per_page)
+
+    items, link = get_page(page_endpoint + '1')
+    for item in items:
+        yield item
+
+    last_page = get_last_page(link)
+    if last_page is None:
+        return
+
+    def get_items(page):
+        return get_page(page_endpoint + str(page))[0]
+
+    arrived = {}
+    next_page = 2
+    for page, items, error in run_concurrently(get_items, range(2, last_page + 1), max_workers=max_workers):
+        if error is not None:
+            raise error
+
+        arrived[page] = items
+        while next_page in arrived:
+            for item in arrived.pop(next_page):
+                yield item
+            next_page += 1
+
+
+def get_last_page(link):
+    match = LAST_PAGE_RE.search(link or '')
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def iter_lines(endpoint, headers={}):
+    """Yield the lines of a GET response as they arrive, line endings included
+
+    Goes through the cache like rest() does, but never holds the whole body:
+    a cached copy is read back from disk, and a fresh one is written to the
+    cache as it streams by. Closing the generator early drops the connection.
+    """
+    cache = get_cache()
+    cached = None
+
+    request_headers = dict(headers)
+    if cache is not None:
+        key = cache.key(endpoint, headers.get('Accept', None))
+        cached = cache.get(key)
+        if cached is not None:
+            request_headers.update(cached.validators())
+
+    response = request('GET', endpoint, headers=request_headers, stream=True)
+    writer = None
+
+    try:
+        if response.status_code == 304 and cached is not None:
+            for line in iter_text_lines(cached.iter_chunks(STREAM_CHUNK_SIZE), cached.encoding):
+                yield line
+            return
+
+        response.raise_for_status()
+
+        encoding = response.encoding or 'utf-8'
+        chunks = response.iter_content(STREAM_CHUNK_SIZE)
+
+        profiler = get_profiler()
+        if profiler is not None:
+            chunks = counted_chunks(profiler, response, chunks)
+
+        if cache is not None:
+            writer = cache.writer(key, response.headers, encoding=encoding)
+            if writer is not None:
+                chunks = writer.tee(chunks)
+
+        for line in iter_text_lines(chunks, encoding):
+            yield line
+
+        if writer is not None:
+            writer.commit()
+            writer = None
+    finally:
+        response.close()
+        if writer is not None:
+            writer.abort()  # only saw part of it
+
+
+def counted_chunks(profiler, response, chunks):
+    for chunk in chunks:
+        profiler.add_response_bytes(response, len(chunk))
+        yield chunk
+
+
+def iter_text_lines(chunks, encoding):
+    pending = b''
+    for chunk in chunks:
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield (line + b'\n').decode(encoding, 'replace')
+
+    if pending:
+        yield pending.decode(encoding, 'replace')
+
+
+def parse_body(text):
     try:
-        return response.json()
+        with timed('json'):
+            return json.loads(text)
     except ValueError:
-        return response.text
+        return text
+
+
+def cached_get(cache, endpoint, headers={}):
+    """GET the endpoint's text and Link header, revalidating a cached copy if we have one
+
+    GitHub doesn't count 304 responses against the rate limit.
+    """
+    key = cache.key(endpoint, headers.get('Accept', None))
+    cached = cache.get(key)
+
+    request_headers = dict(headers)
+    if cached is not None:
+        request_headers.update(cached.validators())
+
+    response = request('GET', endpoint, headers=request_headers)
+
+    if response.status_code == 304 and cached is not None:
+        return cached.text(), cached.link
+
+    response.raise_for_status()
+
+    cache.put(key, response.headers, response.content, encoding=response.encoding)
+
+    return response.text, response.headers.get('Link', None)
@@ -0,0 +1,153 @@
+from .api import graphql_data, get_path
+from .concurrency import run_concurrently
+
+
+# GitHub allows far more than this, but large queries get slow and start
+# timing out well before hitting the hard limits
+DEFAULT_MAX_NODES = 10000
+DEFAULT_MAX_ALIASES = 50
+
+
+class Connection(object):
+    """A paginated connection to fetch as part of a batched query
+
+    `field` is a top level GraphQL field (no alias) that passes `$after` to
+    the connection at `connection_path`, relative to the field. The
+    connection should select `pageInfo { endCursor hasNextPage }` and either
+    `nodes` or `edges { node }`.
+    """
+    def __init__(self, key, field, connection_path, node_cost=100):
+        self.key = key
+        self.field = field
+        self.connection_path = connection_path
+        # roughly how many nodes one page of this costs, nested ones included
+        self.node_cost = node_cost
+        self.after = None
+
+
+class GraphqlBatcher(object):
+    """Fetch many connections with as few requests as possible
+
+    Connections are packed into aliased fields of a single query, up to the
+    node and alias budgets, and connections with more pages are batched up
+    again until they're all exhausted. Batches are sent concurrently, so
+    nodes from different connections can arrive in any order.
+    """
+    def __init__(self, max_nodes=DEFAULT_MAX_NODES, max_aliases=DEFAULT_MAX_ALIASES, max_workers=None):
+        self.max_nodes = max_nodes
+        self.max_aliases = max_aliases
+        self.max_workers = max_workers
+        self.request_count = 0
+
+    def iter_batches(self, connections):
+        batch = []
+        batch_nodes = 0
+
+        for connection in connections:
+            over_budget = batch_nodes + connection.node_cost > self.max_nodes
+            if batch and (over_budget or len(batch) >= self.max_aliases):
+                yield batch
+                batch = []
+                batch_nodes = 0
+
+            batch.append(connection)
+            batch_nodes += connection.node_cost
+
+        if batch:
+            yield batch
+
+    def build_query(self, batch):
+        declarations = []
+        fields = []
+        variables = {}
+
+        for i, connection in enumerate(batch):
+            alias = 'b{}'.format(i)
+            variable = alias + '_after'
+            declarations.append('${}: String'.format(variable))
+            fields.append('{}: {}'.format(alias, connection.field.replace('$after', '$' + variable)))
+            variables[variable] = connection.after
+
+        query = 'query({}) {{\n{}\n}}'.format(', '.join(declarations), '\n'.join(fields))
+        return query, variables
+
+    def fetch_batch(self, batch):
+        """Fetch one page of each connection in the batch
+
+        Returns a list of (connection, nodes, has_next_page) and leaves the
+        cursor for the next page on each connection.
+        """
+        query, variables = self.build_query(batch)
+        data = graphql_data(query, variables, allow_missing=True)
+
+        results = []
+        for i, connection in enumerate(batch):
+            field_data = data.get('b{}'.format(i), None)
+            if field_data is None:
+                # ex. the repo was deleted or renamed since we listed it
+                results.append((connection, [], False))
+                continue
+
+            connection_data = get_path(field_data, connection.connection_path)
+            if 'nodes' in connection_data:
+                nodes = connection_data['nodes']
+            else:
+                nodes = [edge['node'] for edge in connection_data['edges']]
+
+            page_info = connection_data['pageInfo']
+            connection.after = page_info['endCursor']
+            results.append((connection, nodes, page_info['hasNextPage']))
+
+        return results
+
+    def fetch_fields(self, batch):
+        query = 'query {{\n{}\n}}'.format('\n'.join(
+            'b{}: {}'.format(i, field) for i, (_, field) in enumerate(batch)
+        ))
+        data = graphql_data(query, allow_missing=True)
+        return [(key, data.get('b{}'.format(i), None)) for i, (key, _) in enumerate(batch)]
+
+    def iter_fields(self, fields):
+        """Yield (key, data) for each (key, field), for fields that don't paginate
+
+        Fields are packed into aliased queries up to the alias budget, and
+        the queries are sent concurrently.
+        """
+        fields = list(fields)
+        batches = [fields[i:i + self.max_aliases] for i in range(0, len(fields), self.max_aliases)]
+
+        for _, results, error in run_concurrently(self.fetch_fields, batches, max_workers=self.max_workers):
+            if error is not None:
+                raise error
+
+            self.request_count += 1
+
+            for key, data in results:
+                yield key, data
+
+    def iter_nodes(self, connections):
+        """Yield (key, node) for every node of every connection
+
+        `connections` can be any iterable, so the first pages can be
+        fetched while it is still being produced.
+        """
+        pending = connections
+
+        while pending:
+            next_pending = []
+
+            batches = self.iter_batches(pending)
+            for _, results, error in run_concurrently(self.fetch_batch, batches, max_workers=self.max_workers):
+                if error is not None:
+                    raise error
+
+                self.request_count += 1
+
+                for connection, nodes, has_next_page in results:
+                    for node in nodes:
+                        yield connection.key, node
+
+                    if has_next_page:
+                        next_pending.append(connection)
+
+            pending = next_pending
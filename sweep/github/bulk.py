@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .concurrency import run_concurrently
+
+
+FAILURE_POLICIES = ('stop', 'skip', 'retry')
+
+# seconds to wait before the first retry, doubling each time after
+RETRY_BACKOFF = 2
+
+
+class BulkResult(object):
+    def __init__(self, item, error=None, attempts=0):
+        self.item = item
+        self.error = error
+        self.attempts = attempts
+        self.value = None
+        self.cleanup_error = None
+
+    @property
+    def attempted(self):
+        return self.attempts > 0
+
+    @property
+    def ok(self):
+        return self.attempted and self.error is None
+
+    @property
+    def cleaned_up(self):
+        return self.ok and self.cleanup_error is None
+
+
+class BulkExecutor(object):
+    """Run an action over many items, concurrently across groups
+
+    Items that share a group key (ex. PRs in the same repo) run one after
+    another in their original order, since each can change what the next one
+    sees. Separate groups run in parallel. When an action fails, `on_error`
+    decides what happens next:
+
+    - stop: finish what's running, but don't start anything else
+    - skip: carry on with the rest
+    - retry: try again up to `retries` more times, then carry on
+
+    `cleanup` is called with the item and what the action returned, once the
+    action succeeds (ex. deleting a merged branch). It's never retried and
+    its errors don't affect the policy, so an action that worked is never
+    repeated. They end up in the result's `cleanup_error`.
+    """
+    def __init__(self, action, group_key, cleanup=None, max_workers=None, on_error='stop', retries=2):
+        if on_error not in FAILURE_POLICIES:
+            raise ValueError('on_error must be one of {}'.format(', '.join(FAILURE_POLICIES)))
+
+        self.action = action
+        self.group_key = group_key
+        self.cleanup = cleanup
+        self.max_workers = max_workers
+        self.on_error = on_error
+        self.retries = retries if on_error == 'retry' else 0
+        self.stopped = threading.Event()
+
+    def run_item(self, item):
+        result = BulkResult(item)
+
+        while True:
+            result.attempts += 1
+            try:
+                result.value = self.action(item)
+                result.error = None
+                break
+            except Exception as e:
+                result.error = e
+
+            if result.attempts > self.retries:
+                if self.on_error == 'stop':
+                    self.stopped.set()
+                return result
+
+            time.sleep(RETRY_BACKOFF * 2 ** (result.attempts - 1))
+
+        if self.cleanup is not None:
+            try:
+                self.cleanup(item, result.value)
+            except Exception as e:
+                result.cleanup_error = e
+
+        return result
+
+    def run_group(self, items):
+        results = []
+        for item in items:
+            if self.stopped.is_set():
+                results.append(BulkResult(item))
+            else:
+                results.append(self.run_item(item))
+        return results
+
+    def iter_results(self, items):
+        """Yield a BulkResult for every item, a group at a time as each finishes"""
+        groups = OrderedDict()
+        for item in items:
+            groups.setdefault(self.group_key(item), []).append(item)
+
+        for _, results, error in run_concurrently(self.run_group, groups.values(), max_workers=self.max_workers):
+            if error is not None:
+                raise error
+
+            for result in results:
+                yield result
+
+    def run(self, items):
+        return list(self.iter_results(items))
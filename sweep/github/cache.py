@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+CACHE_DIR = os.path.expanduser('~/.sweep/cache')
+
+DEFAULT_MAX_SIZE = 200 * 1024 * 1024  # bytes
+
+_cache = None
+_enabled = True
+_max_size = DEFAULT_MAX_SIZE
+
+
+def configure_cache(enabled=True, max_size=DEFAULT_MAX_SIZE):
+    global _cache, _enabled, _max_size
+    _enabled = enabled
+    _max_size = max_size
+    _cache = None
+
+
+def get_cache():
+    """The shared response cache, or None if caching is turned off"""
+    global _cache
+
+    if not _enabled:
+        return None
+
+    if _cache is None:
+        _cache = ResponseCache(CACHE_DIR, max_size=_max_size)
+
+    return _cache
+
+
+class CachedResponse(object):
+    def __init__(self, cache, key, meta):
+        self.cache = cache
+        self.key = key
+        self.meta = meta
+
+    @property
+    def body_path(self):
+        return self.cache.body_path(self.key)
+
+    @property
+    def link(self):
+        return self.meta.get('link', None)
+
+    @property
+    def encoding(self):
+        return self.meta.get('encoding', None) or 'utf-8'
+
+    def validators(self):
+        """Headers that ask GitHub for a 304 if this is still current"""
+        headers = {}
+        if self.meta.get('etag', None):
+            headers['If-None-Match'] = self.meta['etag']
+        if self.meta.get('last_modified', None):
+            headers['If-Modified-Since'] = self.meta['last_modified']
+        return headers
+
+    def read(self):
+        with open(self.body_path, 'rb') as f:
+            return f.read()
+
+    def iter_chunks(self, chunk_size):
+        with open(self.body_path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def text(self):
+        return self.read().decode(self.encoding, 'replace')
+
+
+class CacheWriter(object):
+    """Writes a body to the cache a chunk at a time
+
+    Nothing shows up in the cache until commit, and bodies that grow past
+    the cache's max size are dropped.
+    """
+    def __init__(self, cache, key, meta):
+        self.cache = cache
+        self.key = key
+        self.meta = meta
+        self.size = 0
+        fd, self.tmp_path = tempfile.mkstemp(dir=cache.path)
+        self.file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk):
+        if self.file is None:
+            return
+
+        self.size += len(chunk)
+        if self.size > self.cache.max_size:
+            self.abort()
+        else:
+            self.file.write(chunk)
+
+    def tee(self, chunks):
+        for chunk in chunks:
+            self.write(chunk)
+            yield chunk
+
+    def commit(self):
+        if self.file is None:
+            return
+
+        self.file.close()
+        self.file = None
+
+        previous_size = self.cache.entry_size(self.key)
+        os.rename(self.tmp_path, self.cache.body_path(self.key))
+        self.cache._write(self.cache.meta_path(self.key), json.dumps(self.meta).encode('utf-8'))
+        self.cache._saved(self.key, self.size, previous_size)
+
+    def abort(self):
+        if self.file is None:
+            return
+
+        self.file.close()
+        self.file = None
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+class ResponseCache(object):
+    """On-disk cache of GET responses that GitHub gave us validators for
+
+    Entries are keyed by endpoint and Accept header, and the least recently
+    used ones are evicted once the total size goes over max_size.
+    """
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self._size = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(endpoint, accept=None):
+        raw = u'{} {}'.format(endpoint, accept or '').encode('utf-8')
+        return hashlib.sha1(raw).hexdigest()
+
+    def meta_path(self, key):
+        return os.path.join(self.path, key + '.json')
+
+    def body_path(self, key):
+        return os.path.join(self.path, key + '.body')
+
+    def get(self, key):
+        try:
+            with open(self.meta_path(key), 'r') as f:
+                meta = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if not os.path.exists(self.body_path(key)):
+            return None
+
+        self.touch(key)
+        return CachedResponse(self, key, meta)
+
+    def touch(self, key):
+        # the meta file's mtime is our "last used" for LRU eviction
+        try:
+            os.utime(self.meta_path(key), None)
+        except OSError:
+            pass
+
+    def put(self, key, headers, body, encoding=None):
+        writer = self.writer(key, headers, encoding=encoding)
+        if writer is not None:
+            writer.write(body)
+            writer.commit()
+
+    def writer(self, key, headers, encoding=None):
+        """A CacheWriter to save a response as it's read, or None if it can't be cached"""
+        meta = {
+            'etag': headers.get('ETag', None),
+            'last_modified': headers.get('Last-Modified', None),
+            'content_type': headers.get('Content-Type', None),
+            'link': headers.get('Link', None),
+            'encoding': encoding,
+        }
+        if not meta['etag'] and not meta['last_modified']:
+            return None  # nothing to revalidate with
+
+        if not os.path.exists(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                pass  # another thread beat us to it
+
+        return CacheWriter(self, key, meta)
+
+    def _write(self, path, content):
+        # write then rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.path)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.rename(tmp_path, path)
+
+    def _saved(self, key, size, previous_size):
+        with self._lock:
+            if self._size is not None:
+                self._size += size - previous_size
+
+        self.evict()
+
+    def entry_size(self, key):
+        try:
+            return os.path.getsize(self.body_path(key))
+        except OSError:
+            return 0
+
+    def entries(self):
+        """(last used, key, size) for everything in the cache"""
+        if not os.path.exists(self.path):
+            return []
+
+        entries = []
+        for filename in os.listdir(self.path):
+            if not filename.endswith('.json'):
+                continue
+            key = filename[:-len('.json')]
+            try:
+                last_used = os.path.getmtime(self.meta_path(key))
+            except OSError:
+                continue
+            entries.append((last_used, key, self.entry_size(key)))
+        return entries
+
+    def evict(self):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, _, size in self.entries())
+
+            if self._size <= self.max_size:
+                return
+
+            for _, key, size in sorted(self.entries()):
+                for path in (self.meta_path(key), self.body_path(key)):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                self._size -= size
+                if self._size <= self.max_size:
+                    break
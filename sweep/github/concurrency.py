@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+DEFAULT_MAX_WORKERS = 8
+
+_max_workers = DEFAULT_MAX_WORKERS
+
+
+def get_max_workers():
+    return _max_workers
+
+
+def set_max_workers(max_workers):
+    global _max_workers
+    _max_workers = max(1, int(max_workers))
+
+
+def run_concurrently(func, items, max_workers=None):
+    """Call func on each item with a bounded number of threads
+
+    Yields (item, result, exception) as each call finishes, so the caller
+    decides what a failure means. Items are pulled from the iterable only
+    as workers free up, so it can be a generator that is still streaming in.
+    """
+    if max_workers is None:
+        max_workers = get_max_workers()
+
+    items = iter(items)
+
+    if max_workers == 1:
+        # nothing to gain from a thread, and it keeps tracebacks simple
+        for item in items:
+            try:
+                yield item, func(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {}
+
+    def submit_next():
+        for item in items:
+            futures[executor.submit(func, item)] = item
+            return True
+        return False
+
+    try:
+        while len(futures) < max_workers and submit_next():
+            pass
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = futures.pop(future)
+                submit_next()
+
+                error = future.exception()
+                if error is not None:
+                    yield item, None, error
+                else:
+                    yield item, future.result(), None
+    finally:
+        # if the caller stops early, let running calls finish but start no more
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
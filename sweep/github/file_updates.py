@@ -0,0 +1,134 @@
+import json
+
+import click
+
+from .batch import GraphqlBatcher
+from .repository import Repository, git_blob_sha, matching_blob_shas
+
+
+# each repo in a planning query looks up every path, so fewer repos fit
+PLAN_MAX_OBJECTS = 100
+
+
+class FileUpdate(object):
+    """Replace path_in_repo with the contents of to_file_path, where it matches matching_file_path"""
+    def __init__(self, path_in_repo, matching_file_path, to_file_path):
+        self.path_in_repo = path_in_repo.lstrip('/')
+        self.matching_shas = matching_blob_shas(matching_file_path)
+
+        with open(to_file_path, 'rb') as f:
+            self.contents = f.read()
+
+        # nothing to do where it's already been updated
+        self.updated_sha = git_blob_sha(self.contents)
+
+
+class RepoFilePlan(object):
+    """What to change in one repo, worked out from a single lookup"""
+    def __init__(self, name, branch=None, head_oid=None):
+        self.name = name
+        self.branch = branch
+        self.head_oid = head_oid
+        self.writes = []  # (FileUpdate, current blob sha)
+        self.mismatched = []
+        # matched, but not written because another path in the repo didn't
+        self.held_back = []
+        self.missing = []
+        self.already_updated = []
+
+    @property
+    def result(self):
+        if self.writes:
+            return 'updated'
+        if self.mismatched:
+            return 'mismatched'
+        return 'skipped'
+
+    def details(self):
+        details = []
+        for label, updates in (
+            ('updated', [update for update, _ in self.writes]),
+            ('different', self.mismatched),
+            ('not updated', self.held_back),
+            ('missing', self.missing),
+            ('already updated', self.already_updated),
+        ):
+            if updates:
+                details.append('{}: {}'.format(label, ', '.join(x.path_in_repo for x in updates)))
+        return '; '.join(details)
+
+
+def plan_field(organization, name, updates):
+    objects = '\n'.join(
+        """f%s: object(expression: %s) {
+             ... on Blob {
+               oid
+             }
+           }""" % (i, json.dumps('HEAD:' + update.path_in_repo))
+        for i, update in enumerate(updates)
+    )
+    return """repository(owner: %s, name: %s) {
+                defaultBranchRef {
+                  name
+                  target {
+                    oid
+                  }
+                }
+                %s
+              }""" % (json.dumps(organization.name), json.dumps(name), objects)
+
+
+def plan_file_updates(organization, repo_names, updates):
+    """A RepoFilePlan for every repo, looking up every path in batched queries"""
+    fields = [(name, plan_field(organization, name, updates)) for name in repo_names]
+    batcher = GraphqlBatcher(max_aliases=max(1, PLAN_MAX_OBJECTS // len(updates)))
+
+    plans = {}
+    for name, data in batcher.iter_fields(fields):
+        if data is None or data['defaultBranchRef'] is None:
+            plans[name] = RepoFilePlan(name)  # empty repo
+            plans[name].missing = list(updates)
+            continue
+
+        branch = data['defaultBranchRef']
+        plan = RepoFilePlan(name, branch=branch['name'], head_oid=branch['target']['oid'])
+
+        for i, update in enumerate(updates):
+            blob = data['f{}'.format(i)]
+            oid = blob.get('oid', None) if blob else None
+
+            if oid is None:
+                plan.missing.append(update)
+            elif oid == update.updated_sha:
+                plan.already_updated.append(update)
+            elif oid in update.matching_shas:
+                plan.writes.append((update, oid))
+            else:
+                plan.mismatched.append(update)
+
+        if plan.mismatched:
+            # all or nothing, so a repo doesn't end up with half the change
+            plan.held_back = [update for update, _ in plan.writes]
+            plan.writes = []
+
+        plans[name] = plan
+
+    return [plans[name] for name in repo_names]
+
+
+def apply_file_plan(organization, plan, commit_message=None):
+    """Write a repo's changes, all in one commit"""
+    repository = Repository(owner=organization, name=plan.name)
+
+    if len(plan.writes) == 1:
+        update, oid = plan.writes[0]
+        repository.write_file(update.path_in_repo, update.contents, oid, commit_message=commit_message)
+    else:
+        repository.commit_files(
+            plan.branch,
+            plan.head_oid,
+            dict((update.path_in_repo, update.contents) for update, _ in plan.writes),
+            commit_message=commit_message,
+        )
+
+    click.secho('Updated {} in {}'.format(', '.join(u.path_in_repo for u, _ in plan.writes), repository), fg='green')
@@ -0,0 +1,74 @@
+from .batch import GraphqlBatcher
+from .repository import Repository
+
+
+RESULTS = {
+    'create': 'created',
+    'update': 'updated',
+    'delete': 'deleted',
+    None: 'skipped',
+}
+
+
+class RepoLabelPlan(object):
+    """What to do with a label in one repo, given the label it has now (if any)"""
+    def __init__(self, name, action=None, existing=None):
+        self.name = name
+        self.action = action
+        self.existing = existing
+
+    @property
+    def result(self):
+        return RESULTS[self.action]
+
+    def details(self):
+        if self.existing is None:
+            return 'no label'
+        return '{} #{}'.format(self.existing['name'], self.existing['color'])
+
+
+def plan_label_action(action, existing, name, color=None, new_name=None):
+    """The action a repo needs, or None if it's already how it should be"""
+    if color is not None:
+        color = color.lstrip('#').lower()
+
+    if action == 'delete':
+        return 'delete' if existing else None
+
+    if existing is None:
+        # updates only apply where the label is already used
+        return 'create' if action == 'create' else None
+
+    wanted_name = new_name or name
+    if (color is not None and existing['color'].lower() != color) or existing['name'] != wanted_name:
+        return 'update'
+
+    return None
+
+
+def plan_labels(organization, repo_names, action, name, color=None, new_name=None):
+    """A RepoLabelPlan for every repo, looking up the label in batched queries"""
+    fields = [(repo_name, Repository(owner=organization, name=repo_name).label_field(name)) for repo_name in repo_names]
+
+    plans = {}
+    for repo_name, data in GraphqlBatcher(max_aliases=100).iter_fields(fields):
+        existing = data['label'] if data else None
+        plans[repo_name] = RepoLabelPlan(
+            repo_name,
+            action=plan_label_action(action, existing, name, color=color, new_name=new_name),
+            existing=existing,
+        )
+
+    return [plans[repo_name] for repo_name in repo_names]
+
+
+def apply_label_plan(organization, plan, name, color=None, new_name=None):
+    repository = Repository(owner=organization, name=plan.name)
+
+    if plan.action == 'create':
+        repository.create_label(name, color)
+    elif plan.action == 'update':
+        # the existing name, which might differ in case
+        repository.update_label(plan.existing['name'], color=color, new_name=new_name or name)
+    elif plan.action == 'delete':
+        repository.delete_label(plan.existing['name'])
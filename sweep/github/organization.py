@@ -1,17 +1,46 @@
 import re
 
 import click
-from terminaltables import AsciiTable
 
-from .api import graphql, GraphqlErrorsException
+from .api import graphql, iter_graphql
+from .batch import Connection, GraphqlBatcher
 from .repository import Repository
-from .pull_request import PullRequest, get_pull_request_state
+from .pull_record import PullRecord
+from .pull_request import PullRequest, PULL_REQUEST_LISTING_FIELDS
 from ..object_prompt import ObjectPrompt
+from ..table import echo_table
+
+
+SEARCH_STATE_QUALIFIERS = {
+    'OPEN': 'is:open',
+    'CLOSED': 'is:closed is:unmerged',
+    'MERGED': 'is:merged',
+}
+
+# GitHub won't return more results than this for a single search
+SEARCH_RESULT_LIMIT = 1000
+
+SEARCH_PULLS_QUERY = """query($query: String!, $after: String) {
+                        search(type: ISSUE, query: $query, first: 100, after: $after) {
+                          issueCount
+                          pageInfo {
+                            endCursor
+                            hasNextPage
+                          }
+                          nodes {
+                            ... on PullRequest {
+                              %s
+                            }
+                          }
+                        }
+                      }""" % PULL_REQUEST_LISTING_FIELDS
 
 
 class Organization(ObjectPrompt):
-    def __init__(self, name, *args, **kwargs):
+    def __init__(self, name, store=None, *args, **kwargs):
         self.name = name
+        # optional local PullRequestStore to read from instead of the API
+        self.store = store
         super(Organization, self).__init__(
             child_key='name',
             pre_prompt_message='Enter a repo name or command (TAB for options).',
@@ -26,105 +55,149 @@ class Organization(ObjectPrompt):
         return self.name
 
     def get_children(self):
+        if self.store is not None:
+            self.store.ensure_synced(self)
+            return self.store.repos(self.name)
+
+        return list(self.iter_children())
+
+    def iter_children(self):
         click.secho('Getting {} repos...'.format(self), fg='yellow')
-        query = """query {
-                  organization(login: "%s") {
-                    repositories(first: 100, after: null) {
+        field = """organization(login: "%s") {
+                    repositories(first: 100, after: $after) {
                       pageInfo {
                         endCursor
                         hasNextPage
                       }
-                      edges {
-                        node {
-                          name
-                          pullRequests(states: OPEN) {
-                            totalCount
-                          }
+                      nodes {
+                        name
+                        pullRequests(states: OPEN) {
+                          totalCount
                         }
                       }
                     }
-                  }
-                }""" % self.name
+                  }""" % self.name
 
-        repo_nodes = graphql(query, to_return_path='organization.repositories.edges', page_info_path='organization.repositories.pageInfo')
-        repos = [x['node'] for x in repo_nodes]
-        return repos
+        connection = Connection(self.name, field, 'repositories')
+        for _, repo in GraphqlBatcher().iter_nodes([connection]):
+            yield repo
 
     def repos_with_pulls(self):
         if not self.children:
-            self.children = self.get_children()
+            self.set_children(self.get_children())
 
         return [x for x in self.children if x['pullRequests']['totalCount']]
 
+    def iter_repos_with_pulls(self):
+        # stream the repos in if we don't have them yet
+        repos = self.children or self.iter_children()
+        for repo in repos:
+            if repo['pullRequests']['totalCount']:
+                yield repo
+
     def get_child_object_prompt(self, key):
         return Repository(owner=self, name=key)
 
     def overview(self, refresh=True):
         if refresh:
-            self.children = self.get_children()
+            self.set_children(self.get_children())
 
         click.clear()
 
         repos = self.repos_with_pulls()
 
-        table_data = [
-            ['Repos ({})'.format(len(repos)), 'Pull requests ({})'.format(sum([repo['pullRequests']['totalCount'] for repo in repos]))],
+        headers = [
+            'Repos ({})'.format(len(repos)),
+            'Pull requests ({})'.format(sum([repo['pullRequests']['totalCount'] for repo in repos])),
         ]
-        for repo in repos:
-            table_data.append([
-                repo['name'],
-                '{} open'.format(repo['pullRequests']['totalCount']),
-            ])
-        table = AsciiTable(table_data)
-        click.echo(table.table)
-
-    def filter_pulls(self, state, title, status):
-        pulls = []
-
-        for repo in self.repos_with_pulls():
-            query = """query {
-                        repository(owner: "%s", name: "%s") {
-                          pullRequests(states: %s, first: 100, after: null) {
-                            totalCount
-                            pageInfo {
-                              endCursor
-                              hasNextPage
-                            }
-                            edges {
-                             node {
-                               title
-                               number
-                               author {
-                                 login
-                               }
-                               commits(last: 1) {
-                                 totalCount
-                                 edges {
-                                     node {
-                                       commit {
-                                         status {
-                                           id
-                                           state
-                                         }
-                                       }
-                                     }
-                                  }
-                                }
-                               repository { name }
-                             }
-                            }
-                          }
-                        }
-                    }""" % (self.name, repo['name'], state.upper())
+        rows = ((repo['name'], '{} open'.format(repo['pullRequests']['totalCount'])) for repo in repos)
+        echo_table(headers, rows)
+
+    def filter_pulls(self, state, title, status, author=None, search=True):
+        return list(self.iter_pulls(state, title, status, author=author, search=search))
+
+    def iter_pulls(self, state, title, status, author=None, search=True):
+        pulls = None
+
+        if self.store is not None and state.upper() == 'OPEN':
+            # the store only keeps track of open pull requests
+            self.store.ensure_synced(self)
+            pulls = self.store.pulls(self.name)
+
+        if pulls is None and search:
+            query = self.search_query(state, status, author)
+            if query is not None:
+                pulls = self.iter_searched_pulls(query)
+
+        if pulls is None:
+            pulls = self.iter_repo_pulls(state)
+
+        # search only matches whole words, so titles are only filtered
+        # here, and the rest are cheap to double check
+        for pull in pulls:
+            if title and not re.search(title, pull.title):
+                continue
+
+            if status is not None and pull.status != status:
+                continue
+
+            if author is not None and (pull.author or '').lower() != author.lower():
+                continue
+
+            yield pull
+
+    def search_query(self, state, status, author):
+        """GitHub search query for these filters, or None if it can't express them
+
+        The title regex is left out, because "dep" in:title wouldn't find
+        "deps" or "dependency".
+        """
+        if state.upper() not in SEARCH_STATE_QUALIFIERS:
+            return None
+
+        terms = ['org:' + self.name, 'is:pr', SEARCH_STATE_QUALIFIERS[state.upper()]]
+
+        if author:
+            terms.append('author:' + author)
+
+        if status:
+            terms.append('status:' + status.lower())
+
+        return ' '.join(terms)
+
+    def iter_searched_pulls(self, query):
+        """Pull requests matching a search, or None if there are too many to search"""
+        click.secho('Searching for "{}"...'.format(query), fg='yellow')
+        first_page = graphql(SEARCH_PULLS_QUERY, variables={'query': query})['search']
+
+        if first_page['issueCount'] > SEARCH_RESULT_LIMIT:
+            click.secho('Too many results to search, looking through each repo instead.', fg='yellow')
+            return None
+
+        def iter_pulls():
+            for node in first_page['nodes']:
+                yield PullRecord.from_node(node)
+
+            page_info = first_page['pageInfo']
+            if page_info['hasNextPage']:
+                variables = {'query': query, 'after': page_info['endCursor']}
+                for node in iter_graphql(SEARCH_PULLS_QUERY, 'search.nodes', 'search.pageInfo', variables=variables):
+                    yield PullRecord.from_node(node)
 
-            pull_nodes = graphql(query, to_return_path='repository.pullRequests.edges', page_info_path='repository.pullRequests.pageInfo')
-            repo_pulls = [x['node'] for x in pull_nodes]
-            pulls += repo_pulls
+        return iter_pulls()
 
-        if title:
-            pulls = [x for x in pulls if re.search(title, x['title'])]
+    def iter_repo_pulls(self, state, batcher=None):
+        if batcher is None:
+            batcher = GraphqlBatcher()
 
-        if status is not None:
-            pulls = [x for x in pulls if get_pull_request_state(x) == status]
+        def connections():
+            for repo in self.iter_repos_with_pulls():
+                repository = Repository(owner=self, name=repo['name'])
+                first = 100
+                if state.upper() == 'OPEN':
+                    # no sense paying for more than we know is there
+                    first = min(first, repo['pullRequests']['totalCount'])
+                yield repository.pulls_connection(states=state.upper(), first=first)
 
-        return pulls
+        for _, node in batcher.iter_nodes(connections()):
+            yield PullRecord.from_node(node)
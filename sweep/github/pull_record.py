@@ -0,0 +1,81 @@
+from .pull_request import get_pull_request_state
+
+
+class PullRecord(object):
+    """A pull request in a list of them, flattened into just what we use
+
+    Built once from a listing node or a store row, so the nested GraphQL
+    dicts can be dropped. Slots keep tens of thousands of these small.
+    """
+    # in the same order as the store's columns
+    __slots__ = (
+        'repo',
+        'number',
+        'id',
+        'title',
+        'author',
+        'state',
+        'head_sha',
+        'head_ref',
+        'status',
+        'commit_count',
+        'updated_at',
+    )
+
+    def __init__(self, repo, number, id=None, title=None, author=None, state=None, head_sha=None,
+                 head_ref=None, status=None, commit_count=0, updated_at=None):
+        self.repo = repo
+        self.number = number
+        self.id = id
+        self.title = title
+        self.author = author  # login, or None for deleted users
+        self.state = state
+        self.head_sha = head_sha
+        self.head_ref = head_ref
+        self.status = status  # latest commit's status, or None
+        self.commit_count = commit_count
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_node(cls, node):
+        """From a node with PULL_REQUEST_LISTING_FIELDS"""
+        return cls(
+            repo=node['repository']['name'],
+            number=node['number'],
+            id=node['id'],
+            title=node['title'],
+            author=node['author']['login'] if node['author'] else None,
+            state=node['state'],
+            head_sha=node['headRefOid'],
+            head_ref=node['headRefName'],
+            status=get_pull_request_state(node),
+            commit_count=node['commits']['totalCount'],
+            updated_at=node['updatedAt'],
+        )
+
+    def to_row(self):
+        return tuple(getattr(self, x) for x in self.__slots__)
+
+    def snapshot_data(self):
+        """What a PullRequestSnapshot can start with, in the shape GraphQL gives it"""
+        return {
+            'id': self.id,
+            'number': self.number,
+            'title': self.title,
+            'state': self.state,
+            'updatedAt': self.updated_at,
+            'headRefName': self.head_ref,
+            'headRefOid': self.head_sha,
+            'author': {'login': self.author} if self.author else None,
+        }
+
+    def __eq__(self, other):
+        return isinstance(other, PullRecord) and self.to_row() == other.to_row()
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'PullRecord({}#{})'.format(self.repo, self.number)
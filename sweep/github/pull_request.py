@@ -1,26 +1,213 @@
-import urllib
 import webbrowser
+from collections import OrderedDict
+try:
+    from urllib import quote_plus
+except ImportError:
+    from urllib.parse import quote_plus
 
-import requests
 import click
-from prompt_toolkit import prompt
-from prompt_toolkit.contrib.completers import WordCompleter
-from pygments import highlight
-from pygments.lexers import DiffLexer
-from pygments.formatters import TerminalFormatter
-from terminaltables import AsciiTable
-
-from .api import graphql, rest
-from ..prompt_validators import ChoiceValidator
+
+from .api import graphql, iter_lines, iter_rest_list, rest
+from ..table import echo_table
+from ..diff import DiffColorizer
 from ..hooks import run_hook
 from .state import styled_state, color_for_state
 from ..object_prompt import ObjectPrompt
 
 
+# what we need to know about each PR in a list of them, including everything
+# in PullRequest.REQUIRED_FIELDS so bulk actions don't have to ask again
+PULL_REQUEST_LISTING_FIELDS = """id
+                          title
+                          number
+                          state
+                          updatedAt
+                          headRefName
+                          headRefOid
+                          author {
+                            login
+                          }
+                          commits(last: 1) {
+                            totalCount
+                            edges {
+                              node {
+                                commit {
+                                  status {
+                                    id
+                                    state
+                                  }
+                                }
+                              }
+                            }
+                          }
+                          repository { name }"""
+
+
+# diffs bigger than this get a summary instead of the rest of the diff
+DIFF_MAX_SIZE = 20 * 1024 * 1024  # bytes
+
+# lines of a diff to send to the pager at a time while it streams in
+DIFF_BATCH_LINES = 500
+
+
+# GitHub stops listing a PR's files after this many
+FILES_LIST_LIMIT = 3000
+
+# rendered file diffs to keep while flipping between files
+RENDERED_PATCHES_MAX = 64
+
+
+# selections for each field a PullRequestSnapshot can fetch, keyed by the
+# name it comes back as
+PULL_REQUEST_FIELDS = {
+    'id': 'id',
+    'number': 'number',
+    'title': 'title',
+    'bodyText': 'bodyText',
+    'state': 'state',
+    'url': 'url',
+    'createdAt': 'createdAt',
+    'mergeable': 'mergeable',
+    'baseRefName': 'baseRefName',
+    'headRefName': 'headRefName',
+    'headRefOid': 'headRefOid',
+    'additions': 'additions',
+    'deletions': 'deletions',
+    'changedFiles': 'changedFiles',
+    'author': 'author { login }',
+    'comments': 'comments { totalCount }',
+    'reviews': 'reviews { totalCount }',
+    'reviewRequests': 'reviewRequests { totalCount }',
+    'commits': """commits(last: 1) {
+                    totalCount
+                    edges {
+                      node {
+                        commit {
+                          status {
+                            id
+                            state
+                          }
+                        }
+                      }
+                    }
+                  }""",
+    'lastCommit': """lastCommit: commits(last: 1) {
+                       nodes {
+                         commit {
+                           status {
+                             state
+                             contexts {
+                               context
+                               description
+                               state
+                               targetUrl
+                             }
+                           }
+                         }
+                       }
+                     }""",
+}
+
+
+class PullRequestSnapshot(object):
+    """What we know about a pull request, merged together field by field
+
+    Only the fields that are missing get queried, along with the head so we
+    notice if it moved. It's thrown away after we change the PR, or if the
+    head has moved.
+    """
+    def __init__(self, pull_request, data=None):
+        self.pull_request = pull_request
+        self.data = dict(data) if data else {}
+        # from the files endpoint, once something needs them
+        self.files = None
+
+    def get(self, *fields):
+        missing = [x for x in fields if x not in self.data]
+        if missing:
+            # the head always comes along, so we notice if it moved
+            self.fetch(set(missing) | set(['headRefOid']))
+
+            if any(x not in self.data for x in fields):
+                # the head moved and took the rest of what we had with it
+                self.fetch(set(fields) | set(['headRefOid']))
+
+        return self.data
+
+    def fetch(self, fields):
+        pull_request = self.pull_request
+        query = """query {
+                    repository(owner: "%s", name: "%s") {
+                      pullRequest(number: %s) {
+                        %s
+                      }
+                    }
+                }""" % (
+            pull_request.repo.owner.name,
+            pull_request.repo.name,
+            pull_request.number,
+            '\n'.join(PULL_REQUEST_FIELDS[x] for x in sorted(fields)),
+        )
+        data = graphql(query)['repository']['pullRequest']
+
+        head_moved = 'headRefOid' in data and self.data.get('headRefOid', data['headRefOid']) != data['headRefOid']
+        if head_moved:
+            # statuses, mergeability, files, etc. all go with the old head
+            self.data = {}
+            self.files = None
+
+        self.data.update(data)
+
+    def refresh(self):
+        self.data = {}
+        return self.get(*PULL_REQUEST_FIELDS)
+
+    def invalidate(self):
+        self.data = {}
+        self.files = None
+
+
+class RenderedPatches(object):
+    """Colorized file diffs, dropping the least recently viewed
+
+    Keyed by the file's blob sha, so a file that didn't change when new
+    commits are pushed doesn't have to be rendered again.
+    """
+    def __init__(self, max_entries=RENDERED_PATCHES_MAX):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        rendered = self.entries.pop(key, None)
+        if rendered is not None:
+            self.entries[key] = rendered
+        return rendered
+
+    def put(self, key, rendered):
+        self.entries.pop(key, None)
+        self.entries[key] = rendered
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
 class PullRequest(ObjectPrompt):
-    def __init__(self, repo, number, *args, **kwargs):
+    # fields each action needs, which a listing can provide up front
+    REQUIRED_FIELDS = {
+        'close': ('headRefName',),
+        'merge': ('title', 'headRefName', 'headRefOid'),
+        'review': ('id', 'headRefOid'),
+        'comment': ('id',),
+        'open': ('url',),
+        'diff_summary': ('changedFiles', 'additions', 'deletions'),
+        'overview': tuple(PULL_REQUEST_FIELDS),
+    }
+
+    def __init__(self, repo, number, data=None, *args, **kwargs):
         self.repo = repo
         self.number = int(number)
+        # what we already know about the PR, ex. a node from a listing query
+        self.snapshot = PullRequestSnapshot(self, data)
+        self.rendered_patches = RenderedPatches()
         super(PullRequest, self).__init__(
             child_key=None,
             pre_prompt_message='PR command',
@@ -37,7 +224,18 @@ class PullRequest(ObjectPrompt):
     def get_children(self):
         return []
 
+    def fields_for(self, action):
+        """The PR data an action needs, only querying if we don't have it"""
+        return self.snapshot.get(*self.REQUIRED_FIELDS[action])
+
+    def record_state(self, state):
+        store = getattr(self.repo.owner, 'store', None)
+        if store is not None:
+            store.set_pull_state(self.repo.owner.name, self.repo.name, self.number, state)
+
     def comment(self):
+        from prompt_toolkit import prompt
+
         # could complete usernames with @...
         click.secho('Enter comment (press ESC then ENTER to finish)')
         comment = prompt(
@@ -45,28 +243,26 @@ class PullRequest(ObjectPrompt):
             mouse_support=True,
             multiline=True,
         )
-        query = """query {
-                    repository(owner: "%s", name: "%s") {
-                      pullRequest(number: %s) {
-                        id
-                      }
-                    }
-                }""" % (self.repo.owner.name, self.repo.name, self.number)
-        pull_request_id = graphql(query)['repository']['pullRequest']['id']
+        pull_request_id = self.fields_for('comment')['id']
         mutation = """mutation {
                         addComment(input:{subjectId: "%s", body: "%s"}) {
                           clientMutationId
                         }
                       }""" % (pull_request_id, comment)
         graphql(mutation)
+        self.snapshot.invalidate()
 
     def review(self):
+        from prompt_toolkit import prompt
+        from prompt_toolkit.contrib.completers import WordCompleter
+        from ..prompt_validators import ChoiceValidator
+
         # could complete usernames with @...
         review_commands = ('approve', 'comment', 'request_changes')
         review = prompt(
             u'What kind of review? ',
             completer=WordCompleter(review_commands),
-            validator=ChoiceValidator(review_commands),
+            validator=ChoiceValidator(review_commands, commands=[]),
         )
         review = review.upper()
 
@@ -76,26 +272,9 @@ class PullRequest(ObjectPrompt):
             mouse_support=True,
             multiline=True,
         )
-        query = """query {
-                    repository(owner: "%s", name: "%s") {
-                      pullRequest(number: %s) {
-                        id
-                        commits(last: 1) {
-                          edges {
-                            node {
-                              commit {
-                                oid
-                              }
-                            }
-                          }
-                        }
-                      }
-                    }
-                }""" % (self.repo.owner.name, self.repo.name, self.number)
-
-        pull_data = graphql(query)['repository']['pullRequest']
+        pull_data = self.fields_for('review')
         pull_id = pull_data['id']
-        sha = pull_data['commits']['edges'][0]['node']['commit']['oid']
+        sha = pull_data['headRefOid']
 
         mutation = """mutation {
                         addPullRequestReview(input:{pullRequestId: "%s", commitOID: "%s", event: %s, body: "%s"}) {
@@ -103,47 +282,33 @@ class PullRequest(ObjectPrompt):
                         }
                       }""" % (pull_id, sha, review, comment)
         graphql(mutation)
+        self.snapshot.invalidate()
 
     def close(self, delete_branch=False):
+        pull_data = self.fields_for('close')
+
         endpoint = '/repos/{}/pulls/{}'.format(self.repo.full_name, self.number)
-        rest(requests.patch, endpoint, data={'state': 'closed'})
+        rest('PATCH', endpoint, data={'state': 'closed'})
         click.secho('{} closed.'.format(self), fg='green')
+        self.record_state('CLOSED')
+        self.snapshot.invalidate()
 
-        query = """query {
-                    repository(owner: "%s", name: "%s") {
-                      pullRequest(number: %s) {
-                        headRefName
-                      }
-                    }
-                }""" % (self.repo.owner.name, self.repo.name, self.number)
-        pull_data = graphql(query)['repository']['pullRequest']
         branch_name = pull_data['headRefName']
         if delete_branch or click.confirm('Delete the {} branch?'.format(branch_name)):
-            endpoint = '/repos/{}/git/refs/heads/{}'.format(self.repo.full_name, urllib.quote_plus(branch_name))
-            rest(requests.delete, endpoint)
+            endpoint = '/repos/{}/git/refs/heads/{}'.format(self.repo.full_name, quote_plus(branch_name))
+            rest('DELETE', endpoint)
             click.secho('{} deleted.'.format(branch_name), fg='green')
 
     def merge(self, delete=False):
-        query = """query {
-                    repository(owner: "%s", name: "%s") {
-                      pullRequest(number: %s) {
-                        title
-                        headRefName
-                        commits(last: 1) {
-                          edges {
-                            node {
-                              commit {
-                                oid
-                              }
-                            }
-                          }
-                        }
-                      }
-                    }
-                }""" % (self.repo.owner.name, self.repo.name, self.number)
-        pull_data = graphql(query)['repository']['pullRequest']
+        pull_data = self.squash_merge()
+        self.clean_up_merge(pull_data['headRefName'], delete=delete)
+
+    def squash_merge(self):
+        """Just the merge itself, returning the fields it was made with"""
+        pull_data = self.fields_for('merge')
         pull_title = pull_data['title']
-        sha = pull_data['commits']['edges'][0]['node']['commit']['oid']
+        # GitHub refuses the merge if the head has moved since we looked
+        sha = pull_data['headRefOid']
 
         # can't seem to merge with graphql yet
         endpoint = '/repos/{}/pulls/{}/merge'.format(self.repo.full_name, self.number)
@@ -153,69 +318,28 @@ class PullRequest(ObjectPrompt):
             'sha': sha,
             'merge_method': 'squash',
         }
-        rest(requests.put, endpoint, data)
+        rest('PUT', endpoint, data)
 
         click.secho('{} successfully merged.'.format(self), fg='green')
+        return pull_data
+
+    def clean_up_merge(self, branch_name, delete=False):
+        """Everything after a merge, which shouldn't lead to merging again if it fails"""
+        self.record_state('MERGED')
+        self.snapshot.invalidate()
 
         run_hook('post_merge', self.repo.name, self.number, self.repo.full_name)
 
-        branch_name = pull_data['headRefName']
         if delete or click.confirm('Delete the {} branch?'.format(branch_name)):
-            endpoint = '/repos/{}/git/refs/heads/{}'.format(self.repo.full_name, urllib.quote_plus(branch_name))
-            rest(requests.delete, endpoint)
+            endpoint = '/repos/{}/git/refs/heads/{}'.format(self.repo.full_name, quote_plus(branch_name))
+            rest('DELETE', endpoint)
             click.secho('{} deleted.'.format(branch_name), fg='green')
 
     def overview(self, refresh=True):
-        query = """query {
-                    repository(owner: "%s", name: "%s") {
-                      pullRequest(number: %s) {
-                        id
-                        number
-                        title
-                        bodyText
-                        baseRefName
-                        headRefName
-                        author {
-                          login
-                        }
-                        createdAt
-                        mergeable
-                        url
-                        comments {
-                          totalCount
-                        }
-                        reviews {
-                          totalCount
-                        }
-                        reviewRequests {
-                          totalCount
-                        }
-                        state
-                        commits(last: 1) {
-                          totalCount
-                          edges {
-                              node {
-                                commit {
-                                  status {
-                                    id
-                                    state
-                                    contexts {
-                                      context
-                                      description
-                                      state
-                                      targetUrl
-                                    }
-                                  }
-                                }
-                              }
-                            }
-                          }
-                      }
-                    }
-                }""" % (self.repo.owner.name, self.repo.name, self.number)
-
-        query_data = graphql(query)
-        overview = query_data['repository']['pullRequest']
+        if refresh:
+            overview = self.snapshot.refresh()
+        else:
+            overview = self.fields_for('overview')
 
         click.clear()
         click.secho(self.repo.full_name)
@@ -244,7 +368,7 @@ class PullRequest(ObjectPrompt):
         else:
             click.echo('Mergeable: ' + click.style(u'\u2718', fg='red'))
 
-        last_commit_status = overview['commits']['edges'][0]['node']['commit']['status']
+        last_commit_status = overview['lastCommit']['nodes'][0]['commit']['status']
 
         if last_commit_status:
             click.echo('Status: ' + styled_state(last_commit_status['state'], short=False))
@@ -256,28 +380,99 @@ class PullRequest(ObjectPrompt):
 
         click.secho('\n--------------------\n')
 
-    def diff(self):
+    def diff(self, max_size=DIFF_MAX_SIZE, syntax=False):
+        click.echo_via_pager(self.iter_diff(max_size=max_size, syntax=syntax))
+
+    def iter_diff(self, max_size=DIFF_MAX_SIZE, syntax=False):
+        """Colorized diff, a batch of lines at a time as it downloads
+
+        Stops with a summary once it's over max_size (0 for no limit).
+        """
         endpoint = '/repos/{}/pulls/{}'.format(self.repo.full_name, self.number)
-        diff = rest(requests.get, endpoint, headers={'Accept': 'application/vnd.github.v3.diff'})
-        highlighted = highlight(diff, DiffLexer(), TerminalFormatter())
-        click.echo_via_pager(highlighted)
+        lines = iter_lines(endpoint, headers={'Accept': 'application/vnd.github.v3.diff'})
+        colorizer = DiffColorizer(syntax=syntax)
+
+        size = 0
+        batch = []
+        truncated = False
+        for line in lines:
+            size += len(line)
+            if max_size and size > max_size:
+                truncated = True
+                lines.close()
+                break
+
+            batch.append(colorizer.colorize_line(line))
+            if len(batch) >= DIFF_BATCH_LINES:
+                yield ''.join(batch)
+                batch = []
+
+        if batch:
+            yield ''.join(batch)
+
+        if truncated:
+            yield self.diff_summary(max_size)
+
+    def diff_summary(self, max_size):
+        summary = self.fields_for('diff_summary')
+        return click.style(
+            '\n... the diff is over {:.0f} MB, so the rest is left out.\n'
+            '{} files changed, {} additions, {} deletions. Use files_changed to see them all.\n'.format(
+                max_size / (1024.0 * 1024),
+                summary['changedFiles'],
+                summary['additions'],
+                summary['deletions'],
+            ),
+            fg='yellow',
+        )
+
+    def get_files(self):
+        if self.snapshot.files is None:
+            endpoint = '/repos/{}/pulls/{}/files'.format(self.repo.full_name, self.number)
+            self.snapshot.files = list(iter_rest_list(endpoint))
+        return self.snapshot.files
+
+    def file_diff(self, filename=None, syntax=False):
+        files = OrderedDict((f['filename'], f) for f in self.get_files())
+
+        if filename is None:
+            from prompt_toolkit import prompt
+            from prompt_toolkit.contrib.completers import WordCompleter
+            from ..prompt_validators import ChoiceValidator
+
+            filename = prompt(
+                u'Which file? ',
+                completer=WordCompleter(list(files), WORD=True, match_middle=True),
+                validator=ChoiceValidator(files, commands=[]),
+            )
+
+        if filename not in files:
+            click.secho('{} doesn\'t change {}.'.format(self, filename), fg='red')
+            return
+
+        click.echo_via_pager(self.render_patch(files[filename], syntax=syntax))
+
+    def render_patch(self, f, syntax=False):
+        key = (f['sha'], syntax)
+        rendered = self.rendered_patches.get(key)
+
+        if rendered is None:
+            rendered = ''.join(DiffColorizer(syntax=syntax).colorize(patch_lines(f)))
+            self.rendered_patches.put(key, rendered)
+
+        return rendered
 
     def open(self):
-        query = """query {
-                    repository(owner: "%s", name: "%s") {
-                      pullRequest(number: %s) {
-                        url
-                      }
-                    }
-                }""" % (self.repo.owner.name, self.repo.name, self.number)
-        url = graphql(query)['repository']['pullRequest']['url']
+        url = self.fields_for('open')['url']
         click.secho('Opening {} in your browser...'.format(url), fg='yellow')
         webbrowser.open(url)
 
     def files_changed(self):
+        click.echo_via_pager(self.iter_files_changed())
+
+    def iter_files_changed(self):
+        """Lines for the pager, a page of files at a time as they arrive"""
         endpoint = '/repos/{}/pulls/{}/files'.format(self.repo.full_name, self.number)
-        files = rest(requests.get, endpoint)
-        output = []
 
         def short_status(status):
             if status == 'added':
@@ -288,29 +483,57 @@ class PullRequest(ObjectPrompt):
                 return click.style('D', fg='red')
             return click.style(status, fg='blue')
 
-        for f in files:
-            output.append('{status} {filename}'.format(
+        count = additions = deletions = 0
+
+        for f in iter_rest_list(endpoint):
+            count += 1
+            additions += f['additions']
+            deletions += f['deletions']
+            yield '{status} {additions} {deletions} {filename}\n'.format(
                 status=short_status(f['status']),
+                additions=click.style('{:>6}'.format('+{}'.format(f['additions'])), fg='green'),
+                deletions=click.style('{:>6}'.format('-{}'.format(f['deletions'])), fg='red'),
                 filename=f['filename'],
-            ))
-        click.echo_via_pager('\n'.join(output))
+            )
 
+        yield '\n{} files changed, {} additions, {} deletions\n'.format(count, additions, deletions)
+        if count >= FILES_LIST_LIMIT:
+            yield click.style('GitHub only lists the first {} files.\n'.format(FILES_LIST_LIMIT), fg='yellow')
 
-def print_pulls_table(pulls):
-    table_data = [
-        ['Repo', 'Number', 'Status', 'Author', 'Title', 'Commits']
+
+def patch_lines(f):
+    """Unified diff lines for a file from the pulls/N/files endpoint"""
+    filename = f['filename']
+    previous_filename = f.get('previous_filename', filename)
+
+    lines = [
+        'diff --git a/{} b/{}\n'.format(previous_filename, filename),
+        '--- /dev/null\n' if f['status'] == 'added' else '--- a/{}\n'.format(previous_filename),
+        '+++ /dev/null\n' if f['status'] == 'removed' else '+++ b/{}\n'.format(filename),
     ]
-    for pull in pulls:
-        table_data.append([
-            pull['repository']['name'],
-            pull['number'],
-            styled_state(get_pull_request_state(pull), colored=True, short=True),
-            '@' + pull['author']['login'],
-            pull['title'],
-            pull['commits']['totalCount'],
-        ])
-    table = AsciiTable(table_data)
-    click.echo(table.table)
+
+    if 'patch' in f:
+        lines += f['patch'].splitlines(True)
+    else:
+        lines.append('GitHub doesn\'t show a diff for this file, it could be binary or too big\n')
+
+    return lines
+
+
+def print_pulls_table(pulls, pager=False):
+    """Print PullRecords as a table, a row at a time if they're streaming in"""
+    rows = (
+        (
+            pull.repo,
+            pull.number,
+            styled_state(pull.status, colored=True, short=True),
+            '@' + pull.author if pull.author else '',
+            pull.title,
+            pull.commit_count,
+        )
+        for pull in pulls
+    )
+    echo_table(['Repo', 'Number', 'Status', 'Author', 'Title', 'Commits'], rows, widths=[None, 6, 6, None, None, 7], pager=pager)
 
 
 def get_pull_request_state(pull_request):
@@ -0,0 +1,140 @@
+import threading
+import time
+
+
+# start spreading requests out once this fraction of a limit is left
+PACE_BELOW = 0.1
+
+# GitHub's secondary limits allow about 80 content-creating requests a minute
+WRITE_INTERVAL = 60.0 / 80
+
+# how long to back off from a secondary limit that doesn't say (doubles each retry)
+SECONDARY_LIMIT_BACKOFF = 60
+
+MAX_RETRIES = 5
+
+
+class RateLimit(object):
+    def __init__(self, limit, remaining, reset):
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset  # epoch seconds
+
+
+class RateLimiter(object):
+    """Paces requests to stay inside GitHub's rate limits
+
+    Tracks what's left of each limit from response headers, spreads requests
+    out when a limit is running low, keeps content-creating requests under
+    the secondary limits, and says how long to back off when we hit one
+    anyway. Shared by every thread making requests.
+    """
+    def __init__(self, write_interval=WRITE_INTERVAL):
+        self.write_interval = write_interval
+        self.limits = {}
+        self.next_write_at = 0
+        # when the next request can go for each resource that's being paced
+        self.next_paced_at = {}
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def resource_for(endpoint):
+        if endpoint == '/graphql':
+            return 'graphql'
+        if endpoint.startswith('/search/'):
+            return 'search'
+        return 'core'
+
+    def delay_for(self, resource, write=False):
+        """Seconds to wait before making a request, reserving a slot if it's paced"""
+        now = time.time()
+
+        with self.lock:
+            wait_until = self.paused_until
+
+            limit = self.limits.get(resource, None)
+            if limit is not None and now < limit.reset:
+                if limit.remaining <= 0:
+                    wait_until = max(wait_until, limit.reset)
+                elif limit.remaining < limit.limit * PACE_BELOW:
+                    # spread what's left over the time until it resets, one
+                    # slot per request so concurrent threads don't all go at once
+                    slot = max(now, self.next_paced_at.get(resource, 0))
+                    wait_until = max(wait_until, slot)
+                    self.next_paced_at[resource] = slot + (limit.reset - now) / limit.remaining
+
+                # other threads shouldn't count on this one too
+                limit.remaining -= 1
+
+            if write:
+                wait_until = max(wait_until, self.next_write_at)
+                self.next_write_at = max(wait_until, now) + self.write_interval
+
+        return max(0, wait_until - now)
+
+    def wait(self, resource, write=False):
+        delay = self.delay_for(resource, write=write)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def update(self, resource, response):
+        headers = response.headers
+        if 'X-RateLimit-Remaining' not in headers:
+            return
+
+        resource = headers.get('X-RateLimit-Resource', resource)
+        limit = RateLimit(
+            limit=int(headers.get('X-RateLimit-Limit', 0)),
+            remaining=int(headers['X-RateLimit-Remaining']),
+            reset=int(headers.get('X-RateLimit-Reset', 0)),
+        )
+        with self.lock:
+            self.limits[resource] = limit
+
+    def update_from_rate_limit(self, data):
+        """Update from the body of GET /rate_limit"""
+        with self.lock:
+            for resource, values in data.get('resources', {}).items():
+                self.limits[resource] = RateLimit(values['limit'], values['remaining'], values['reset'])
+
+    def retry_delay(self, response, attempt):
+        """Seconds to back off before retrying, or None if it wasn't rate limited"""
+        if response.status_code not in (403, 429) or attempt >= MAX_RETRIES:
+            return None
+
+        headers = response.headers
+
+        if 'Retry-After' in headers:
+            delay = int(headers['Retry-After'])
+        elif headers.get('X-RateLimit-Remaining', None) == '0':
+            delay = max(1, int(headers.get('X-RateLimit-Reset', 0)) - time.time())
+        elif 'rate limit' in response.text.lower():
+            delay = SECONDARY_LIMIT_BACKOFF * 2 ** attempt
+        else:
+            return None  # a plain permissions error
+
+        # everyone waits, not just the thread that hit it
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.time() + delay)
+
+        return delay
+
+    def estimate(self, reads=0, writes=0, graphql_points=0):
+        """Rough seconds a bulk operation will take to stay inside the limits"""
+        now = time.time()
+        seconds = writes * self.write_interval
+
+        with self.lock:
+            for resource, needed in (('core', reads + writes), ('graphql', graphql_points)):
+                limit = self.limits.get(resource, None)
+                if limit is None or needed <= limit.remaining:
+                    continue
+
+                # wait for resets, getting a full limit each time
+                over = needed - limit.remaining
+                resets = -(-over // max(limit.limit, 1))
+                seconds = max(seconds, (limit.reset - now) + (resets - 1) * 3600)
+
+        return seconds
@@ -1,16 +1,27 @@
+import base64
+import hashlib
+import json
 import webbrowser
+try:
+    from urllib import quote
+except ImportError:
+    from urllib.parse import quote
 import click
-from terminaltables import AsciiTable
-import requests
 
-from github import Github
-
-from .api import graphql, rest, get_github_token
-from .pull_request import PullRequest
+from .api import graphql, rest
+from .batch import Connection, GraphqlBatcher
+from .pull_record import PullRecord
+from .pull_request import PullRequest, PULL_REQUEST_LISTING_FIELDS
 from ..object_prompt import ObjectPrompt
+from ..table import echo_table
 from .state import styled_state
 
 
+class LabelError(Exception):
+    """GitHub refused a label, ex. because it already exists"""
+    pass
+
+
 class Repository(ObjectPrompt):
     def __init__(self, owner, name, *args, **kwargs):
         self.owner = owner
@@ -29,44 +40,39 @@ class Repository(ObjectPrompt):
     def __str__(self):
         return self.name
 
-    def get_pygithub_repo(self):
-        g = Github(get_github_token())
-        return g.get_repo(self.full_name)
-
     def get_children(self):
+        store = getattr(self.owner, 'store', None)
+        # a full sync of the whole org is a lot to wait for, just for one repo
+        if store is not None and not store.needs_full_sync(self.owner.name):
+            store.ensure_synced(self.owner)
+            return store.pulls(self.owner.name, repo=self.name)
+
+        return list(self.iter_children())
+
+    def iter_children(self):
         click.secho('Getting open pull requests for {}...'.format(self.full_name), fg='yellow')
-        query = """query {
-                    repository(owner: "%s", name: "%s") {
-                      pullRequests(first: 100, states: OPEN, after: null) {
+        for _, node in GraphqlBatcher().iter_nodes([self.pulls_connection()]):
+            yield PullRecord.from_node(node)
+
+    def pulls_connection(self, states='OPEN', first=100):
+        """Connection for listing this repo's pull requests with a GraphqlBatcher"""
+        field = """repository(owner: "%s", name: "%s") {
+                      pullRequests(first: %s, states: %s, after: $after) {
                         pageInfo {
                           endCursor
                           hasNextPage
                         }
-                        edges {
-                          node {
-                            number
-                            title
-                            author { login }
-                            commits(last: 1) {
-                              edges {
-                                node {
-                                  commit {
-                                    status {
-                                      state
-                                    }
-                                  }
-                                }
-                              }
-                            }
-                          }
+                        nodes {
+                          %s
                         }
                       }
-                    }
-                }""" % (self.owner.name, self.name)
+                    }""" % (self.owner.name, self.name, first, states, PULL_REQUEST_LISTING_FIELDS)
+
+        # each pull request also pulls in its last commit
+        return Connection(self.name, field, 'pullRequests', node_cost=first * 2)
 
-        pull_nodes = graphql(query, to_return_path='repository.pullRequests.edges', page_info_path='repository.pullRequests.pageInfo')
-        pulls = [x['node'] for x in pull_nodes]
-        return pulls
+    def child_choice(self, pull):
+        return str(pull.number)
 
     def get_child_object_prompt(self, key):
         return PullRequest(repo=self, number=key)
@@ -74,26 +80,17 @@ class Repository(ObjectPrompt):
     def overview(self, refresh=True):
         # print the repo name and list of open prs
         if refresh:
-            self.children = self.get_children()
+            self.set_children(self.get_children())
 
         click.clear()
         click.secho(self.full_name, bold=True)
         click.secho('\nThere are {} open pull requests:\n'.format(len(self.children)))
 
-        table_data = [
-            ['Number', 'Status', 'Author', 'Title'],
-        ]
-        for pull in self.children:
-            status = pull['commits']['edges'][0]['node']['commit']['status']
-            status = styled_state(status['state']) if status else ''
-            table_data.append([
-                pull['number'],
-                status,
-                pull['author']['login'],
-                pull['title'],
-            ])
-        table = AsciiTable(table_data)
-        click.echo(table.table)
+        rows = (
+            (pull.number, styled_state(pull.status) if pull.status else '', pull.author or '', pull.title)
+            for pull in self.children
+        )
+        echo_table(['Number', 'Status', 'Author', 'Title'], rows, widths=[6, None, None, None])
 
     def open(self):
         query = """query {
@@ -109,46 +106,149 @@ class Repository(ObjectPrompt):
         if color.startswith('#'):
             color  = color[1:]
 
+        import requests
+
         data = {'name': name, 'color': color}
         click.secho('Adding "{}" label to {}'.format(name, self.full_name))
 
         try:
-            rest(requests.post, '/repos/{}/{}/labels'.format(self.owner.name, self.name), data=data)
+            rest('POST', '/repos/{}/{}/labels'.format(self.owner.name, self.name), data=data)
         except requests.exceptions.HTTPError as e:
-            response = e.response
-            if response.json().get('errors', []):
-                for error in response.json()['errors']:
-                    click.secho('Field "{}" {}'.format(error['field'], error['code']), fg='red')
-            else:
+            errors = e.response.json().get('errors', [])
+            if not errors:
                 raise e
+            raise LabelError(', '.join('Field "{}" {}'.format(error['field'], error['code']) for error in errors))
+
+    def label_endpoint(self, name):
+        return '/repos/{}/labels/{}'.format(self.full_name, quote(name, safe=''))
+
+    def update_label(self, name, color=None, new_name=None):
+        data = {}
+        if color is not None:
+            data['color'] = color.lstrip('#')
+        if new_name is not None:
+            data['new_name'] = new_name
+
+        click.secho('Updating "{}" label in {}'.format(name, self.full_name))
+        rest('PATCH', self.label_endpoint(name), data=data)
+
+    def delete_label(self, name):
+        click.secho('Deleting "{}" label from {}'.format(name, self.full_name))
+        rest('DELETE', self.label_endpoint(name))
+
+    def label_field(self, name):
+        """GraphQL field for a label's name and color, matched case insensitively"""
+        return """repository(owner: %s, name: %s) {
+                    label(name: %s) {
+                      name
+                      color
+                    }
+                  }""" % (json.dumps(self.owner.name), json.dumps(self.name), json.dumps(name))
+
+    def file_oid_field(self, path_in_repo):
+        """GraphQL field for the blob sha of a file on the default branch"""
+        return """repository(owner: %s, name: %s) {
+                    object(expression: %s) {
+                      ... on Blob {
+                        oid
+                      }
+                    }
+                  }""" % (
+            json.dumps(self.owner.name),
+            json.dumps(self.name),
+            json.dumps('HEAD:' + path_in_repo.lstrip('/')),
+        )
 
-    def update_file(self, path_in_repo, matching_file_path, to_file_path, commit_message=None):
-
-        if commit_message is None:
-            commit_message = 'Update {}'.format(path_in_repo)
+    def get_file_oid(self, path_in_repo):
+        data = graphql('query {\n%s\n}' % self.file_oid_field(path_in_repo))
+        return file_oid_from_data(data['repository'])
 
-        pygithub_repo = self.get_pygithub_repo()
-        try:
-            existing_github_file = pygithub_repo.get_file_contents(path_in_repo)
-            existing_contents = existing_github_file.decoded_content
-        except Exception as e:
-            click.secho('Error getting {} in {}: {}'.format(path_in_repo, self, e), fg='red')
-            return
+    def update_file(self, path_in_repo, matching_file_path, to_file_path, commit_message=None, oid=None):
+        """Replace the file if it's the same as matching_file_path
 
-        click.secho('Contents of {} in {}'.format(path_in_repo, self), fg='green')
-        click.secho(existing_contents)
+        Compares blob shas, so nothing is downloaded. Pass the oid if it's
+        already known, ex. from plan_file_updates.
+        """
+        if oid is None:
+            oid = self.get_file_oid(path_in_repo)
 
-        with open(matching_file_path, 'r') as f:
-            matching_contents = f.read()
+        if oid is None:
+            click.secho('{} doesn\'t have {}'.format(self, path_in_repo), fg='red')
+            return
 
-        if existing_contents.strip().encode('utf-8') != matching_contents.strip().encode('utf-8'):
-            click.secho('Contents to not match the expected:\n' + matching_contents, fg='red')
+        if oid not in matching_blob_shas(matching_file_path):
+            click.secho('{} in {} doesn\'t match {}'.format(path_in_repo, self, matching_file_path), fg='red')
             return
 
-        with open(to_file_path, 'r') as f:
+        with open(to_file_path, 'rb') as f:
             new_contents = f.read()
 
         click.secho('Updating {} in {}'.format(path_in_repo, self), fg='green')
-        path_to_update = '/' + path_in_repo if not path_in_repo.startswith('/') else path_in_repo
-        pygithub_repo.update_file(path_to_update, commit_message, new_contents, existing_github_file.sha)
+        self.write_file(path_in_repo, new_contents, oid, commit_message=commit_message)
         click.secho('Successfully updated {} in {}'.format(path_in_repo, self), fg='green')
+
+    def write_file(self, path_in_repo, contents, oid, commit_message=None):
+        if commit_message is None:
+            commit_message = 'Update {}'.format(path_in_repo)
+
+        endpoint = '/repos/{}/contents/{}'.format(self.full_name, path_in_repo.lstrip('/'))
+        rest('PUT', endpoint, data={
+            'message': commit_message,
+            'content': base64.b64encode(contents).decode('ascii'),
+            # GitHub refuses the update if the file changed since we looked
+            'sha': oid,
+        })
+
+    def commit_files(self, branch, head_oid, files, commit_message=None):
+        """Write several files ({path: contents}) in a single commit"""
+        if commit_message is None:
+            commit_message = 'Update {}'.format(', '.join(sorted(files)))
+
+        mutation = """mutation($input: CreateCommitOnBranchInput!) {
+                        createCommitOnBranch(input: $input) {
+                          commit {
+                            oid
+                          }
+                        }
+                      }"""
+        graphql(mutation, variables={'input': {
+            'branch': {
+                'repositoryNameWithOwner': self.full_name,
+                'branchName': branch,
+            },
+            'message': {'headline': commit_message},
+            # GitHub refuses the commit if the branch moved since we looked
+            'expectedHeadOid': head_oid,
+            'fileChanges': {
+                'additions': [
+                    {'path': path, 'contents': base64.b64encode(contents).decode('ascii')}
+                    for path, contents in sorted(files.items())
+                ],
+            },
+        }})
+
+
+def git_blob_sha(contents):
+    """The sha git would give contents (bytes) as a blob"""
+    header = 'blob {}\0'.format(len(contents)).encode('ascii')
+    return hashlib.sha1(header + contents).hexdigest()
+
+
+def matching_blob_shas(path):
+    """Blob shas that count as a match for the file at path
+
+    Differences in leading and trailing whitespace don't count, so a
+    missing newline at the end of a file doesn't stop an update.
+    """
+    with open(path, 'rb') as f:
+        contents = f.read()
+
+    stripped = contents.strip()
+    return set(git_blob_sha(x) for x in (contents, stripped, stripped + b'\n'))
+
+
+def file_oid_from_data(repository_data):
+    if repository_data is None or repository_data['object'] is None:
+        return None
+    # anything but a blob (ex. a directory) comes back without an oid
+    return repository_data['object'].get('oid', None)
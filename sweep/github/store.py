@@ -0,0 +1,246 @@
+import os
+import sqlite3
+import threading
+import time
+
+import click
+
+from .api import graphql, iter_graphql
+from .batch import GraphqlBatcher
+from .organization import SEARCH_PULLS_QUERY, SEARCH_RESULT_LIMIT
+from .pull_request import PULL_REQUEST_LISTING_FIELDS
+from .pull_record import PullRecord
+from .repository import Repository
+
+
+STORE_PATH = os.path.expanduser('~/.sweep/store.sqlite3')
+
+# seconds before we check GitHub for anything that changed
+DEFAULT_MAX_AGE = 300
+
+# deleted and renamed repos only get noticed by a full sync
+FULL_SYNC_AGE = 24 * 60 * 60
+
+# seconds of overlap between one sync and the next
+CURSOR_SLACK = 120
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repos (
+    org TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (org, name)
+);
+CREATE TABLE IF NOT EXISTS pulls (
+    org TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    id TEXT,
+    title TEXT,
+    author TEXT,
+    state TEXT,
+    head_sha TEXT,
+    head_ref TEXT,
+    status TEXT,
+    commit_count INTEGER,
+    updated_at TEXT,
+    PRIMARY KEY (org, repo, number)
+);
+CREATE INDEX IF NOT EXISTS pulls_org_state ON pulls (org, state);
+CREATE TABLE IF NOT EXISTS syncs (
+    org TEXT PRIMARY KEY,
+    cursor TEXT,
+    synced_at REAL,
+    full_synced_at REAL
+);
+"""
+
+NEW_REPOS_QUERY = """query {
+                      organization(login: "%s") {
+                        repositories(first: 100, orderBy: {field: CREATED_AT, direction: DESC}) {
+                          nodes {
+                            name
+                          }
+                        }
+                      }
+                    }"""
+
+PULLS_BY_ID_QUERY = """query($ids: [ID!]!) {
+                        nodes(ids: $ids) {
+                          ... on PullRequest {
+                            %s
+                          }
+                        }
+                      }""" % PULL_REQUEST_LISTING_FIELDS
+
+PULL_COLUMNS = ', '.join(PullRecord.__slots__)
+
+
+class PullRequestStore(object):
+    """Local SQLite copy of an organization's repos and pull requests
+
+    Reads are served from here, and the copy is brought up to date with only
+    what changed on GitHub once it's older than max_age seconds.
+    """
+    def __init__(self, path=STORE_PATH, max_age=DEFAULT_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        # bulk actions update the store from worker threads
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+
+    def get_sync(self, org):
+        with self.lock:
+            return self.connection.execute(
+                'SELECT cursor, synced_at, full_synced_at FROM syncs WHERE org = ?', (org,)
+            ).fetchone()
+
+    def needs_full_sync(self, org):
+        sync = self.get_sync(org)
+        return sync is None or time.time() - sync[2] > FULL_SYNC_AGE
+
+    def ensure_synced(self, organization):
+        if self.needs_full_sync(organization.name):
+            self.sync_full(organization)
+            return
+
+        cursor, synced_at, _ = self.get_sync(organization.name)
+        if time.time() - synced_at > self.max_age:
+            self.sync_incremental(organization, cursor=cursor)
+
+    def sync_full(self, organization):
+        now = time.time()
+        cursor = sync_cursor(now)
+        repos = list(organization.iter_children())
+
+        click.secho('Getting open pull requests for {} repos...'.format(organization), fg='yellow')
+        connections = [
+            Repository(owner=organization, name=repo['name']).pulls_connection(
+                first=min(100, repo['pullRequests']['totalCount']),
+            )
+            for repo in repos if repo['pullRequests']['totalCount']
+        ]
+        pulls = [PullRecord.from_node(node) for _, node in GraphqlBatcher().iter_nodes(connections)]
+
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM repos WHERE org = ?', (organization.name,))
+            self.connection.execute('DELETE FROM pulls WHERE org = ?', (organization.name,))
+            self.connection.executemany(
+                'INSERT INTO repos (org, name) VALUES (?, ?)',
+                [(organization.name, repo['name']) for repo in repos],
+            )
+            self._save_pulls(organization.name, pulls)
+            self._save_sync(organization.name, cursor, now, full_synced_at=now)
+
+    def sync_incremental(self, organization, cursor):
+        click.secho('Checking {} for updates...'.format(organization), fg='yellow')
+        now = time.time()
+
+        new_repos = graphql(NEW_REPOS_QUERY % organization.name)['organization']['repositories']['nodes']
+        pulls = self.search_updated_pulls(organization.name, cursor)
+
+        # status changes don't touch a PR's updatedAt, so pending ones get
+        # checked directly
+        with self.lock:
+            pending_ids = [row[0] for row in self.connection.execute(
+                "SELECT id FROM pulls WHERE org = ? AND state = 'OPEN' AND status = 'PENDING'",
+                (organization.name,),
+            )]
+        for i in range(0, len(pending_ids), 100):
+            nodes = graphql(PULLS_BY_ID_QUERY, variables={'ids': pending_ids[i:i + 100]})['nodes']
+            pulls += [PullRecord.from_node(node) for node in nodes if node]
+
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO repos (org, name) VALUES (?, ?)',
+                [(organization.name, repo['name']) for repo in new_repos],
+            )
+            self._save_pulls(organization.name, pulls)
+            self._save_sync(organization.name, sync_cursor(now), now)
+
+    def search_updated_pulls(self, org, cursor):
+        """Every PR in the org updated at or after the cursor"""
+        pulls = []
+
+        while True:
+            query = 'org:{} is:pr updated:>={} sort:updated-asc'.format(org, cursor)
+            found = [
+                PullRecord.from_node(node)
+                for node in iter_graphql(SEARCH_PULLS_QUERY, 'search.nodes', 'search.pageInfo', variables={'query': query})
+                if node
+            ]
+            pulls += found
+
+            # search stops at a limit, so pick up from where it left off
+            if len(found) < SEARCH_RESULT_LIMIT or found[-1].updated_at == cursor:
+                return pulls
+
+            cursor = found[-1].updated_at
+
+    def _save_pulls(self, org, pulls):
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO pulls (org, {}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'.format(PULL_COLUMNS),
+            [(org,) + pull.to_row() for pull in pulls],
+        )
+
+    def _save_sync(self, org, cursor, synced_at, full_synced_at=None):
+        if full_synced_at is None:
+            self.connection.execute(
+                'UPDATE syncs SET cursor = ?, synced_at = ? WHERE org = ?',
+                (cursor, synced_at, org),
+            )
+        else:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO syncs (org, cursor, synced_at, full_synced_at) VALUES (?, ?, ?, ?)',
+                (org, cursor, synced_at, full_synced_at),
+            )
+
+    def repos(self, org):
+        """Repos in the same shape as Organization.iter_children gives them"""
+        with self.lock:
+            rows = self.connection.execute(
+                """SELECT repos.name, COUNT(pulls.number) FROM repos
+                   LEFT JOIN pulls ON pulls.org = repos.org AND pulls.repo = repos.name AND pulls.state = 'OPEN'
+                   WHERE repos.org = ?
+                   GROUP BY repos.name
+                   ORDER BY repos.rowid""",
+                (org,),
+            ).fetchall()
+
+        return [{'name': name, 'pullRequests': {'totalCount': count}} for name, count in rows]
+
+    def pulls(self, org, repo=None):
+        """Open pull requests, as PullRecords"""
+        query = "SELECT {} FROM pulls WHERE org = ? AND state = 'OPEN'".format(PULL_COLUMNS)
+        params = (org,)
+
+        if repo is not None:
+            query += ' AND repo = ?'
+            params += (repo,)
+
+        with self.lock:
+            rows = self.connection.execute(query + ' ORDER BY repo, number', params).fetchall()
+
+        return [PullRecord(*row) for row in rows]
+
+    def set_pull_state(self, org, repo, number, state):
+        """Record a change we made ourselves, so it shows before the next sync"""
+        with self.lock, self.connection:
+            self.connection.execute(
+                'UPDATE pulls SET state = ? WHERE org = ? AND repo = ? AND number = ?',
+                (state, org, repo, number),
+            )
+
+
+def sync_cursor(started_at):
+    """Search timestamp that catches everything updated since a sync started
+
+    Backs off a bit in case our clock is ahead of GitHub's. Seeing a PR
+    twice is harmless.
+    """
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(started_at - CURSOR_SLACK))
@@ -1,9 +1,26 @@
 import shlex
+import threading
+import time
+
 import click
-from prompt_toolkit import prompt
-from prompt_toolkit.history import InMemoryHistory
 
-from .prompt_completers import ClickCompleter
+from .completion_index import CompletionIndex
+from .profiling import profiled_command
+
+
+# seconds before children shown in a prompt get refreshed in the background
+DEFAULT_REFRESH_INTERVAL = 30
+
+_refresh_interval = DEFAULT_REFRESH_INTERVAL
+
+
+def get_refresh_interval():
+    return _refresh_interval
+
+
+def set_refresh_interval(refresh_interval):
+    global _refresh_interval
+    _refresh_interval = max(0, refresh_interval)
 
 
 class ObjectPrompt(object):
@@ -12,6 +29,15 @@ class ObjectPrompt(object):
         # property of child that the user will select by
         self.child_key = child_key
         self.children = []
+        # completion choices, updated in place so an open prompt sees refreshes
+        self.choices = CompletionIndex()
+        self.children_loaded_at = None
+        self.refreshed_children = None
+        self.refresh_thread = None
+        # whether the overview is what's above an open prompt, so a refresh
+        # can redraw it there
+        self.overview_at_prompt = False
+        self.redraw_lock = threading.Lock()
 
     def get_children(self, *args, **kwargs):
         raise NotImplementedError
@@ -22,39 +48,113 @@ class ObjectPrompt(object):
     def overview(self, refresh, *args, **kwargs):
         raise NotImplementedError
 
+    def child_choice(self, child):
+        """What to type to pick a child"""
+        return str(child[self.child_key])
+
+    def set_children(self, children):
+        self.children = children
+        self.choices.update(self.child_choice(x) for x in children)
+        self.children_loaded_at = time.time()
+
+    def start_refresh(self):
+        """Get the children again in a background thread, if it's been a while
+
+        Until they arrive, everything keeps using the ones we have.
+        """
+        if self.refresh_thread is not None and self.refresh_thread.is_alive():
+            return
+
+        if self.children_loaded_at and time.time() - self.children_loaded_at < get_refresh_interval():
+            return
+
+        def run():
+            try:
+                children = self.get_children()
+            except Exception as e:
+                click.secho('Couldn\'t refresh {}: {}'.format(self, e), fg='red')
+                return
+
+            self.refreshed_children = children
+            # completions can start using them right away
+            self.choices.update(self.child_choice(x) for x in children)
+
+            with self.redraw_lock:
+                if self.overview_at_prompt and self.apply_refresh():
+                    # goes above the open prompt, through its patched stdout
+                    click.echo('')
+                    self.overview(refresh=False)
+
+        self.refresh_thread = threading.Thread(target=run)
+        self.refresh_thread.daemon = True
+        self.refresh_thread.start()
+
+    def apply_refresh(self):
+        """Switch to refreshed children, returning whether they changed anything"""
+        children = self.refreshed_children
+        if children is None:
+            return False
+
+        self.refreshed_children = None
+        changed = children != self.children
+        self.set_children(children)
+        return changed
+
     def command_prompt(self, ctx, default_subcommand=None):
+        # only interactive use needs prompt_toolkit, so it isn't imported up front
+        from prompt_toolkit import prompt
+        from prompt_toolkit.history import InMemoryHistory
+        from .prompt_completers import ClickCompleter
+
         # get the children if being run for the first time
         # - if empty and supposed to be, then this won't hurt
         if not self.children:
-            self.children = self.get_children()
+            self.set_children(self.get_children())
 
         self.overview(refresh=False)
+        # whether the screen is still showing the overview, and not output
+        # from a command that a redraw would clear away
+        showing_overview = True
 
         prompt_memory_history = InMemoryHistory()
 
+        commands = [
+            ('done', 'Close this prompt'),
+        ]
+        choices = self.choices
+        # built once, since the choices index keeps itself up to date
+        completer = ClickCompleter(
+            ctx,
+            additional_commands=commands,
+            default_subcommand=default_subcommand,
+            default_subcommand_choices=choices,
+            choice_display_meta='(enter prompt)',
+            fuzzy=True,
+        )
+
         user_input = None
         while user_input != 'done':
 
+            if self.apply_refresh() and showing_overview:
+                self.overview(refresh=False)
+
             click.echo('')
             if self.pre_prompt_message:
                 click.echo(self.pre_prompt_message)
 
-            commands = [
-                ('done', 'Close this prompt'),
-            ]
-            choices = [str(x[self.child_key]) for x in self.children]
-
-            user_input = prompt(
-                u'> ',
-                completer=ClickCompleter(
-                    ctx,
-                    additional_commands=commands,
-                    default_subcommand=default_subcommand,
-                    default_subcommand_choices=choices,
-                    choice_display_meta='(enter prompt)'
-                ),
-                history=prompt_memory_history,
-            )
+            self.overview_at_prompt = showing_overview
+            try:
+                user_input = prompt(
+                    u'> ',
+                    completer=completer,
+                    history=prompt_memory_history,
+                    # a background refresh can print without garbling the prompt
+                    patch_stdout=True,
+                )
+            finally:
+                # waits for a redraw that's already started
+                with self.redraw_lock:
+                    self.overview_at_prompt = False
 
             if user_input == '':
                 click.secho('Enter a command.', fg='red')
@@ -65,12 +165,18 @@ class ObjectPrompt(object):
                 # behavior given where they're at
                 self.interpret_subcommand(ctx, default_subcommand + ' ' + user_input)
 
-                # if entered a new prompt (no args, just choice),
-                # when we come back out, reload the overview
+                # if entered a new prompt (no args, just choice), when we come
+                # back out, show the overview right away and refresh behind it
                 if len(shlex.split(user_input)) == 1:
-                    self.overview(refresh=True)
+                    self.apply_refresh()
+                    self.overview(refresh=False)
+                    showing_overview = True
+                    self.start_refresh()
+                else:
+                    showing_overview = False
             else:
                 self.interpret_subcommand(ctx, user_input)
+                showing_overview = False
 
             # self.overview(refresh=True)
 
@@ -85,7 +191,8 @@ class ObjectPrompt(object):
             return
 
         try:
-            subcommand.main(args=arg_parts, parent=ctx, standalone_mode=False)
+            with profiled_command(user_input):
+                subcommand.main(args=arg_parts, parent=ctx, standalone_mode=False)
         except TypeError as e:
             click.secho('Type error. You probably used the arguments/options incorrectly.', fg='red')
             click.secho(str(e), fg='red')
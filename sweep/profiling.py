@@ -0,0 +1,229 @@
+import json
+import math
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# alias for the rateLimit field added to queries, to find out their cost
+COST_ALIAS = 'profileRateLimit'
+
+PERCENTILES = (50, 90, 99)
+
+_profiler = None
+
+
+def configure_profiling(enabled=True):
+    global _profiler
+    _profiler = Profiler() if enabled else None
+    return _profiler
+
+
+def get_profiler():
+    """The shared profiler, or None if profiling is turned off"""
+    return _profiler
+
+
+@contextmanager
+def profiled_command(name):
+    """Count what happens inside towards a command, if profiling"""
+    profiler = get_profiler()
+    if profiler is None:
+        yield
+        return
+
+    profiler.start_command(name)
+    try:
+        yield
+    finally:
+        profiler.finish_command()
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent inside to a phase of the current command, if profiling"""
+    profiler = get_profiler()
+    if profiler is None:
+        yield
+        return
+
+    started_at = time.time()
+    try:
+        yield
+    finally:
+        profiler.add_time(phase, time.time() - started_at)
+
+
+def add_time(phase, seconds):
+    """Add time to a phase of the current command, if profiling"""
+    profiler = get_profiler()
+    if profiler is not None:
+        profiler.add_time(phase, seconds)
+
+
+def with_cost_field(query):
+    """The query with its rate limit cost added, or unchanged if it's a mutation"""
+    stripped = query.strip()
+    if not (stripped.startswith('query') or stripped.startswith('{')):
+        return query
+    return '{}\n{}: rateLimit {{ cost }}\n}}'.format(stripped[:-1], COST_ALIAS)
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return None
+    return values[max(0, int(math.ceil(percent / 100.0 * len(values))) - 1)]
+
+
+class RequestRecord(object):
+    def __init__(self, kind, method, endpoint, status, started_at, seconds, size):
+        self.kind = kind
+        self.method = method
+        self.endpoint = endpoint
+        self.status = status
+        self.started_at = started_at
+        self.seconds = seconds
+        self.size = size  # bytes, and still counting for streamed responses
+        self.cost = None
+
+    @property
+    def cache_hit(self):
+        # we only revalidate what's in the cache, so not modified means we used it
+        return self.status == 304
+
+    def to_json(self):
+        return OrderedDict([
+            ('kind', self.kind),
+            ('method', self.method),
+            ('endpoint', self.endpoint),
+            ('status', self.status),
+            ('started_at', self.started_at),
+            ('seconds', self.seconds),
+            ('bytes', self.size),
+            ('cost', self.cost),
+        ])
+
+
+class CommandProfile(object):
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.finished_at = None
+        self.requests = []
+        self.timings = OrderedDict()  # seconds spent in each phase, ex. json
+
+    @property
+    def seconds(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_json(self):
+        return OrderedDict([
+            ('name', self.name),
+            ('started_at', self.started_at),
+            ('seconds', self.seconds),
+            ('timings', self.timings),
+            ('requests', [record.to_json() for record in self.requests]),
+        ])
+
+
+class Profiler(object):
+    """Records the API requests each command makes, and where else its time goes
+
+    Requests made from worker threads count towards whichever command is
+    running. Commands run from a prompt nest inside the prompt's command.
+    """
+    def __init__(self):
+        self.commands = []
+        self.stack = []
+        self.lock = threading.Lock()
+        self.responses = weakref.WeakKeyDictionary()
+
+    @property
+    def current(self):
+        if not self.stack:
+            self.start_command('sweep')
+        return self.stack[-1]
+
+    def start_command(self, name):
+        command = CommandProfile(name)
+        with self.lock:
+            self.commands.append(command)
+            self.stack.append(command)
+        return command
+
+    def finish_command(self):
+        with self.lock:
+            command = self.stack.pop()
+        command.finished_at = time.time()
+
+    def record_request(self, kind, method, endpoint, response, started_at, seconds, streamed=False):
+        # a streamed body hasn't been read yet, so it gets counted as it is
+        size = 0 if streamed else len(response.content)
+        record = RequestRecord(kind, method, endpoint, response.status_code, started_at, seconds, size)
+
+        command = self.current
+        with self.lock:
+            command.requests.append(record)
+            self.responses[response] = record
+
+        return record
+
+    def add_response_bytes(self, response, size):
+        record = self.responses.get(response, None)
+        if record is not None:
+            record.size += size
+
+    def add_cost(self, response, cost):
+        record = self.responses.get(response, None)
+        if record is not None:
+            record.cost = cost
+
+    def add_time(self, phase, seconds):
+        command = self.current
+        with self.lock:
+            command.timings[phase] = command.timings.get(phase, 0) + seconds
+
+    def summaries(self):
+        """(command name, kind, stats) for each kind of request each command made"""
+        grouped = OrderedDict()
+        for command in self.commands:
+            for record in command.requests:
+                grouped.setdefault((command.name, record.kind), []).append(record)
+
+        summaries = []
+        for (name, kind), records in grouped.items():
+            latencies = sorted(record.seconds for record in records)
+            costs = [record.cost for record in records if record.cost is not None]
+            stats = OrderedDict([
+                ('calls', len(records)),
+                ('bytes', sum(record.size for record in records)),
+                ('cost', sum(costs) if costs else None),
+                ('cache_hits', len([record for record in records if record.cache_hit])),
+            ])
+            for percent in PERCENTILES:
+                stats['p{}'.format(percent)] = percentile(latencies, percent)
+            stats['max'] = latencies[-1]
+            summaries.append((name, kind, stats))
+
+        return summaries
+
+    def timing_summaries(self):
+        """(command name, wall seconds, request seconds, {phase: seconds}) for each command"""
+        totals = OrderedDict()
+        for command in self.commands:
+            wall, requests, timings = totals.get(command.name, (0, 0, OrderedDict()))
+            for phase, seconds in command.timings.items():
+                timings[phase] = timings.get(phase, 0) + seconds
+            totals[command.name] = (
+                wall + command.seconds,
+                requests + sum(record.seconds for record in command.requests),
+                timings,
+            )
+        return [(name,) + values for name, values in totals.items()]
+
+    def write_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump({'commands': [command.to_json() for command in self.commands]}, f, indent=2)
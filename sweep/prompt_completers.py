@@ -4,14 +4,54 @@ import click
 import click._bashcomplete
 from prompt_toolkit.completion import Completer, Completion
 
+from .completion_index import CompletionIndex
+
+
+# fuzzy matching scans every choice, so it only runs once the prefix search
+# comes up with fewer matches than this, for queries at least this long
+FUZZY_BELOW = 5
+FUZZY_MIN_LENGTH = 3
+
 
 class ClickCompleter(Completer):
-    def __init__(self, ctx, additional_commands=[], default_subcommand=None, default_subcommand_choices=None, choice_display_meta=None):
+    def __init__(self, ctx, additional_commands=[], default_subcommand=None, default_subcommand_choices=None, choice_display_meta=None, fuzzy=False):
         self.ctx = ctx
         self.additional_commands = additional_commands
         self.default_subcommand = default_subcommand
+        if default_subcommand_choices is not None and not isinstance(default_subcommand_choices, CompletionIndex):
+            default_subcommand_choices = CompletionIndex(default_subcommand_choices)
         self.default_subcommand_choices = default_subcommand_choices
         self.choice_display_meta = choice_display_meta
+        self.fuzzy = fuzzy
+        # option and subcommand completions for each command we've been in
+        self.command_choices = {}
+
+    def get_command_choices(self, command):
+        """(text, display_meta) for a command's options and subcommands"""
+        choices = self.command_choices.get(command, None)
+        if choices is not None:
+            return choices
+
+        choices = []
+
+        # add --option completions
+        for param in command.params:
+            if isinstance(param, click.Option):
+                for options in (param.opts, param.secondary_opts):
+                    for o in options:
+                        display_meta = '{help}. Default: {default}'.format(
+                            help=param.help,
+                            default=param.default,
+                        )
+                        choices.append((o, display_meta))
+
+        # add subcommand completions
+        if isinstance(command, click.MultiCommand):
+            for name, subcommand in command.commands.items():
+                choices.append((name, subcommand.short_help))
+
+        self.command_choices[command] = choices
+        return choices
 
     def get_completions(self, document, complete_event=None):
         # Code analogous to click._bashcomplete.do_complete
@@ -53,40 +93,21 @@ class ClickCompleter(Completer):
 
         # add staticly available commands if no args yet
         if len(args) < 1 and self.additional_commands:
-            choices += [
-                Completion(command, -len(incomplete), display_meta=display_meta)
-                for command, display_meta in self.additional_commands
-            ]
+            choices += self.additional_commands
 
-        # add --option completions
-        for param in current_command.params:
-            if isinstance(param, click.Option):
-                for options in (param.opts, param.secondary_opts):
-                    for o in options:
-                        display_meta = '{help}. Default: {default}'.format(
-                            help=param.help,
-                            default=param.default,
-                        )
-                        choices.append(Completion(o, -len(incomplete),
-                                                  display_meta=display_meta))
+        choices += self.get_command_choices(current_command)
 
-        # add subcommand completions
-        if isinstance(current_command, click.MultiCommand):
-            for name, command in current_command.commands.items():
-                choices.append(Completion(
-                    name,
-                    -len(incomplete),
-                    display_meta=command.short_help,
-                ))
+        # yield all our completions, only building the ones that match
+        for text, display_meta in choices:
+            if text.startswith(incomplete):
+                yield Completion(text, -len(incomplete), display_meta=display_meta)
 
         # add choices for default subcommand
         if len(args) < 1 and self.default_subcommand_choices:
-            choices += [
-                Completion(x, -len(incomplete), display_meta=self.choice_display_meta)
-                for x in self.default_subcommand_choices
-            ]
-
-        # yield all our completions
-        for item in choices:
-            if item.text.startswith(incomplete):
-                yield item
+            matches = self.default_subcommand_choices.complete(incomplete)
+            for x in matches:
+                yield Completion(x, -len(incomplete), display_meta=self.choice_display_meta)
+
+            if self.fuzzy and len(matches) < FUZZY_BELOW and len(incomplete) >= FUZZY_MIN_LENGTH:
+                for x in self.default_subcommand_choices.fuzzy(incomplete):
+                    yield Completion(x, -len(incomplete), display_meta=self.choice_display_meta)
@@ -0,0 +1,142 @@
+"""Printing tables a row at a time, as the rows come in
+
+Columns are either a fixed width or sized from the first rows, so each
+row is rendered once, as soon as it arrives, and the cost stays linear
+however many rows there are. Anything that doesn't fit its column after
+that gets cut short. Tables longer than the screen can go through a pager,
+but not ones shown right before a prompt or a question, since they'd be
+gone once the pager closes.
+"""
+import time
+from itertools import chain, islice
+try:
+    from shutil import get_terminal_size
+except ImportError:  # Python 2
+    from click import get_terminal_size
+
+import click
+
+from .profiling import add_time
+
+
+# rows used to size the columns that don't have a fixed width
+DEFAULT_SAMPLE_SIZE = 100
+
+# narrowest a column gets when shrinking the table to fit the screen
+MIN_COLUMN_WIDTH = 5
+
+ELLIPSIS = u'\u2026'
+
+
+def visible_len(text):
+    if '\x1b' in text:
+        return len(click.unstyle(text))
+    return len(text)
+
+
+def fit(text, width):
+    """Text padded or cut short to width, ignoring ANSI styles when measuring"""
+    length = visible_len(text)
+    if length > width and length == len(text):
+        # styled text is only ever short, like a status glyph
+        return text[:width - 1] + ELLIPSIS
+    return text + ' ' * (width - length)
+
+
+class StreamingTable(object):
+    """A table of rows that are rendered as they come
+
+    `widths` gives each column a fixed width, or None to size it from the
+    header and the first `sample_size` rows. With `max_width`, the widest
+    columns are narrowed until the table fits.
+    """
+    def __init__(self, headers, widths=None, sample_size=DEFAULT_SAMPLE_SIZE, max_width=None):
+        self.headers = [u'{}'.format(x) for x in headers]
+        self.widths = list(widths) if widths else [None] * len(headers)
+        self.sample_size = sample_size
+        self.max_width = max_width
+        # time spent rendering, and not waiting for rows
+        self.render_seconds = 0
+
+    def size_columns(self, sample):
+        widths = []
+        for i, width in enumerate(self.widths):
+            if width is None:
+                width = max([visible_len(self.headers[i])] + [visible_len(row[i]) for row in sample])
+            widths.append(width)
+
+        if self.max_width is not None:
+            overflow = sum(widths) + 3 * len(widths) + 1 - self.max_width
+            while overflow > 0:
+                widest = max(range(len(widths)), key=lambda i: widths[i])
+                if widths[widest] <= MIN_COLUMN_WIDTH:
+                    break
+                widths[widest] -= 1
+                overflow -= 1
+
+        return widths
+
+    def format_row(self, cells, widths):
+        return u'| {} |'.format(u' | '.join(fit(cell, width) for cell, width in zip(cells, widths)))
+
+    def iter_lines(self, rows):
+        """Yield the lines of the table, starting once the sample is in"""
+        rows = (tuple(u'{}'.format(cell) for cell in row) for row in rows)
+        sample = list(islice(rows, self.sample_size))
+
+        started_at = time.time()
+        widths = self.size_columns(sample)
+        border = u'+{}+'.format(u'+'.join(u'-' * (width + 2) for width in widths))
+        lines = [border, self.format_row(self.headers, widths), border]
+        lines += [self.format_row(row, widths) for row in sample]
+        self.render_seconds += time.time() - started_at
+
+        for line in lines:
+            yield line
+
+        for row in rows:
+            started_at = time.time()
+            line = self.format_row(row, widths)
+            self.render_seconds += time.time() - started_at
+            yield line
+
+        yield border
+
+
+def stdout_isatty():
+    # prompt_toolkit's patched stdout has no isatty
+    isatty = getattr(click.get_text_stream('stdout'), 'isatty', None)
+    return isatty is not None and isatty()
+
+
+def echo_lines(lines, pager=True):
+    """Print lines as they come, through a pager if they don't fit on the screen
+
+    Waits for a screenful of lines to know whether they'll fit.
+    """
+    lines = iter(lines)
+
+    if pager and stdout_isatty():
+        height = get_terminal_size()[1]
+        first = list(islice(lines, height))
+        if len(first) == height:
+            click.echo_via_pager(line + u'\n' for line in chain(first, lines))
+            return
+        lines = iter(first)
+
+    for line in lines:
+        click.echo(line)
+
+
+def echo_table(headers, rows, widths=None, sample_size=DEFAULT_SAMPLE_SIZE, pager=False):
+    """Print a table, streaming the rows in as they come
+
+    Only pages with `pager`, for tables that aren't followed by a prompt.
+    """
+    max_width = None
+    if stdout_isatty():
+        max_width = get_terminal_size()[0]
+
+    table = StreamingTable(headers, widths=widths, sample_size=sample_size, max_width=max_width)
+    echo_lines(table.iter_lines(rows), pager=pager)
+    add_time('render', table.render_seconds)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.github.api`."""
+
+import os
+
+import pytest
+
+from sweep.github import api
+from sweep.github.cache import ResponseCache
+
+
+class FakeResponse(object):
+    def __init__(self, data):
+        self.data = data
+        self.text = str(data)
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+def test_token_is_only_read_once(monkeypatch, tmpdir):
+    token_file = tmpdir.join('github_token')
+    token_file.write('abc\n')
+    monkeypatch.delenv('SWEEP_GITHUB_TOKEN', raising=False)
+    monkeypatch.setattr(api, 'get_token_file_path', lambda: str(token_file))
+    monkeypatch.setattr(api, '_github_token', None)
+    monkeypatch.setattr(api, '_headers', None)
+
+    headers = api.get_headers()
+    assert headers == {'Authorization': 'token abc'}
+
+    token_file.write('changed\n')
+    headers['Accept'] = 'something'
+    assert api.get_headers() == {'Authorization': 'token abc'}
+
+
+def test_token_is_saved_next_to_the_store(monkeypatch, tmpdir):
+    token_file = tmpdir.mkdir('.sweep').join('github_token')
+    monkeypatch.delenv('SWEEP_GITHUB_TOKEN', raising=False)
+    monkeypatch.setattr(api, 'get_token_file_path', lambda: str(token_file))
+    monkeypatch.setattr(api.click, 'prompt', lambda text: 'abc')
+
+    assert api.load_github_token() == 'abc'
+    assert token_file.read() == 'abc'
+
+
+def test_session_is_shared_and_pooled(monkeypatch):
+    monkeypatch.setattr(api, '_session', None)
+
+    session = api.get_session()
+    assert api.get_session() is session
+    assert session.get_adapter(api.API_URL)._pool_maxsize >= api.POOL_MAXSIZE
+
+
+def test_iter_graphql_follows_cursors(monkeypatch):
+    pages = {
+        None: {'items': {'nodes': [1, 2], 'pageInfo': {'endCursor': 'a', 'hasNextPage': True}}},
+        'a': {'items': {'nodes': [3], 'pageInfo': {'endCursor': 'b', 'hasNextPage': False}}},
+    }
+    sent = []
+
+    def fake_request(method, endpoint, **kwargs):
+        after = kwargs['json']['variables'].get('after', None)
+        sent.append(after)
+        return FakeResponse({'data': pages[after]})
+
+    monkeypatch.setattr(api, 'request', fake_request)
+
+    items = api.iter_graphql('query($after: String) {}', 'items.nodes', 'items.pageInfo')
+    assert list(items) == [1, 2, 3]
+    assert sent == [None, 'a']
+
+
+def test_graphql_data_skips_missing_aliases_when_allowed(monkeypatch):
+    response = FakeResponse({
+        'data': {'b0': {'name': 'one'}, 'b1': None},
+        'errors': [{
+            'type': 'NOT_FOUND',
+            'path': ['b1'],
+            'message': "Could not resolve to a Repository with the name 'org/two'.",
+        }],
+    })
+    monkeypatch.setattr(api, 'request', lambda *args, **kwargs: response)
+
+    assert api.graphql_data('query {}', allow_missing=True) == {'b0': {'name': 'one'}, 'b1': None}
+
+    with pytest.raises(api.GraphqlErrorsException):
+        api.graphql_data('query {}')
+
+
+def test_graphql_data_raises_other_errors_with_partial_data(monkeypatch):
+    response = FakeResponse({
+        'data': {'b0': None},
+        'errors': [{'type': 'FORBIDDEN', 'path': ['b0'], 'message': 'Resource not accessible'}],
+    })
+    monkeypatch.setattr(api, 'request', lambda *args, **kwargs: response)
+
+    with pytest.raises(api.GraphqlErrorsException):
+        api.graphql_data('query {}', allow_missing=True)
+
+
+class FakeStreamResponse(object):
+    def __init__(self, status_code, chunks=(), headers=None):
+        self.status_code = status_code
+        self.chunks = chunks
+        self.headers = headers or {}
+        self.encoding = 'utf-8'
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+def test_iter_lines_streams_through_the_cache(monkeypatch, tmpdir):
+    cache = ResponseCache(str(tmpdir))
+    monkeypatch.setattr(api, 'get_cache', lambda: cache)
+
+    responses = [
+        FakeStreamResponse(200, [b'+a\n-', b'b\n', b' c'], headers={'ETag': '"1"'}),
+        FakeStreamResponse(304),
+    ]
+    sent = []
+
+    def fake_request(method, endpoint, headers={}, **kwargs):
+        sent.append(headers)
+        return responses.pop(0)
+
+    monkeypatch.setattr(api, 'request', fake_request)
+
+    assert list(api.iter_lines('/diff')) == [u'+a\n', u'-b\n', u' c']
+    assert list(api.iter_lines('/diff')) == [u'+a\n', u'-b\n', u' c']
+    assert sent[1]['If-None-Match'] == '"1"'
+
+
+def test_iter_lines_only_caches_complete_bodies(monkeypatch, tmpdir):
+    cache = ResponseCache(str(tmpdir))
+    monkeypatch.setattr(api, 'get_cache', lambda: cache)
+
+    response = FakeStreamResponse(200, [b'1\n', b'2\n'], headers={'ETag': '"1"'})
+    monkeypatch.setattr(api, 'request', lambda *args, **kwargs: response)
+
+    lines = api.iter_lines('/diff')
+    next(lines)
+    lines.close()
+
+    assert response.closed
+    assert cache.get(cache.key('/diff')) is None
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_iter_rest_list_yields_pages_in_order(monkeypatch):
+    last = '<https://api.github.com/x?per_page=100&page=4>; rel="last"'
+    pages = {
+        '/x?per_page=100&page=1': ([1, 2], last),
+        '/x?per_page=100&page=2': ([3, 4], last),
+        '/x?per_page=100&page=3': ([5], last),
+        '/x?per_page=100&page=4': ([6], last),
+    }
+    monkeypatch.setattr(api, 'get_page', lambda endpoint: pages[endpoint])
+
+    assert list(api.iter_rest_list('/x', max_workers=3)) == [1, 2, 3, 4, 5, 6]
+    assert api.get_last_page(None) is None
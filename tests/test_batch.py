@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.github.batch`."""
+
+import pytest
+
+from sweep.github import batch
+
+
+def test_batcher_packs_aliases_and_follows_pages(monkeypatch):
+    pages = {
+        ('one', None): {'nodes': [1, 2], 'pageInfo': {'endCursor': 'x', 'hasNextPage': True}},
+        ('one', 'x'): {'nodes': [3], 'pageInfo': {'endCursor': 'y', 'hasNextPage': False}},
+        ('two', None): {'edges': [{'node': 4}], 'pageInfo': {'endCursor': 'z', 'hasNextPage': False}},
+    }
+    queries = []
+
+    def fake_graphql_data(query, variables, allow_missing=False):
+        queries.append(query)
+        data = {}
+        for alias in ('b0', 'b1'):
+            if alias + ': thing("one")' in query:
+                data[alias] = {'conn': pages[('one', variables[alias + '_after'])]}
+            elif alias + ': thing("two")' in query:
+                data[alias] = {'conn': pages[('two', variables[alias + '_after'])]}
+        return data
+
+    monkeypatch.setattr(batch, 'graphql_data', fake_graphql_data)
+
+    connections = [
+        batch.Connection('one', 'thing("one") { conn(after: $after) }', 'conn'),
+        batch.Connection('two', 'thing("two") { conn(after: $after) }', 'conn'),
+    ]
+    batcher = batch.GraphqlBatcher(max_nodes=200)
+    nodes = list(batcher.iter_nodes(connections))
+
+    assert nodes == [('one', 1), ('one', 2), ('two', 4), ('one', 3)]
+    assert batcher.request_count == 2
+    assert '$b0_after: String, $b1_after: String' in queries[0]
+
+
+def test_batcher_respects_node_budget():
+    connections = [batch.Connection(i, '', '', node_cost=40) for i in range(5)]
+    batches = list(batch.GraphqlBatcher(max_nodes=100).iter_batches(connections))
+    assert [len(b) for b in batches] == [2, 2, 1]
+
+
+def test_batcher_packs_fields_into_aliases(monkeypatch):
+    queries = []
+
+    def fake_graphql_data(query, variables=None, allow_missing=False):
+        queries.append(query)
+        return {'b0': {'n': 0}, 'b1': None}
+
+    monkeypatch.setattr(batch, 'graphql_data', fake_graphql_data)
+
+    batcher = batch.GraphqlBatcher(max_aliases=2, max_workers=1)
+    results = list(batcher.iter_fields([('a', 'thing("a")'), ('b', 'thing("b")'), ('c', 'thing("c")')]))
+
+    assert results == [('a', {'n': 0}), ('b', None), ('c', {'n': 0})]
+    assert len(queries) == 2
+    assert 'b1: thing("b")' in queries[0]
+
+
+def test_batcher_raises_errors_from_concurrent_batches(monkeypatch):
+    def fake_graphql_data(query, variables=None, allow_missing=False):
+        if 'thing("b")' in query:
+            raise ValueError('bad batch')
+        return {'b0': {'n': 0}}
+
+    monkeypatch.setattr(batch, 'graphql_data', fake_graphql_data)
+
+    batcher = batch.GraphqlBatcher(max_aliases=1, max_workers=2)
+    with pytest.raises(ValueError):
+        list(batcher.iter_fields([('a', 'thing("a")'), ('b', 'thing("b")'), ('c', 'thing("c")')]))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.github.bulk`."""
+
+import threading
+
+from sweep.github.bulk import BulkExecutor
+
+
+def test_groups_run_in_order_and_in_parallel():
+    seen = []
+    lock = threading.Lock()
+
+    def action(item):
+        with lock:
+            seen.append(item)
+
+    items = [('a', 1), ('b', 1), ('a', 2), ('b', 2), ('a', 3)]
+    results = BulkExecutor(action, group_key=lambda item: item[0], max_workers=2).run(items)
+
+    assert all(result.ok for result in results)
+    assert [item for item in seen if item[0] == 'a'] == [('a', 1), ('a', 2), ('a', 3)]
+    assert [item for item in seen if item[0] == 'b'] == [('b', 1), ('b', 2)]
+
+
+def test_stop_policy_leaves_the_rest_unattempted():
+    def action(item):
+        if item == 2:
+            raise ValueError('nope')
+
+    results = BulkExecutor(action, group_key=lambda item: 'repo', on_error='stop').run([1, 2, 3])
+
+    assert [(r.item, r.ok, r.attempted) for r in results] == [(1, True, True), (2, False, True), (3, False, False)]
+
+
+def test_skip_policy_carries_on():
+    def action(item):
+        if item == 2:
+            raise ValueError('nope')
+
+    results = BulkExecutor(action, group_key=lambda item: 'repo', on_error='skip').run([1, 2, 3])
+
+    assert [r.ok for r in results] == [True, False, True]
+
+
+def test_cleanup_failures_dont_repeat_or_stop_the_action():
+    calls = []
+
+    def action(item):
+        calls.append(item)
+        return item * 10
+
+    def cleanup(item, value):
+        if item == 1:
+            raise ValueError('branch already deleted')
+
+    executor = BulkExecutor(action, group_key=lambda item: 'repo', cleanup=cleanup, on_error='retry')
+    results = executor.run([1, 2])
+
+    assert calls == [1, 2]
+    assert [(r.ok, r.cleaned_up, r.attempts, r.value) for r in results] == [(True, False, 1, 10), (True, True, 1, 20)]
+    assert str(results[0].cleanup_error) == 'branch already deleted'
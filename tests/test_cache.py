@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.github.cache`."""
+
+import os
+import time
+
+from sweep.github.cache import ResponseCache
+
+
+def test_cache_round_trip(tmpdir):
+    cache = ResponseCache(str(tmpdir))
+    key = cache.key('/repos/a/b/pulls/1', 'application/vnd.github.v3.diff')
+
+    assert cache.get(key) is None
+
+    cache.put(key, {'ETag': '"abc"'}, b'diff --git')
+    cached = cache.get(key)
+
+    assert cached.text() == u'diff --git'
+    assert cached.validators() == {'If-None-Match': '"abc"'}
+
+
+def test_cache_skips_responses_without_validators(tmpdir):
+    cache = ResponseCache(str(tmpdir))
+    cache.put('key', {}, b'body')
+    assert cache.get('key') is None
+
+
+def test_cache_evicts_least_recently_used(tmpdir):
+    cache = ResponseCache(str(tmpdir), max_size=10)
+
+    cache.put('old', {'ETag': '1'}, b'12345')
+    past = time.time() - 60
+    os.utime(cache.meta_path('old'), (past, past))
+    cache.put('new', {'ETag': '2'}, b'12345')
+    cache.put('newer', {'ETag': '3'}, b'12345')
+
+    assert cache.get('old') is None
+    assert cache.get('new') is not None
+    assert cache.get('newer') is not None
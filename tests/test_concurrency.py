@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.github.concurrency`."""
+
+import threading
+import time
+
+import pytest
+
+from sweep.github.concurrency import run_concurrently
+
+
+def test_calls_run_at_once_up_to_the_limit():
+    lock = threading.Lock()
+    running = [0]
+    most = [0]
+
+    def func(item):
+        with lock:
+            running[0] += 1
+            most[0] = max(most[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return item * 2
+
+    results = list(run_concurrently(func, range(9), max_workers=3))
+
+    assert most[0] == 3
+    assert sorted((item, result) for item, result, _ in results) == [(i, i * 2) for i in range(9)]
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_errors_are_yielded_for_the_caller(max_workers):
+    def func(item):
+        if item == 2:
+            raise ValueError('nope')
+        return item
+
+    results = dict((item, (result, error)) for item, result, error in run_concurrently(func, [1, 2, 3], max_workers=max_workers))
+
+    assert results[1] == (1, None)
+    assert results[3] == (3, None)
+    assert results[2][0] is None
+    assert str(results[2][1]) == 'nope'
+
+
+def test_items_are_pulled_as_workers_free_up():
+    pulled = []
+
+    def items():
+        for i in range(10):
+            pulled.append(i)
+            yield i
+
+    results = run_concurrently(lambda item: item, items(), max_workers=2)
+    next(results)
+
+    # the two it started with, and one more to replace the finished call
+    assert len(pulled) <= 3
+    results.close()
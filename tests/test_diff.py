@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.diff`."""
+
+import click
+
+from sweep import diff
+from sweep.diff import DiffColorizer, HEADER_STYLE, REMOVED_STYLE, RESET
+
+
+DIFF = [
+    'diff --git a/setup.py b/setup.py\n',
+    '--- a/setup.py\n',
+    '+++ b/setup.py\n',
+    '@@ -1,3 +1,3 @@\n',
+    ' import os\n',
+    '--- not a header\n',
+    '+added\n',
+    '\\ No newline at end of file',
+]
+
+
+def test_colorizer_keeps_the_text():
+    colorized = list(DiffColorizer().colorize(DIFF))
+    assert [click.unstyle(line) for line in colorized] == DIFF
+
+
+def test_colorizer_tells_headers_from_removed_lines():
+    colorized = list(DiffColorizer().colorize(DIFF))
+
+    assert colorized[1] == HEADER_STYLE + '--- a/setup.py' + RESET + '\n'
+    assert colorized[4] == ' import os\n'
+    assert colorized[5] == REMOVED_STYLE + '--- not a header' + RESET + '\n'
+
+
+def test_syntax_highlighting_keeps_the_text(monkeypatch):
+    from pygments.lexers import PythonLexer
+    monkeypatch.setattr(diff, 'lexer_for_diff_header', lambda line: PythonLexer(stripnl=False, ensurenl=False))
+
+    colorized = list(DiffColorizer(syntax=True).colorize(DIFF))
+    assert [click.unstyle(line) for line in colorized] == DIFF
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.github.file_updates`."""
+
+from sweep.github import file_updates
+from sweep.github.organization import Organization
+from sweep.github.repository import git_blob_sha
+
+
+def write(tmpdir, name, contents):
+    path = tmpdir.join(name)
+    path.write_binary(contents)
+    return str(path)
+
+
+def test_plan_sorts_repos_by_what_they_need(monkeypatch, tmpdir):
+    updates = [
+        file_updates.FileUpdate('/ci.yml', write(tmpdir, 'old', b'old\n'), write(tmpdir, 'new', b'new\n')),
+        file_updates.FileUpdate('setup.cfg', write(tmpdir, 'old2', b'a\n'), write(tmpdir, 'new2', b'b\n')),
+    ]
+    branch = {'name': 'master', 'target': {'oid': 'head'}}
+    repos = {
+        'both': {'defaultBranchRef': branch, 'f0': {'oid': git_blob_sha(b'old\n')}, 'f1': {'oid': git_blob_sha(b'a\n')}},
+        'different': {'defaultBranchRef': branch, 'f0': {'oid': 'xyz'}, 'f1': None},
+        'done': {'defaultBranchRef': branch, 'f0': {'oid': git_blob_sha(b'new\n')}, 'f1': None},
+        'empty': {'defaultBranchRef': None},
+    }
+    queries = []
+
+    def fake_iter_fields(self, fields):
+        for name, field in fields:
+            queries.append(field)
+            yield name, repos[name]
+
+    monkeypatch.setattr(file_updates.GraphqlBatcher, 'iter_fields', fake_iter_fields)
+
+    plans = file_updates.plan_file_updates(Organization('org'), ['both', 'different', 'done', 'empty'], updates)
+
+    assert [plan.result for plan in plans] == ['updated', 'mismatched', 'skipped', 'skipped']
+    assert [update.path_in_repo for update, _ in plans[0].writes] == ['ci.yml', 'setup.cfg']
+    assert plans[2].already_updated == [updates[0]]
+    assert '"HEAD:ci.yml"' in queries[0]
+
+
+def test_several_files_go_in_one_commit(monkeypatch, tmpdir):
+    update = file_updates.FileUpdate('a', write(tmpdir, 'old', b'old\n'), write(tmpdir, 'new', b'new\n'))
+    other = file_updates.FileUpdate('b', write(tmpdir, 'old2', b'a\n'), write(tmpdir, 'new2', b'b\n'))
+    plan = file_updates.RepoFilePlan('repo', branch='main', head_oid='head')
+    plan.writes = [(update, 'x'), (other, 'y')]
+
+    mutations = []
+    monkeypatch.setattr(file_updates.Repository, 'commit_files', lambda self, *args, **kwargs: mutations.append(args))
+
+    file_updates.apply_file_plan(Organization('org'), plan)
+
+    assert mutations == [('main', 'head', {'a': b'new\n', 'b': b'b\n'})]
+
+
+def test_repos_with_any_mismatched_path_are_left_alone(monkeypatch, tmpdir):
+    updates = [
+        file_updates.FileUpdate('ci.yml', write(tmpdir, 'old', b'old\n'), write(tmpdir, 'new', b'new\n')),
+        file_updates.FileUpdate('setup.cfg', write(tmpdir, 'old2', b'a\n'), write(tmpdir, 'new2', b'b\n')),
+    ]
+    repos = {
+        'partial': {
+            'defaultBranchRef': {'name': 'master', 'target': {'oid': 'head'}},
+            'f0': {'oid': git_blob_sha(b'old\n')},
+            'f1': {'oid': 'xyz'},
+        },
+    }
+    monkeypatch.setattr(
+        file_updates.GraphqlBatcher, 'iter_fields', lambda self, fields: ((name, repos[name]) for name, _ in fields),
+    )
+
+    plan, = file_updates.plan_file_updates(Organization('org'), ['partial'], updates)
+
+    assert plan.writes == []
+    assert plan.result == 'mismatched'
+    assert plan.details() == 'different: setup.cfg; not updated: ci.yml'
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.github.labels`."""
+
+import pytest
+import requests
+
+from sweep.github import labels, repository
+from sweep.github.organization import Organization
+
+
+def test_plan_label_actions():
+    bug = {'name': 'bug', 'color': 'FF0000'}
+
+    assert labels.plan_label_action('create', None, 'bug', color='ff0000') == 'create'
+    assert labels.plan_label_action('create', bug, 'bug', color='#ff0000') is None
+    assert labels.plan_label_action('create', bug, 'bug', color='00ff00') == 'update'
+    assert labels.plan_label_action('create', bug, 'Bug', color='ff0000') == 'update'
+    assert labels.plan_label_action('update', None, 'bug', color='00ff00') is None
+    assert labels.plan_label_action('update', bug, 'bug', new_name='defect') == 'update'
+    assert labels.plan_label_action('delete', bug, 'bug') == 'delete'
+    assert labels.plan_label_action('delete', None, 'bug') is None
+
+
+def test_plan_labels_only_touches_repos_that_need_it(monkeypatch):
+    existing = {
+        'a': {'label': None},
+        'b': {'label': {'name': 'bug', 'color': 'ff0000'}},
+        'c': {'label': {'name': 'bug', 'color': '000000'}},
+    }
+    monkeypatch.setattr(labels.GraphqlBatcher, 'iter_fields', lambda self, fields: ((name, existing[name]) for name, _ in fields))
+
+    plans = labels.plan_labels(Organization('org'), ['a', 'b', 'c'], 'create', 'bug', color='ff0000')
+
+    assert [plan.result for plan in plans] == ['created', 'skipped', 'updated']
+
+
+def test_refused_creates_fail_the_plan(monkeypatch):
+    class FakeResponse(object):
+        def json(self):
+            return {'message': 'Validation Failed', 'errors': [{'field': 'name', 'code': 'already_exists'}]}
+
+    def fake_rest(method, endpoint, data=None):
+        raise requests.exceptions.HTTPError(response=FakeResponse())
+
+    monkeypatch.setattr(repository, 'rest', fake_rest)
+
+    plan = labels.RepoLabelPlan('a', action='create')
+    with pytest.raises(repository.LabelError) as info:
+        labels.apply_label_plan(Organization('org'), plan, 'bug', color='ff0000')
+
+    assert str(info.value) == 'Field "name" already_exists'
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.object_prompt`."""
+
+from sweep import object_prompt
+from sweep.object_prompt import ObjectPrompt
+
+
+class FakePrompt(ObjectPrompt):
+    def __init__(self, children):
+        self.next_children = children
+        super(FakePrompt, self).__init__(child_key='name')
+
+    def get_children(self):
+        return self.next_children
+
+
+def test_refresh_runs_in_the_background():
+    fake = FakePrompt([{'name': 'a'}])
+    fake.set_children(fake.get_children())
+    choices = fake.choices
+
+    fake.next_children = [{'name': 'a'}, {'name': 'b'}]
+    fake.children_loaded_at = 0
+    fake.start_refresh()
+    fake.refresh_thread.join()
+
+    # completions see them right away, the children when we're ready
+    assert list(choices) == ['a', 'b']
+    assert fake.children == [{'name': 'a'}]
+
+    assert fake.apply_refresh()
+    assert fake.children == [{'name': 'a'}, {'name': 'b'}]
+    assert not fake.apply_refresh()
+
+
+def test_refresh_redraws_the_overview_at_the_prompt():
+    fake = FakePrompt([{'name': 'a'}])
+    fake.set_children(fake.get_children())
+    drawn = []
+    fake.overview = lambda refresh=True: drawn.append(list(fake.children))
+
+    fake.next_children = [{'name': 'a'}, {'name': 'b'}]
+    fake.children_loaded_at = 0
+    fake.overview_at_prompt = True
+    fake.start_refresh()
+    fake.refresh_thread.join()
+
+    assert drawn == [[{'name': 'a'}, {'name': 'b'}]]
+    assert not fake.apply_refresh()
+
+
+def test_refresh_waits_for_the_interval(monkeypatch):
+    monkeypatch.setattr(object_prompt, '_refresh_interval', 60)
+
+    fake = FakePrompt([{'name': 'a'}])
+    fake.set_children(fake.get_children())
+    fake.start_refresh()
+
+    assert fake.refresh_thread is None
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.github.organization`."""
+
+from sweep.github import organization
+from sweep.github.organization import Organization
+
+
+def listing_node(number, title, author='dependabot', status='SUCCESS'):
+    return {
+        'id': 'PR{}'.format(number),
+        'title': title,
+        'number': number,
+        'state': 'OPEN',
+        'updatedAt': '2017-09-06T00:00:00Z',
+        'headRefName': 'branch-{}'.format(number),
+        'headRefOid': 'sha{}'.format(number),
+        'author': {'login': author},
+        'commits': {'totalCount': 1, 'edges': [{'node': {'commit': {'status': {'id': 'S', 'state': status}}}}]},
+        'repository': {'name': 'repo'},
+    }
+
+
+def test_search_query_combines_filters():
+    org = Organization('org')
+
+    assert org.search_query('open', 'SUCCESS', 'dependabot') == 'org:org is:pr is:open author:dependabot status:success'
+    assert org.search_query('merged', None, None) == 'org:org is:pr is:merged'
+    assert org.search_query('all', None, None) is None
+
+
+def test_titles_are_only_filtered_locally(monkeypatch):
+    queries = []
+
+    def fake_graphql(query, variables=None):
+        queries.append(variables['query'])
+        nodes = [listing_node(1, 'Bump deps'), listing_node(2, 'Update dependency'), listing_node(3, 'Fix typo')]
+        return {'search': {'issueCount': 3, 'pageInfo': {'endCursor': None, 'hasNextPage': False}, 'nodes': nodes}}
+
+    monkeypatch.setattr(organization, 'graphql', fake_graphql)
+
+    pulls = Organization('org').filter_pulls(state='open', title='dep', status=None)
+
+    assert [pull.number for pull in pulls] == [1, 2]
+    assert 'in:title' not in queries[0]
+
+
+def test_author_matches_like_github_search(monkeypatch):
+    def fake_graphql(query, variables=None):
+        nodes = [listing_node(1, 'Bump deps'), listing_node(2, 'Fix typo', author='someone'), listing_node(3, 'Gone', author=None)]
+        return {'search': {'issueCount': 3, 'pageInfo': {'endCursor': None, 'hasNextPage': False}, 'nodes': nodes}}
+
+    monkeypatch.setattr(organization, 'graphql', fake_graphql)
+
+    pulls = Organization('org').filter_pulls(state='open', title=None, status=None, author='Dependabot')
+
+    assert [pull.number for pull in pulls] == [1]
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.profiling`."""
+
+from sweep import profiling
+from sweep.github import api
+
+
+class FakeResponse(object):
+    def __init__(self, status_code=200, content=b'', data=None):
+        self.status_code = status_code
+        self.content = content
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert profiling.percentile(values, 50) == 50
+    assert profiling.percentile(values, 99) == 99
+    assert profiling.percentile([], 50) is None
+
+
+def test_with_cost_field_leaves_mutations_alone():
+    query = profiling.with_cost_field('query {\n  viewer { login }\n}\n')
+    assert query.endswith('{}: rateLimit {{ cost }}\n}}'.format(profiling.COST_ALIAS))
+
+    mutation = 'mutation { addComment(input: {}) { clientMutationId } }'
+    assert profiling.with_cost_field(mutation) == mutation
+
+
+def test_requests_count_towards_the_current_command():
+    profiler = profiling.Profiler()
+    profiler.start_command('pulls')
+    profiler.record_request('graphql', 'POST', '/graphql', FakeResponse(content=b'1234'), started_at=0, seconds=0.2)
+
+    profiler.start_command('pull 5')
+    profiler.record_request('rest', 'GET', '/a', FakeResponse(status_code=304), started_at=0, seconds=0.1)
+    profiler.record_request('rest', 'GET', '/b', FakeResponse(content=b'12'), started_at=0, seconds=0.3)
+    profiler.finish_command()
+
+    profiler.add_time('render', 0.5)
+    profiler.finish_command()
+
+    summaries = dict(((name, kind), stats) for name, kind, stats in profiler.summaries())
+    assert summaries[('pulls', 'graphql')]['bytes'] == 4
+    assert summaries[('pull 5', 'rest')]['calls'] == 2
+    assert summaries[('pull 5', 'rest')]['cache_hits'] == 1
+    assert summaries[('pull 5', 'rest')]['max'] == 0.3
+
+    timings = dict((name, phases) for name, _, _, phases in profiler.timing_summaries())
+    assert timings['pulls'] == {'render': 0.5}
+
+
+def test_graphql_data_records_cost(monkeypatch):
+    profiler = profiling.Profiler()
+    monkeypatch.setattr(profiling, '_profiler', profiler)
+    profiler.start_command('overview')
+    sent = []
+
+    def fake_request(method, endpoint, **kwargs):
+        sent.append(kwargs['json']['query'])
+        response = FakeResponse(data={'data': {'viewer': {}, profiling.COST_ALIAS: {'cost': 3}}})
+        profiler.record_request('graphql', method, endpoint, response, started_at=0, seconds=0.1)
+        return response
+
+    monkeypatch.setattr(api, 'request', fake_request)
+
+    assert api.graphql_data('query { viewer { login } }') == {'viewer': {}}
+    assert 'rateLimit' in sent[0]
+    assert profiler.commands[0].requests[0].cost == 3
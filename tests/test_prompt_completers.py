@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.prompt_completers`."""
+
+import click
+from prompt_toolkit.document import Document
+
+from sweep.prompt_completers import ClickCompleter, CompletionIndex
+
+
+def test_index_completes_prefixes_and_updates():
+    index = CompletionIndex(['web', 'api', 'web-app', 'worker'])
+
+    assert index.complete('web') == ['web', 'web-app']
+    assert index.complete('x') == []
+
+    index.update(['web', 'api', 'web-app', 'worker', 'website'])
+    assert index.complete('web') == ['web', 'web-app', 'website']
+    assert 'website' in index
+
+
+def test_index_ranks_fuzzy_matches():
+    index = CompletionIndex(['sweep', 'web-app', 'frontend-web', 'wide-ebook'])
+    assert index.fuzzy('web') == ['frontend-web', 'wide-ebook']
+
+
+def test_completer_offers_commands_and_choices():
+    @click.group()
+    def group():
+        pass
+
+    @group.command()
+    def repo():
+        pass
+
+    completer = ClickCompleter(
+        click.Context(group),
+        default_subcommand='repo',
+        default_subcommand_choices=['reports', 'api'],
+        fuzzy=True,
+    )
+    completions = completer.get_completions(Document(u're'))
+
+    assert [c.text for c in completions] == ['repo', 'reports']
+
+
+def test_completer_only_goes_fuzzy_when_prefixes_come_up_short():
+    @click.group()
+    def group():
+        pass
+
+    @group.command()
+    def repo():
+        pass
+
+    choices = ['web-{}'.format(i) for i in range(10)] + ['frontend-web']
+    completer = ClickCompleter(click.Context(group), default_subcommand='repo', default_subcommand_choices=choices, fuzzy=True)
+
+    def complete(text):
+        return [c.text for c in completer.get_completions(Document(text))]
+
+    # plenty of prefix matches, so no scan for fuzzy ones
+    assert 'frontend-web' not in complete(u'web')
+    # too short to be worth it
+    assert complete(u'fw') == []
+    assert complete(u'fweb') == ['frontend-web']
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.github.pull_request`."""
+
+from sweep.github import pull_request
+from sweep.github.organization import Organization
+from sweep.github.pull_record import PullRecord
+from sweep.github.repository import Repository
+
+
+def test_listing_fields_cover_bulk_actions():
+    for action in ('close', 'merge'):
+        for field in pull_request.PullRequest.REQUIRED_FIELDS[action]:
+            assert field in pull_request.PULL_REQUEST_LISTING_FIELDS.split()
+
+
+def test_fields_for_only_queries_whats_missing(monkeypatch):
+    queries = []
+
+    def fake_graphql(query):
+        queries.append(query)
+        return {'repository': {'pullRequest': {'headRefOid': 'abc'}}}
+
+    monkeypatch.setattr(pull_request, 'graphql', fake_graphql)
+
+    repo = Repository(owner=Organization('org'), name='repo')
+    pull = pull_request.PullRequest(repo=repo, number=1, data={'title': 'Hi', 'headRefName': 'branch'})
+
+    assert pull.fields_for('close')['headRefName'] == 'branch'
+    assert queries == []
+
+    assert pull.fields_for('merge')['headRefOid'] == 'abc'
+    assert len(queries) == 1
+    assert 'headRefOid' in queries[0] and 'title' not in queries[0]
+    assert 'mergeable' not in queries[0]
+
+
+def test_snapshot_starts_over_when_the_head_moves(monkeypatch):
+    responses = [
+        {'headRefOid': 'new', 'headRefName': 'branch'},
+        {'headRefOid': 'new', 'headRefName': 'branch', 'title': 'Updated'},
+    ]
+    queries = []
+
+    def fake_graphql(query):
+        queries.append(query)
+        return {'repository': {'pullRequest': responses.pop(0)}}
+
+    monkeypatch.setattr(pull_request, 'graphql', fake_graphql)
+
+    repo = Repository(owner=Organization('org'), name='repo')
+    pull = pull_request.PullRequest(repo=repo, number=1, data={'title': 'Old', 'headRefOid': 'old', 'url': 'x'})
+
+    data = pull.fields_for('merge')
+
+    assert data['headRefOid'] == 'new'
+    assert data['title'] == 'Updated'
+    assert 'url' not in data
+    assert responses == []
+    # only what merge needs, not the whole overview
+    assert 'mergeable' not in queries[1]
+
+
+def test_rendered_patches_are_reused_by_blob_sha(monkeypatch):
+    repo = Repository(owner=Organization('org'), name='repo')
+    pull = pull_request.PullRequest(repo=repo, number=1)
+    rendered = []
+    monkeypatch.setattr(pull_request, 'patch_lines', lambda f: rendered.append(f['filename']) or ['+a\n'])
+
+    first = pull.render_patch({'filename': 'a.py', 'sha': 'abc', 'status': 'added'})
+    again = pull.render_patch({'filename': 'a.py', 'sha': 'abc', 'status': 'added'})
+    pull.render_patch({'filename': 'a.py', 'sha': 'def', 'status': 'modified'})
+
+    assert first == again
+    assert rendered == ['a.py', 'a.py']
+
+
+def test_patch_lines_for_an_added_file():
+    lines = pull_request.patch_lines({'filename': 'a.py', 'status': 'added', 'sha': 'abc', 'patch': '@@ -0,0 +1 @@\n+a'})
+    assert lines == ['diff --git a/a.py b/a.py\n', '--- /dev/null\n', '+++ b/a.py\n', '@@ -0,0 +1 @@\n', '+a']
+
+
+def test_pull_records_cover_bulk_actions():
+    record = PullRecord('repo', 1, id='PR_1', title='Hi', head_sha='abc', head_ref='branch')
+    for action in ('close', 'merge'):
+        for field in pull_request.PullRequest.REQUIRED_FIELDS[action]:
+            assert field in record.snapshot_data()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.github.ratelimit`."""
+
+import time
+
+from sweep.github.ratelimit import RateLimiter, RateLimit
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, headers={}, text=''):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+
+
+def test_waits_for_reset_when_limit_is_used_up():
+    limiter = RateLimiter(write_interval=0)
+    limiter.limits['core'] = RateLimit(limit=5000, remaining=0, reset=time.time() + 30)
+    assert 29 < limiter.delay_for('core') <= 30
+    assert limiter.delay_for('graphql') == 0
+
+
+def test_paced_requests_get_their_own_slots():
+    limiter = RateLimiter(write_interval=0)
+    limiter.limits['graphql'] = RateLimit(limit=5000, remaining=10, reset=time.time() + 100)
+
+    delays = [limiter.delay_for('graphql') for _ in range(3)]
+    assert delays[0] == 0
+    assert 9 < delays[1] <= 10
+    # fewer left, so a longer wait
+    assert 20 < delays[2] < 22
+
+
+def test_writes_are_spaced_out():
+    limiter = RateLimiter(write_interval=1)
+    assert limiter.delay_for('core', write=True) == 0
+    assert 0.9 < limiter.delay_for('core', write=True) <= 1
+    assert limiter.delay_for('core') == 0
+
+
+def test_retry_delay_for_secondary_limits():
+    limiter = RateLimiter()
+    assert limiter.retry_delay(FakeResponse(403, {'Retry-After': '7'}), attempt=0) == 7
+    assert limiter.retry_delay(FakeResponse(403, text='You have exceeded a secondary rate limit'), attempt=1) == 120
+    assert limiter.retry_delay(FakeResponse(403, text='Resource not accessible'), attempt=0) is None
+    assert limiter.retry_delay(FakeResponse(422), attempt=0) is None
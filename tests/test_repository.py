@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.github.repository`."""
+
+from sweep.github import repository
+from sweep.github.organization import Organization
+
+
+def test_git_blob_sha_matches_git():
+    # git hash-object of "hello\n"
+    assert repository.git_blob_sha(b'hello\n') == 'ce013625030ba8dba906f756967f9e9ca394464a'
+
+
+def test_matching_blob_shas_ignore_trailing_newlines(tmpdir):
+    path = tmpdir.join('file')
+    path.write_binary(b'hello')
+    assert repository.git_blob_sha(b'hello\n') in repository.matching_blob_shas(str(path))
+
+
+def test_update_file_skips_files_that_dont_match(monkeypatch, tmpdir):
+    matching = tmpdir.join('matching')
+    matching.write_binary(b'old\n')
+    new = tmpdir.join('new')
+    new.write_binary(b'new\n')
+    written = []
+    monkeypatch.setattr(repository, 'rest', lambda method, endpoint, data=None: written.append((endpoint, data['sha'])))
+
+    repo = repository.Repository(owner=Organization('org'), name='repo')
+    repo.update_file('a.txt', str(matching), str(new), oid='different')
+    repo.update_file('a.txt', str(matching), str(new), oid=repository.git_blob_sha(b'old\n'))
+
+    assert written == [('/repos/org/repo/contents/a.txt', repository.git_blob_sha(b'old\n'))]
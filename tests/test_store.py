@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.github.store`."""
+
+import time
+
+from sweep.github import store as store_module
+from sweep.github.organization import Organization
+from sweep.github.pull_record import PullRecord
+from sweep.github.repository import Repository
+from sweep.github.store import PullRequestStore
+
+
+def make_pull(repo, number, state='OPEN', status='SUCCESS', updated_at='2017-09-06T00:00:00Z'):
+    return {
+        'id': 'PR_{}_{}'.format(repo, number),
+        'number': number,
+        'title': 'Update {}'.format(repo),
+        'state': state,
+        'updatedAt': updated_at,
+        'headRefName': 'update',
+        'headRefOid': 'abc123',
+        'author': {'login': 'bot'},
+        'commits': {
+            'totalCount': 1,
+            'edges': [{'node': {'commit': {'status': {'id': 'S', 'state': status}}}}],
+        },
+        'repository': {'name': repo},
+    }
+
+
+def test_pull_rows_round_trip():
+    pull = PullRecord.from_node(make_pull('sweep', 1))
+    assert PullRecord(*pull.to_row()) == pull
+    assert pull.status == 'SUCCESS' and pull.author == 'bot' and pull.commit_count == 1
+
+
+def test_store_counts_open_pulls_per_repo(tmpdir):
+    store = PullRequestStore(path=str(tmpdir.join('store.sqlite3')))
+
+    with store.connection:
+        store.connection.executemany('INSERT INTO repos (org, name) VALUES (?, ?)', [('org', 'a'), ('org', 'b')])
+        store._save_pulls('org', [
+            PullRecord.from_node(pull)
+            for pull in (make_pull('a', 1), make_pull('a', 2), make_pull('b', 3, state='MERGED'))
+        ])
+
+    assert store.repos('org') == [
+        {'name': 'a', 'pullRequests': {'totalCount': 2}},
+        {'name': 'b', 'pullRequests': {'totalCount': 0}},
+    ]
+
+    store.set_pull_state('org', 'a', 2, 'CLOSED')
+    assert [pull.number for pull in store.pulls('org', repo='a')] == [1]
+
+
+def synced_store(tmpdir, pulls, synced_at):
+    store = PullRequestStore(path=str(tmpdir.join('store.sqlite3')))
+    with store.connection:
+        store.connection.executemany('INSERT INTO repos (org, name) VALUES (?, ?)', [('org', 'a'), ('org', 'b')])
+        store._save_pulls('org', [PullRecord.from_node(pull) for pull in pulls])
+        store._save_sync('org', '2017-09-06T00:00:00Z', synced_at, full_synced_at=synced_at)
+    return store
+
+
+def test_search_picks_up_where_the_result_limit_stops(monkeypatch, tmpdir):
+    pages = {
+        '2017-01-01T00:00:00Z': [make_pull('a', 1, updated_at='T1'), make_pull('a', 2, updated_at='T2')],
+        'T2': [make_pull('a', 2, updated_at='T2'), make_pull('b', 3, updated_at='T3')],
+        'T3': [make_pull('b', 3, updated_at='T3')],
+    }
+    queries = []
+
+    def fake_iter_graphql(query, to_return_path, page_info_path, variables=None):
+        queries.append(variables['query'])
+        return iter(pages[variables['query'].split('updated:>=')[1].split()[0]])
+
+    monkeypatch.setattr(store_module, 'iter_graphql', fake_iter_graphql)
+    monkeypatch.setattr(store_module, 'SEARCH_RESULT_LIMIT', 2)
+
+    store = PullRequestStore(path=str(tmpdir.join('store.sqlite3')))
+    pulls = store.search_updated_pulls('org', '2017-01-01T00:00:00Z')
+
+    assert [pull.number for pull in pulls] == [1, 2, 2, 3, 3]
+    assert len(queries) == 3
+    assert 'org:org is:pr updated:>=T2 sort:updated-asc' in queries
+
+
+def test_incremental_sync_adds_new_repos_and_rechecks_pending(monkeypatch, tmpdir):
+    store = synced_store(tmpdir, [make_pull('a', 1, status='PENDING'), make_pull('b', 2)], synced_at=time.time() - 600)
+
+    def fake_graphql(query, variables=None):
+        if 'nodes(ids:' in query:
+            assert variables == {'ids': ['PR_a_1']}
+            return {'nodes': [make_pull('a', 1, status='SUCCESS')]}
+        return {'organization': {'repositories': {'nodes': [{'name': 'c'}, {'name': 'a'}]}}}
+
+    monkeypatch.setattr(store_module, 'graphql', fake_graphql)
+    monkeypatch.setattr(store_module, 'iter_graphql', lambda *args, **kwargs: iter([make_pull('c', 3)]))
+    monkeypatch.setattr(store_module.PullRequestStore, 'sync_full', lambda self, organization: 1 / 0)
+
+    store.ensure_synced(Organization('org', store=store))
+
+    assert [repo['name'] for repo in store.repos('org')] == ['a', 'b', 'c']
+    assert [(pull.number, pull.status) for pull in store.pulls('org')] == [(1, 'SUCCESS'), (2, 'SUCCESS'), (3, 'SUCCESS')]
+    assert time.time() - store.get_sync('org')[1] < 60
+
+
+def test_a_repo_doesnt_wait_for_the_first_full_sync(monkeypatch, tmpdir):
+    store = PullRequestStore(path=str(tmpdir.join('store.sqlite3')))
+    monkeypatch.setattr(store_module.PullRequestStore, 'sync_full', lambda self, organization: 1 / 0)
+    monkeypatch.setattr(Repository, 'iter_children', lambda self: iter([PullRecord('a', 1)]))
+
+    repository = Repository(owner=Organization('org', store=store), name='a')
+    assert repository.get_children() == [PullRecord('a', 1)]
@@ -3,36 +3,39 @@
 
 """Tests for `sweep` package."""
 
-import pytest
+import subprocess
+import sys
 
 from click.testing import CliRunner
 
-from sweep import sweep
 from sweep import cli
 
 
-@pytest.fixture
-def response():
-    """Sample pytest fixture.
+def test_command_line_interface():
+    """Test the CLI."""
+    runner = CliRunner()
+    help_result = runner.invoke(cli.organization, ['--help'], obj={})
+    assert help_result.exit_code == 0
+    assert 'Interactively work through an organization\'s pull requests' in help_result.output
+    assert '--help' in help_result.output
 
-    See more at: http://doc.pytest.org/en/latest/fixture.html
-    """
-    # import requests
-    # return requests.get('https://github.com/audreyr/cookiecutter-pypackage')
 
+def test_estimate_is_skipped_when_rate_limits_cant_be_fetched(monkeypatch, capsys):
+    import requests
 
-def test_content(response):
-    """Sample pytest test function with the pytest fixture as an argument."""
-    # from bs4 import BeautifulSoup
-    # assert 'GitHub' in BeautifulSoup(response.content).title.string
+    def fail():
+        raise requests.exceptions.ConnectionError()
 
+    monkeypatch.setattr(cli, 'fetch_rate_limits', fail)
 
-def test_command_line_interface():
-    """Test the CLI."""
-    runner = CliRunner()
-    result = runner.invoke(cli.main)
-    assert result.exit_code == 0
-    assert 'sweep.cli.main' in result.output
-    help_result = runner.invoke(cli.main, ['--help'])
-    assert help_result.exit_code == 0
-    assert '--help  Show this message and exit.' in help_result.output
+    cli.echo_estimate(writes=2)
+    assert 'Couldn\'t get the rate limits' in capsys.readouterr().out
+
+
+def test_heavy_modules_are_imported_lazily():
+    # a fresh interpreter, since other tests will have imported them
+    code = 'import sys, sweep.cli; print(" ".join(sorted(sys.modules)))'
+    modules = subprocess.check_output([sys.executable, '-c', code]).decode().split()
+
+    for name in ('prompt_toolkit', 'pygments', 'requests', 'terminaltables'):
+        assert name not in modules
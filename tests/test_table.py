@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `sweep.table`."""
+
+import click
+
+from sweep import table
+
+
+def test_columns_are_sized_from_the_sample():
+    streaming = table.StreamingTable(['Number', 'Title'], widths=[6, None], sample_size=2)
+    lines = list(streaming.iter_lines([(1, 'Bump'), (2, 'Update'), (3, 'Something much longer')]))
+
+    assert lines[0] == '+--------+--------+'
+    assert lines[1] == '| Number | Title  |'
+    assert lines[3] == '| 1      | Bump   |'
+    # rows after the sample get cut to fit
+    assert lines[5] == u'| 3      | Somet… |'
+    assert lines[-1] == lines[0]
+
+
+def test_styled_cells_are_padded_by_their_visible_width():
+    cell = click.style(u'✔', fg='green')
+    streaming = table.StreamingTable(['Status'])
+    lines = list(streaming.iter_lines([(cell,)]))
+
+    assert click.unstyle(lines[3]) == u'| ✔      |'
+
+
+def test_table_is_narrowed_to_fit():
+    streaming = table.StreamingTable(['Repo', 'Title'], max_width=20)
+    lines = list(streaming.iter_lines([('repo-0001', 'A title that is too long')]))
+
+    assert all(len(line) <= 20 for line in lines)
+
+
+def test_long_output_goes_through_the_pager(monkeypatch):
+    class FakeStdout(object):
+        def isatty(self):
+            return True
+
+    paged = []
+    monkeypatch.setattr(click, 'get_text_stream', lambda name: FakeStdout())
+    monkeypatch.setattr(table, 'get_terminal_size', lambda: (80, 5))
+    monkeypatch.setattr(click, 'echo_via_pager', lambda lines: paged.extend(lines))
+
+    table.echo_lines(['line {}'.format(i) for i in range(10)])
+    assert len(paged) == 10
+
+
+def test_tables_are_only_paged_when_asked(monkeypatch, capsys):
+    class FakeStdout(object):
+        def isatty(self):
+            return True
+
+    paged = []
+    monkeypatch.setattr(click, 'get_text_stream', lambda name: FakeStdout())
+    monkeypatch.setattr(table, 'get_terminal_size', lambda: (80, 5))
+    monkeypatch.setattr(click, 'echo_via_pager', lambda lines: paged.extend(lines))
+
+    rows = [('repo-{}'.format(i),) for i in range(10)]
+    table.echo_table(['Repo'], rows)
+    assert paged == []
+    assert 'repo-9' in capsys.readouterr().out
+
+    table.echo_table(['Repo'], rows, pager=True)
+    assert len(paged) == 14
+
+
+def test_tables_print_to_a_patched_stdout(monkeypatch, capsys):
+    # like prompt_toolkit's, without isatty
+    class PatchedStdout(object):
+        pass
+
+    monkeypatch.setattr(click, 'get_text_stream', lambda name: PatchedStdout())
+
+    table.echo_table(['Repo'], [('repo-0001',)])
+    assert 'repo-0001' in capsys.readouterr().out
+
+
+def test_short_output_is_echoed(monkeypatch, capsys):
+    monkeypatch.setattr(click, 'echo_via_pager', lambda lines: None)
+
+    table.echo_table(['Repo'], [('repo-0001',)])
+    assert 'repo-0001' in capsys.readouterr().out